@@ -0,0 +1,231 @@
+import os
+
+import numpy as np
+import torch
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+from transformers import pipeline
+
+import embeddings
+
+load_dotenv()
+
+# --- Model names ---
+TRANSCRIBER_MODEL = "distil-whisper/distil-medium.en"
+SENTIMENT_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-12-6"
+
+# --- .env variables ---
+# "auto" picks Apple's GPU (mps) when present, otherwise CPU; or set cpu / mps / cuda
+MODEL_DEVICE = os.getenv("MODEL_DEVICE", "auto")
+# "fp32" (default) or "int8": dynamic int8 quantization of every Linear layer.
+# int8 kernels only exist on CPU, so int8 always runs the models on CPU.
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+
+# Backend per model: "transformers" (PyTorch pipelines) or "onnx" (ONNX Runtime).
+# MODEL_BACKEND sets the default; the per-model variables override it.
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "transformers")
+TRANSCRIBER_BACKEND = os.getenv("TRANSCRIBER_BACKEND", MODEL_BACKEND)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", MODEL_BACKEND)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", MODEL_BACKEND)
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", MODEL_BACKEND)
+# Models exported to ONNX are saved here, so the export only ever happens once
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "onnx_models")
+# Threads per ONNX Runtime session (0 = let onnxruntime decide)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# Identify exactly which outputs a model produces (used as cache keys)
+SENTIMENT_MODEL_TAG = f"{SENTIMENT_MODEL}@{MODEL_PRECISION}/{SENTIMENT_BACKEND}"
+EMBEDDING_MODEL_TAG = f"{embeddings.MODEL_TAG}@{MODEL_PRECISION}/{EMBEDDING_BACKEND}"
+
+PRECISIONS = ("fp32", "int8")
+BACKENDS = ("transformers", "onnx")
+
+# Word-level timestamps need Whisper's cross-attention weights, which the
+# ONNX decoder doesn't return; with ONNX we fall back to segment timestamps.
+TRANSCRIBER_TIMESTAMPS = "word" if TRANSCRIBER_BACKEND == "transformers" else True
+
+
+def resolve_device(device: str = MODEL_DEVICE, precision: str = MODEL_PRECISION) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown MODEL_PRECISION '{precision}', expected one of {PRECISIONS}")
+    if precision == "int8":
+        if device not in ("auto", "cpu"):
+            print(f"MODEL_PRECISION=int8 runs on CPU; ignoring MODEL_DEVICE={device}")
+        return "cpu"
+    if device == "auto":
+        return "mps" if torch.backends.mps.is_available() else "cpu"
+    return device
+
+
+def quantize(module):
+    """Swaps the module's Linear layers for int8 dynamically quantized ones, in place."""
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}', expected one of {BACKENDS}")
+
+
+def onnx_session_options():
+    """Shared onnxruntime settings: full graph optimization and the configured thread count."""
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_THREADS > 0:
+        options.intra_op_num_threads = ONNX_THREADS
+    return options
+
+
+def _load_onnx(ort_class, model_name, processor_class):
+    """
+    Loads an ONNX Runtime model from the export cache, exporting it from
+    the Hugging Face checkpoint (and caching it) the first time.
+    Returns (model, processor).
+    """
+    path = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+    if os.path.isdir(path):
+        model = ort_class.from_pretrained(path, session_options=onnx_session_options())
+        return model, processor_class.from_pretrained(path)
+
+    print(f"Exporting {model_name} to ONNX (one-time, cached in {path})...")
+    model = ort_class.from_pretrained(model_name, export=True, session_options=onnx_session_options())
+    processor = processor_class.from_pretrained(model_name)
+    model.save_pretrained(path)
+    processor.save_pretrained(path)
+    return model, processor
+
+
+def _load_pipeline(task, model, precision, device):
+    pipe = pipeline(task, model=model, device=resolve_device(device, precision))
+    if precision == "int8":
+        quantize(pipe.model)
+    return pipe
+
+
+def _warn_onnx_precision(precision):
+    if precision == "int8":
+        print("MODEL_PRECISION=int8 only applies to the transformers backend; ONNX models run in fp32")
+
+
+def load_transcriber(precision: str = MODEL_PRECISION, device: str = MODEL_DEVICE,
+                     backend: str = TRANSCRIBER_BACKEND):
+    _check_backend(backend)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        from transformers import AutoProcessor
+
+        _warn_onnx_precision(precision)
+        model, processor = _load_onnx(ORTModelForSpeechSeq2Seq, TRANSCRIBER_MODEL, AutoProcessor)
+        return pipeline('automatic-speech-recognition', model=model,
+                        tokenizer=processor.tokenizer, feature_extractor=processor.feature_extractor)
+    return _load_pipeline('automatic-speech-recognition', TRANSCRIBER_MODEL, precision, device)
+
+
+def load_sentiment_analyzer(precision: str = MODEL_PRECISION, device: str = MODEL_DEVICE,
+                            backend: str = SENTIMENT_BACKEND):
+    _check_backend(backend)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+
+        _warn_onnx_precision(precision)
+        model, tokenizer = _load_onnx(ORTModelForSequenceClassification, SENTIMENT_MODEL, AutoTokenizer)
+        return pipeline('text-classification', model=model, tokenizer=tokenizer)
+    return _load_pipeline('text-classification', SENTIMENT_MODEL, precision, device)
+
+
+def load_summarizer(precision: str = MODEL_PRECISION, device: str = MODEL_DEVICE,
+                    backend: str = SUMMARIZER_BACKEND):
+    _check_backend(backend)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import AutoTokenizer
+
+        _warn_onnx_precision(precision)
+        model, tokenizer = _load_onnx(ORTModelForSeq2SeqLM, SUMMARIZER_MODEL, AutoTokenizer)
+        return pipeline('summarization', model=model, tokenizer=tokenizer)
+    return _load_pipeline('summarization', SUMMARIZER_MODEL, precision, device)
+
+
+def load_embedding_model(precision: str = MODEL_PRECISION, device: str = MODEL_DEVICE,
+                         backend: str = EMBEDDING_BACKEND):
+    _check_backend(backend)
+    if backend == "onnx":
+        _warn_onnx_precision(precision)
+        # sentence-transformers exports (or downloads) the ONNX graph itself;
+        # cache_folder keeps it next to the other exports
+        return SentenceTransformer(
+            embeddings.EMBEDDING_MODEL_NAME,
+            backend="onnx",
+            cache_folder=ONNX_CACHE_DIR,
+            model_kwargs={"session_options": onnx_session_options()},
+        )
+    model = SentenceTransformer(embeddings.EMBEDDING_MODEL_NAME, device=resolve_device(device, precision))
+    if precision == "int8":
+        quantize(model)
+    return model
+
+
+def _tensor_bytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, (tuple, list)):
+        # int8 Linear layers keep their packed (weight, bias) as a tuple
+        return sum(_tensor_bytes(item) for item in value)
+    return 0
+
+
+def model_memory_bytes(model) -> int:
+    """
+    Estimates how much memory a loaded model (pipeline or SentenceTransformer)
+    holds: its weights for PyTorch models, the graph files for ONNX ones.
+    """
+    module = getattr(model, "model", model)
+    if isinstance(module, torch.nn.Module):
+        return sum(_tensor_bytes(value) for value in module.state_dict().values())
+
+    # ONNX Runtime keeps the whole graph with its initializers in memory
+    directory = getattr(module, "model_save_dir", None)
+    if directory is not None and os.path.isdir(directory):
+        return sum(
+            os.path.getsize(os.path.join(root, filename))
+            for root, _, filenames in os.walk(directory)
+            for filename in filenames
+            if filename.endswith((".onnx", ".onnx_data"))
+        )
+    return 0
+
+
+# --- Warm-up inferences ---
+# The first call of each model pays for lazy initialisation (kernel selection,
+# ONNX session allocation, tokenizer caches). Running one representative call
+# while loading keeps that latency off the first real request.
+_WARMUP_SENTENCE = "Today I went for a long walk and thought about how the week went."
+
+
+def warm_up_transcriber(transcriber):
+    # Whisper pads every window to 30 s, so a short silent clip has the real
+    # input shape; two of them exercise the batched long-form path
+    silence = np.zeros(16000, dtype='float32')
+    transcriber([silence, silence], batch_size=2, return_timestamps=TRANSCRIBER_TIMESTAMPS)
+
+
+def warm_up_sentiment_analyzer(sentiment_analyzer):
+    sentiment_analyzer([_WARMUP_SENTENCE, _WARMUP_SENTENCE * 8], batch_size=2, truncation=True)
+
+
+def warm_up_embedding_model(embedding_model, expected_dimension: int):
+    dimension = embedding_model.get_sentence_embedding_dimension()
+    if dimension != expected_dimension:
+        raise ValueError(
+            f"{embeddings.EMBEDDING_MODEL_NAME} produces {dimension}-d vectors but the index "
+            f"expects {expected_dimension}; set EMBEDDING_DIMENSION={dimension}"
+        )
+    embedding_model.encode([_WARMUP_SENTENCE, _WARMUP_SENTENCE * 8])
+
+
+def warm_up_summarizer(summarizer):
+    summarizer(_WARMUP_SENTENCE * 10, max_length=15, min_length=5, do_sample=False)
@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func
+
+import metrics
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# A question at least this similar (cosine) to a cached one reuses its answer
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.95"))
+# Cached answers kept per user, and users kept in memory
+CHAT_CACHE_ENTRIES_PER_USER = int(os.getenv("CHAT_CACHE_ENTRIES_PER_USER", "32"))
+CHAT_CACHE_MAX_USERS = int(os.getenv("CHAT_CACHE_MAX_USERS", "1000"))
+
+metrics.describe("chat_cache_hits_total", "counter", "/chat answers served from the semantic answer cache")
+metrics.describe("chat_cache_misses_total", "counter", "/chat questions that ran the full retrieval")
+
+
+def journal_version(db, user_id: int) -> int:
+    """Reads the user's journal version straight from the database (never cached)."""
+    return db.query(models.User.journal_version).filter(models.User.id == user_id).scalar() or 0
+
+
+def bump_journal_version(db, user_id: int):
+    """
+    Marks the user's journal as changed, invalidating their cached answers.
+    Call it in the same transaction as the change; the caller commits.
+    """
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {"journal_version": func.coalesce(models.User.journal_version, 0) + 1},
+        synchronize_session=False,
+    )
+
+
+class _UserAnswers:
+    def __init__(self, version):
+        self.version = version
+        self.vectors = []
+        self.answers = []
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of /chat answers, looked up by question embedding: a
+    cached answer is reused when the new question's cosine similarity to
+    its question is at least `similarity`.
+
+    Every lookup passes the user's current version; a user's answers are
+    dropped as soon as the version differs from the one they were stored
+    with, so a cached answer can't outlive a change to the journal.
+    """
+
+    def __init__(self, similarity: float = CHAT_CACHE_SIMILARITY,
+                 entries_per_user: int = CHAT_CACHE_ENTRIES_PER_USER,
+                 max_users: int = CHAT_CACHE_MAX_USERS):
+        self.similarity = similarity
+        self.entries_per_user = entries_per_user
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, user_id: int, version, vector):
+        """Returns the cached answer for a similar enough question, or None."""
+        query = self._unit(vector)
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is None or cached.version != version or not cached.vectors:
+                if cached is not None and cached.version != version:
+                    del self._users[user_id]
+                metrics.inc("chat_cache_misses_total")
+                return None
+            self._users.move_to_end(user_id)
+            scores = np.stack(cached.vectors) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                metrics.inc("chat_cache_misses_total")
+                return None
+            metrics.inc("chat_cache_hits_total")
+            return cached.answers[best]
+
+    def store(self, user_id: int, version, vector, answer):
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is None or cached.version != version:
+                cached = self._users[user_id] = _UserAnswers(version)
+            self._users.move_to_end(user_id)
+            cached.vectors.append(self._unit(vector))
+            cached.answers.append(answer)
+            if len(cached.vectors) > self.entries_per_user:
+                del cached.vectors[0], cached.answers[0]
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
@@ -0,0 +1,139 @@
+import io
+import subprocess
+import threading
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Containers soundfile (libsndfile) decodes directly, identified by their magic bytes
+_SOUNDFILE_MAGIC = (b"RIFF", b"fLaC", b"OggS", b"FORM")
+
+
+class AudioDecodeError(Exception):
+    """Raised when the uploaded bytes can't be decoded as audio."""
+
+
+def _to_mono_16k(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    if samples.ndim == 2:
+        samples = samples.mean(axis=1)
+    # Fast path: already at the model's rate, no resampling at all
+    if sample_rate == target_rate:
+        return np.ascontiguousarray(samples, dtype='float32')
+    # Polyphase resampling is much cheaper than librosa's default (soxr_hq / fft) resampler
+    factor = gcd(sample_rate, target_rate)
+    return resample_poly(samples, target_rate // factor, sample_rate // factor).astype('float32')
+
+
+def _decode_with_soundfile(data: bytes, target_rate: int) -> np.ndarray:
+    samples, sample_rate = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    return _to_mono_16k(samples, sample_rate, target_rate)
+
+
+def _decode_with_ffmpeg(data: bytes, target_rate: int) -> np.ndarray:
+    # ffmpeg reads the upload from stdin and writes raw mono float32 PCM to stdout;
+    # nothing touches the disk
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "f32le", "-ac", "1", "-ar", str(target_rate), "pipe:1"],
+            input=data,
+            capture_output=True,
+            check=True,
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode(errors="replace").strip() or "ffmpeg failed")
+    return np.frombuffer(result.stdout, dtype='<f4').copy()
+
+
+def decode_audio(data: bytes, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes an uploaded audio file (bytes) straight into a mono float32
+    NumPy array at `target_rate`. WAV/FLAC/OGG go through soundfile;
+    everything else (webm, mp4, m4a, ...) through an ffmpeg pipe.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+
+    if data[:4] in _SOUNDFILE_MAGIC:
+        try:
+            return _decode_with_soundfile(data, target_rate)
+        except RuntimeError as e:
+            # e.g. Ogg/Opus on an old libsndfile; ffmpeg handles it below
+            print(f"soundfile could not decode upload, falling back to ffmpeg: {e}")
+
+    return _decode_with_ffmpeg(data, target_rate)
+
+
+def decode_file(path: str, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Same as decode_audio, for audio already on disk."""
+    with open(path, "rb") as f:
+        return decode_audio(f.read(), target_rate)
+
+
+def _stream_with_ffmpeg(data: bytes, target_rate: int, block_samples: int):
+    try:
+        process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "f32le", "-ac", "1", "-ar", str(target_rate), "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+
+    # Feed stdin from a thread so ffmpeg never blocks on a full stdout pipe
+    def write_input():
+        try:
+            process.stdin.write(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+
+    writer = threading.Thread(target=write_input, daemon=True)
+    writer.start()
+    try:
+        while True:
+            chunk = process.stdout.read(block_samples * 4)
+            if not chunk:
+                break
+            yield np.frombuffer(chunk[:len(chunk) - len(chunk) % 4], dtype='<f4').copy()
+        writer.join()
+        if process.wait() != 0:
+            raise AudioDecodeError(process.stderr.read().decode(errors="replace").strip() or "ffmpeg failed")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def stream_audio(data: bytes, target_rate: int = SAMPLE_RATE, block_seconds: float = 10.0):
+    """
+    Like decode_audio, but yields the decoded audio in blocks of about
+    `block_seconds`, so long recordings never have to be fully decoded
+    into memory at once.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+    block_samples = int(block_seconds * target_rate)
+
+    if data[:4] in _SOUNDFILE_MAGIC:
+        try:
+            info = sf.info(io.BytesIO(data))
+        except RuntimeError:
+            info = None
+        # Fast path: already at the model's rate, read blocks without resampling
+        if info is not None and info.samplerate == target_rate:
+            for block in sf.blocks(io.BytesIO(data), blocksize=block_samples, dtype='float32', always_2d=True):
+                yield np.ascontiguousarray(block.mean(axis=1), dtype='float32')
+            return
+
+    yield from _stream_with_ffmpeg(data, target_rate, block_samples)
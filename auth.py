@@ -45,7 +45,11 @@ def verify_access_token(token: str, credentials_exception):
             raise credentials_exception
             
         # Validate the token data with our schema
-        token_data = schemas.TokenData(id=str(user_id))
+        expires = payload.get("exp")
+        token_data = schemas.TokenData(
+            id=str(user_id),
+            expires_at=datetime.fromtimestamp(expires, timezone.utc) if expires is not None else None,
+        )
         
     except JWTError:
         raise credentials_exception
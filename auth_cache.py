@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import auth
+import metrics
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# How long a verified token / loaded user is reused before checking again; 0 disables the cache.
+# Invalidation (profile or password change) is per process, so with several
+# workers the others may serve the old profile for up to this long.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+# Entries kept in each of the two caches (tokens, users)
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+metrics.describe("auth_cache_hits_total", "counter", "Authentications answered from the auth cache, by cache (token, user)")
+metrics.describe("auth_cache_misses_total", "counter", "Authentications that had to decode the token or load the user")
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after a time-to-live."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl_seconds: float = None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def discard_values(self, predicate):
+        """Drops every entry whose value matches `predicate`."""
+        with self._lock:
+            for key in [key for key, (value, _) in self._items.items() if predicate(value)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class CachedUser:
+    """
+    The user fields requests need (the ones in schemas.UserResponse),
+    detached from any database session. Load the models.User row to
+    change anything.
+    """
+    __slots__ = ("id", "email", "username", "full_name", "profile_picture_url", "created_at")
+
+    def __init__(self, id, email, username, full_name, profile_picture_url, created_at):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.full_name = full_name
+        self.profile_picture_url = profile_picture_url
+        self.created_at = created_at
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.email, user.username, user.full_name, user.profile_picture_url, user.created_at)
+
+
+class AuthCache:
+    """
+    Caches the two steps of authenticating a request: decoding the JWT
+    (token -> user id, never beyond the token's expiry) and loading the
+    user (user id -> CachedUser). A request whose token and user are both
+    cached touches neither python-jose nor the database.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.tokens = TTLCache(max_entries, ttl_seconds)
+        self.users = TTLCache(max_entries, ttl_seconds)
+
+    @staticmethod
+    def _token_key(token: str) -> bytes:
+        # Keep digests rather than the bearer tokens themselves in memory
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def user_id_for(self, token: str, credentials_exception) -> int:
+        key = self._token_key(token)
+        user_id = self.tokens.get(key)
+        if user_id is not None:
+            metrics.inc("auth_cache_hits_total", cache="token")
+            return user_id
+        metrics.inc("auth_cache_misses_total", cache="token")
+        token_data = auth.verify_access_token(token, credentials_exception)
+        user_id = int(token_data.id)
+        ttl_seconds = None
+        if token_data.expires_at is not None:
+            ttl_seconds = (token_data.expires_at - datetime.now(timezone.utc)).total_seconds()
+        self.tokens.put(key, user_id, ttl_seconds)
+        return user_id
+
+    def authenticate(self, token: str, db, credentials_exception) -> CachedUser:
+        """The user the token belongs to; raises credentials_exception if there is none."""
+        user_id = self.user_id_for(token, credentials_exception)
+        user = self.users.get(user_id)
+        if user is not None:
+            metrics.inc("auth_cache_hits_total", cache="user")
+            return user
+        metrics.inc("auth_cache_misses_total", cache="user")
+        row = db.query(models.User).filter(models.User.id == user_id).first()
+        if row is None:
+            raise credentials_exception
+        user = CachedUser.from_model(row)
+        self.users.put(user_id, user)
+        return user
+
+    def invalidate_user(self, user_id: int):
+        """Forgets the user and their verified tokens (after a profile or password change)."""
+        self.users.pop(user_id)
+        self.tokens.discard_values(lambda cached_user_id: cached_user_id == user_id)
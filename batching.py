@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- .env variables ---
+# Largest number of texts sent through the model in one forward pass
+SENTIMENT_MAX_BATCH_SIZE = int(os.getenv("SENTIMENT_MAX_BATCH_SIZE", "32"))
+# How long the first request in a batch may wait for others to join it
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", "5"))
+
+# Upper bounds (in characters) of the length buckets; texts in the same bucket
+# are run together so short texts are not padded out to a long one
+DEFAULT_LENGTH_BUCKETS = (64, 256, 1024)
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item calls into batched model calls.
+
+    Callers submit one text at a time and block until its result is ready.
+    A worker thread collects requests for up to `max_wait_ms` (or until
+    `max_batch_size` are waiting), splits them into length buckets, and calls
+    `predict(list_of_texts)` once per bucket. `predict` must return one result
+    per input, in order.
+    """
+
+    def __init__(self, predict, max_batch_size: int, max_wait_ms: float,
+                 length_buckets=DEFAULT_LENGTH_BUCKETS, name: str = "micro-batcher"):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.length_buckets = sorted(length_buckets)
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        """Queues a text and returns a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def __call__(self, text: str):
+        """Runs one text through the model (batched with any concurrent callers)."""
+        return self.submit(text).result()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _bucket(self, text: str) -> int:
+        for i, bound in enumerate(self.length_buckets):
+            if len(text) <= bound:
+                return i
+        return len(self.length_buckets)
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the deadline or the batch is full."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            buckets = {}
+            for text, future in batch:
+                buckets.setdefault(self._bucket(text), []).append((text, future))
+
+            for items in buckets.values():
+                texts = [text for text, _ in items]
+                try:
+                    results = self.predict(texts)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
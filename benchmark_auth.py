@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from fastapi import HTTPException
+
+import auth
+import auth_cache
+import models
+from database import SessionLocal
+
+# Per-request cost of authenticating a bearer token (what get_current_user
+# does), with and without the auth cache. Uses the first user in the
+# database (see seed_data.py) and a fresh session per request, like get_db.
+iterations = 2000
+
+credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
+
+db = SessionLocal()
+user = db.query(models.User).order_by(models.User.id).first()
+db.close()
+if user is None:
+    raise SystemExit("No users in the database; run seed_data.py first.")
+token = auth.create_access_token({"user_id": user.id})
+
+
+def time_requests(cache):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        db = SessionLocal()
+        try:
+            cache.authenticate(token, db, credentials_exception)
+        finally:
+            db.close()
+        timings.append((time.perf_counter() - start_time) * 1e6)
+    return timings
+
+
+def time_step(step):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        step()
+        timings.append((time.perf_counter() - start_time) * 1e6)
+    return timings
+
+
+def user_query():
+    db = SessionLocal()
+    try:
+        db.query(models.User).filter(models.User.id == user.id).first()
+    finally:
+        db.close()
+
+
+results = {
+    "JWT decode only": time_step(lambda: auth.verify_access_token(token, credentials_exception)),
+    "user SELECT only": time_step(user_query),
+    "no cache (decode + SELECT)": time_requests(auth_cache.AuthCache(ttl_seconds=0)),
+    "auth cache": time_requests(auth_cache.AuthCache(ttl_seconds=300)),
+}
+
+print(f"\n--- Auth overhead per request ({iterations} requests, user {user.id}) ---")
+for name, timings in results.items():
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<28} mean {statistics.mean(timings):8.1f} us   p50 {statistics.median(timings):8.1f} us   p99 {p99:8.1f} us")
+
+uncached = statistics.mean(results["no cache (decode + SELECT)"])
+cached = statistics.mean(results["auth cache"])
+print(f"\nSpeedup with cache: {uncached / cached:.1f}x")
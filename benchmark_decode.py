@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+
+import librosa
+import numpy as np
+
+import audio_decode
+
+# Sample recordings checked into the repo
+files_to_test = ['srs_test.wav', 'test_audio.wav']
+iterations = 20
+
+
+def old_path(data, suffix):
+    """What the endpoints used to do: temp file + librosa.load(sr=16000)."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        tmp_file.write(data)
+        tmp_path = tmp_file.name
+    try:
+        audio_data, _ = librosa.load(tmp_path, sr=16000)
+        return audio_data
+    finally:
+        os.remove(tmp_path)
+
+
+def new_path(data, suffix):
+    """In-memory decode (soundfile / ffmpeg pipe, no resample at 16 kHz)."""
+    return audio_decode.decode_audio(data)
+
+
+for filename in files_to_test:
+    print(f"\n--- Testing File: {filename} ---")
+    with open(filename, 'rb') as f:
+        data = f.read()
+    suffix = os.path.splitext(filename)[1]
+
+    results = {}
+    for name, decode in [("temp file + librosa", old_path), ("in-memory decode", new_path)]:
+        decode(data, suffix)  # warm-up (imports, first ffmpeg spawn, etc.)
+        start_time = time.time()
+        for _ in range(iterations):
+            audio = decode(data, suffix)
+        elapsed = (time.time() - start_time) / iterations
+        results[name] = (elapsed, audio)
+        print(f"{name:>22}: {elapsed * 1000:.2f} ms per decode ({len(audio) / 16000:.2f}s of audio)")
+
+    (old_time, old_audio), (new_time, new_audio) = results.values()
+    length = min(len(old_audio), len(new_audio))
+    max_diff = float(np.max(np.abs(old_audio[:length] - new_audio[:length]))) if length else 0.0
+    print(f"--> Speedup: {old_time / new_time:.1f}x, max sample difference: {max_diff:.6f}")
+
+print("\nAll decode benchmarks completed.")
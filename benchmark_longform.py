@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+from transformers import pipeline
+
+import audio_decode
+import longform
+
+# Build a multi-minute recording by repeating the sample clip
+print("Loading sample audio...")
+clip = audio_decode.decode_file('test_audio.wav')
+repeats = max(1, int(300 * audio_decode.SAMPLE_RATE / len(clip)))
+long_audio = np.tile(clip, repeats)
+print(f"Long recording: {len(long_audio) / audio_decode.SAMPLE_RATE:.1f}s")
+
+transcriber = pipeline('automatic-speech-recognition', model='distil-whisper/distil-medium.en')
+
+
+def blocks(audio, block_seconds=10):
+    step = block_seconds * audio_decode.SAMPLE_RATE
+    for i in range(0, len(audio), step):
+        yield audio[i:i + step]
+
+
+for batch_size in [1, 2, 4, 8]:
+    start_time = time.time()
+    result = longform.transcribe_long(
+        blocks(long_audio),
+        lambda windows: transcriber(windows, batch_size=len(windows), return_timestamps="word"),
+        batch_size=batch_size,
+    )
+    elapsed = time.time() - start_time
+    audio_seconds = len(long_audio) / audio_decode.SAMPLE_RATE
+    print(f"batch_size={batch_size}: {elapsed:.2f}s ({audio_seconds / elapsed:.1f}x real time), "
+          f"{len(result['chunks'])} words")
+
+print("\nLong-form benchmark completed.")
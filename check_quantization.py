@@ -0,0 +1,136 @@
+"""
+Compares the int8 (dynamically quantized) models against fp32 on a fixed
+sample set, on CPU. Prints accuracy agreement, latency and model size for
+each of the four models, and exits non-zero if any model drifts past its
+threshold.
+
+    python check_quantization.py
+"""
+import io
+import re
+import sys
+import time
+
+import numpy as np
+import torch
+
+import ai_models
+import audio_decode
+
+AUDIO_SAMPLES = ['srs_test.wav', 'test_audio.wav']
+
+TEXT_SAMPLES = [
+    "Today was amazing, I finally finished the project and everyone loved it.",
+    "I feel so alone lately. Nobody seems to call anymore.",
+    "The meeting got moved again and I'm honestly furious about it.",
+    "I'm nervous about the exam tomorrow, I don't think I studied enough.",
+    "Went for a walk by the lake, it was calm and quiet.",
+    "I can't believe she remembered my birthday, what a surprise!",
+    "The food at the new place was disgusting, I couldn't finish it.",
+    "Work was fine. Nothing special happened, just emails and a couple of calls.",
+]
+
+SUMMARY_SAMPLE = " ".join(TEXT_SAMPLES)
+
+# Largest acceptable difference between int8 and fp32
+MAX_WORD_ERROR_RATE = 0.10
+MIN_LABEL_AGREEMENT = 0.85
+MIN_EMBEDDING_COSINE = 0.98
+MIN_SUMMARY_OVERLAP = 0.60
+
+
+def model_size_mb(module):
+    """Serialized size of the weights (packed int8 weights are counted as stored)."""
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1024 / 1024
+
+
+def words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over words
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def unigram_f1(reference, hypothesis):
+    ref, hyp = set(words(reference)), set(words(hypothesis))
+    if not ref or not hyp:
+        return 0.0
+    overlap = len(ref & hyp)
+    precision, recall = overlap / len(hyp), overlap / len(ref)
+    return 2 * precision * recall / (precision + recall) if overlap else 0.0
+
+
+def timed(fn, *args, **kwargs):
+    fn(*args, **kwargs)  # warm-up
+    start_time = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start_time
+
+
+def load_both(loader):
+    return (loader(precision="fp32", device="cpu", backend="transformers"),
+            loader(precision="int8", device="cpu", backend="transformers"))
+
+
+def check_transcriber():
+    fp32, int8 = load_both(ai_models.load_transcriber)
+    audio = [audio_decode.decode_file(path) for path in AUDIO_SAMPLES]
+    fp32_out, fp32_time = timed(fp32, audio)
+    int8_out, int8_time = timed(int8, audio)
+    score = max(word_error_rate(a['text'], b['text']) for a, b in zip(fp32_out, int8_out))
+    return "transcriber", "max WER", score, score <= MAX_WORD_ERROR_RATE, fp32, int8, fp32_time, int8_time
+
+
+def check_sentiment():
+    fp32, int8 = load_both(ai_models.load_sentiment_analyzer)
+    fp32_out, fp32_time = timed(fp32, TEXT_SAMPLES, truncation=True)
+    int8_out, int8_time = timed(int8, TEXT_SAMPLES, truncation=True)
+    score = float(np.mean([a['label'] == b['label'] for a, b in zip(fp32_out, int8_out)]))
+    return "sentiment", "label agreement", score, score >= MIN_LABEL_AGREEMENT, fp32, int8, fp32_time, int8_time
+
+
+def check_embedding():
+    fp32, int8 = load_both(ai_models.load_embedding_model)
+    fp32_out, fp32_time = timed(fp32.encode, TEXT_SAMPLES, normalize_embeddings=True)
+    int8_out, int8_time = timed(int8.encode, TEXT_SAMPLES, normalize_embeddings=True)
+    score = float(np.min(np.sum(fp32_out * int8_out, axis=1)))
+    return "embedding", "min cosine", score, score >= MIN_EMBEDDING_COSINE, fp32, int8, fp32_time, int8_time
+
+
+def check_summarizer():
+    fp32, int8 = load_both(ai_models.load_summarizer)
+    kwargs = dict(max_length=80, min_length=20, do_sample=False)
+    fp32_out, fp32_time = timed(fp32, SUMMARY_SAMPLE, **kwargs)
+    int8_out, int8_time = timed(int8, SUMMARY_SAMPLE, **kwargs)
+    score = unigram_f1(fp32_out[0]['summary_text'], int8_out[0]['summary_text'])
+    return "summarizer", "unigram F1", score, score >= MIN_SUMMARY_OVERLAP, fp32, int8, fp32_time, int8_time
+
+
+if __name__ == "__main__":
+    all_passed = True
+    for check in [check_transcriber, check_sentiment, check_embedding, check_summarizer]:
+        name, metric, score, passed, fp32, int8, fp32_time, int8_time = check()
+        fp32_model = fp32 if isinstance(fp32, torch.nn.Module) else fp32.model
+        int8_model = int8 if isinstance(int8, torch.nn.Module) else int8.model
+        print(f"\n--- {name} ---")
+        print(f"{metric}: {score:.4f} ({'PASS' if passed else 'FAIL'})")
+        print(f"latency: fp32 {fp32_time:.3f}s, int8 {int8_time:.3f}s ({fp32_time / int8_time:.1f}x faster)")
+        print(f"size: fp32 {model_size_mb(fp32_model):.0f} MB, int8 {model_size_mb(int8_model):.0f} MB")
+        all_passed = all_passed and passed
+        del fp32, int8, fp32_model, int8_model
+
+    print("\nAll quantization checks passed." if all_passed else "\nSome quantization checks FAILED.")
+    sys.exit(0 if all_passed else 1)
@@ -1,7 +1,11 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
+import metrics
 
 # This line finds and loads your .env file
 load_dotenv()
@@ -9,11 +13,102 @@ load_dotenv()
 # This line securely reads the variable
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# --- .env variables ---
+# Connections each engine keeps open, and how many more it may open under load.
+# Every sync request thread that touches the database holds one connection, so
+# size + overflow should cover the threads that use it at the same time; async
+# sessions only hold a connection while a query runs.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Test connections before use (survives database restarts / dropped idle connections)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Replace connections older than this (seconds; -1 never)
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+# Postgres cancels statements running longer than this (milliseconds; 0 no limit)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Opt-in async engine (needs `pip install "sqlalchemy[asyncio]" asyncpg`):
+# DB_ASYNC=1 derives its URL from a Postgres DATABASE_URL, or set
+# ASYNC_DATABASE_URL (e.g. postgresql+asyncpg://...) explicitly. Without
+# either, the async session dependency falls back to sync sessions.
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# The async engine has its own pool, on top of the sync one (which login,
+# writes and background work keep using), so each worker can open up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW
+# connections. Async sessions hold one only while a query runs, so a small
+# pool serves many concurrent requests.
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5"))
+
+
+def _pool_options(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW):
+    if url.get_backend_name() == "sqlite":
+        # SQLite picks its own pool (one connection per thread / file)
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+def _statement_timeout_args(url):
+    if url.get_backend_name() != "postgresql" or DB_STATEMENT_TIMEOUT_MS <= 0:
+        return {}
+    if url.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+
+def _async_url():
+    if ASYNC_DATABASE_URL:
+        return make_url(ASYNC_DATABASE_URL)
+    if not DB_ASYNC:
+        return None
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() != "postgresql":
+        print("DB_ASYNC=1 needs a Postgres DATABASE_URL (or set ASYNC_DATABASE_URL); using sync sessions.")
+        return None
+    return url.set(drivername="postgresql+asyncpg")
+
+
 # --- Create the SQLAlchemy engine ---
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(_url, connect_args=_statement_timeout_args(_url), **_pool_options(_url))
 
 # --- Create a SessionLocal class ---
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Optional async engine (see get_async_db in main.py) ---
+async_engine = None
+AsyncSessionLocal = None
+_async = _async_url()
+if _async is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    async_engine = create_async_engine(_async, connect_args=_statement_timeout_args(_async),
+                                       **_pool_options(_async, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW))
+    # expire_on_commit=False: loaded rows stay readable after commit without another (awaited) query
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # --- Create a Base class ---
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+metrics.describe("db_pool_size", "gauge", "Connections the pool keeps open, by engine (sync, async)")
+metrics.describe("db_pool_checked_out", "gauge", "Pooled connections in use, by engine")
+metrics.describe("db_pool_overflow", "gauge", "Connections open beyond the pool size, by engine")
+
+
+def report_pool_metrics():
+    """ Sets the connection pool gauges (called when /metrics is scraped). """
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine.pool
+    for name, pool in pools.items():
+        if isinstance(pool, QueuePool):
+            metrics.set_gauge("db_pool_size", pool.size(), engine=name)
+            metrics.set_gauge("db_pool_checked_out", pool.checkedout(), engine=name)
+            metrics.set_gauge("db_pool_overflow", max(0, pool.overflow()), engine=name)
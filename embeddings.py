@@ -0,0 +1,150 @@
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import or_
+
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# Which SentenceTransformer model to embed entries with
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# Bump this to re-embed everything with the same model (e.g. after changing preprocessing)
+EMBEDDING_MODEL_VERSION = int(os.getenv("EMBEDDING_MODEL_VERSION", "1"))
+# How many stale entries the background backfill encodes at a time
+EMBEDDING_BACKFILL_BATCH_SIZE = int(os.getenv("EMBEDDING_BACKFILL_BATCH_SIZE", "64"))
+
+# Identifies the model and version; ai_models.EMBEDDING_MODEL_TAG adds the
+# precision and backend, which change the vectors too. That full tag is
+# what the functions below take as `model_tag`.
+MODEL_TAG = f"{EMBEDDING_MODEL_NAME}@{EMBEDDING_MODEL_VERSION}"
+
+
+def pack(vector) -> bytes:
+    """Packs one embedding as raw little-endian float32 bytes for the database."""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def unpack(blob: bytes) -> np.ndarray:
+    """Inverse of pack()."""
+    return np.frombuffer(blob, dtype='<f4')
+
+
+def unpack_many(blobs) -> np.ndarray:
+    """Unpacks a list of stored embeddings into one (n, dim) float32 matrix."""
+    return np.frombuffer(b"".join(blobs), dtype='<f4').reshape(len(blobs), -1)
+
+
+def stamp(entry, vector, model_tag: str):
+    """Stores an embedding on a JournalEntry along with the model that made it."""
+    entry.embedding = pack(vector)
+    entry.embedding_model = model_tag
+    entry.embedding_version = EMBEDDING_MODEL_VERSION
+
+
+def is_current(embedding, embedding_model, embedding_version, model_tag: str) -> bool:
+    return (
+        embedding is not None
+        and embedding_model == model_tag
+        and embedding_version == EMBEDDING_MODEL_VERSION
+    )
+
+
+def stale_filter(model_tag: str):
+    """SQL filter matching entries whose stored embedding is missing or out of date."""
+    return or_(
+        models.JournalEntry.embedding == None,
+        models.JournalEntry.embedding_model == None,
+        models.JournalEntry.embedding_model != model_tag,
+        models.JournalEntry.embedding_version != EMBEDDING_MODEL_VERSION,
+    )
+
+
+class EmbeddingBackfill:
+    """
+    Background worker that embeds entries with a missing or outdated vector,
+    one small batch at a time, so a model change never blocks requests.
+
+    `encode(texts)` returns one embedding per text, and `on_batch(user_id, entry_ids,
+    vectors)` is called after each batch is saved so the RAG index can pick it up.
+    Entries not stamped with `model_tag` are stale.
+    """
+
+    def __init__(self, session_factory, encode, on_batch, model_tag: str,
+                 batch_size: int = EMBEDDING_BACKFILL_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.encode = encode
+        self.on_batch = on_batch
+        self.model_tag = model_tag
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-backfill", daemon=True)
+            self._thread.start()
+        self.wake()
+
+    def wake(self):
+        """Asks the worker to look for stale entries again."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                total = self.run_once()
+                if total:
+                    print(f"Embedding backfill finished: {total} entries re-encoded with {self.model_tag}.")
+            except Exception as e:
+                print(f"Embedding backfill failed: {e}")
+
+    def run_once(self) -> int:
+        """Encodes every stale entry. Returns how many were updated."""
+        total = 0
+        last_id = 0
+        while True:
+            db = self.session_factory()
+            try:
+                rows = db.query(
+                    models.JournalEntry.id,
+                    models.JournalEntry.user_id,
+                    models.JournalEntry.text_content,
+                ).filter(
+                    stale_filter(self.model_tag),
+                    models.JournalEntry.id > last_id,
+                ).order_by(models.JournalEntry.id).limit(self.batch_size).all()
+
+                if not rows:
+                    return total
+
+                vectors = np.asarray(self.encode([row.text_content for row in rows]), dtype='float32')
+                db.bulk_update_mappings(models.JournalEntry, [
+                    {
+                        "id": row.id,
+                        "embedding": pack(vector),
+                        "embedding_model": self.model_tag,
+                        "embedding_version": EMBEDDING_MODEL_VERSION,
+                    }
+                    for row, vector in zip(rows, vectors)
+                ])
+                db.commit()
+            finally:
+                db.close()
+
+            # Hand each user's share of the batch to the index
+            by_user = {}
+            for row, vector in zip(rows, vectors):
+                ids, vecs = by_user.setdefault(row.user_id, ([], []))
+                ids.append(row.id)
+                vecs.append(vector)
+            for user_id, (ids, vecs) in by_user.items():
+                self.on_batch(user_id, ids, np.asarray(vecs))
+
+            total += len(rows)
+            last_id = rows[-1].id
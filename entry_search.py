@@ -0,0 +1,236 @@
+import os
+import re
+from collections import namedtuple
+
+from dotenv import load_dotenv
+from sqlalchemy import literal, null, select, text
+
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# Most results a search returns when the client doesn't page through them
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+# Text search configuration (stemming, stop words) used on Postgres
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+
+SearchHit = namedtuple("SearchHit", ["entry_id", "rank", "snippet"])
+
+# Highlighting around matched words in snippets
+HIGHLIGHT_START, HIGHLIGHT_END = "<mark>", "</mark>"
+
+# --- Postgres: tsvector column + GIN, and a trigram index for substrings/typos ---
+# A plain column kept current by a trigger, rather than a generated column:
+# adding a generated column rewrites the whole table under an exclusive lock,
+# while this only adds metadata; existing rows are backfilled in batches.
+_POSTGRES_COLUMN = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE journal_entries ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """CREATE OR REPLACE FUNCTION journal_entries_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector(TG_ARGV[0]::regconfig, coalesce(NEW.text_content, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS journal_entries_search_vector ON journal_entries",
+    # Trigger arguments must be literals; the language comes from our own configuration
+    """CREATE TRIGGER journal_entries_search_vector
+        BEFORE INSERT OR UPDATE OF text_content ON journal_entries
+        FOR EACH ROW EXECUTE FUNCTION journal_entries_search_vector_update('{language}')""",
+]
+_POSTGRES_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_journal_entries_search_vector ON journal_entries USING gin (search_vector)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_journal_entries_text_trgm ON journal_entries USING gin (text_content gin_trgm_ops)",
+]
+# Rows per backfill statement (each one commits on its own, so writers only
+# ever wait for one batch)
+_BACKFILL_BATCH_SIZE = 1000
+
+# --- SQLite: FTS5 index over the entries, kept in sync by triggers ---
+_SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS journal_entries_fts USING fts5(
+        text_content, content='journal_entries', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS journal_entries_fts_insert AFTER INSERT ON journal_entries BEGIN
+        INSERT INTO journal_entries_fts(rowid, text_content) VALUES (new.id, new.text_content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS journal_entries_fts_delete AFTER DELETE ON journal_entries BEGIN
+        INSERT INTO journal_entries_fts(journal_entries_fts, rowid, text_content) VALUES ('delete', old.id, old.text_content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS journal_entries_fts_update AFTER UPDATE OF text_content ON journal_entries BEGIN
+        INSERT INTO journal_entries_fts(journal_entries_fts, rowid, text_content) VALUES ('delete', old.id, old.text_content);
+        INSERT INTO journal_entries_fts(rowid, text_content) VALUES (new.id, new.text_content);
+    END""",
+]
+
+
+def setup(connection):
+    """
+    Creates the full-text search structures for the database in use.
+    Idempotent; run by migrate_db outside a transaction so the Postgres
+    backfill commits batch by batch and the indexes can be built
+    CONCURRENTLY (without blocking writes).
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in _POSTGRES_COLUMN:
+            connection.exec_driver_sql(statement.replace("{language}", SEARCH_LANGUAGE.replace("'", "''")))
+        _backfill_search_vectors(connection)
+        for statement in _POSTGRES_INDEXES:
+            connection.exec_driver_sql(statement)
+    elif dialect == "sqlite":
+        existed = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'journal_entries_fts'"
+        ).first() is not None
+        for statement in _SQLITE_SETUP:
+            connection.exec_driver_sql(statement)
+        if not existed:
+            # Index the entries written before the FTS table existed
+            connection.exec_driver_sql("INSERT INTO journal_entries_fts(journal_entries_fts) VALUES ('rebuild')")
+    else:
+        print(f"No full-text index for {dialect}; search falls back to ILIKE scans.")
+
+
+def _backfill_search_vectors(connection):
+    # Walks the table in id order; rows written meanwhile already get their
+    # vector from the trigger
+    last_id, filled = 0, 0
+    while True:
+        ids = connection.execute(
+            text("SELECT id FROM journal_entries WHERE id > :after ORDER BY id LIMIT :size"),
+            {"after": last_id, "size": _BACKFILL_BATCH_SIZE},
+        ).scalars().all()
+        if not ids:
+            break
+        filled += connection.execute(text("""
+            UPDATE journal_entries SET search_vector = to_tsvector(CAST(:language AS regconfig), coalesce(text_content, ''))
+            WHERE id BETWEEN :first AND :last AND search_vector IS NULL
+        """), {"language": SEARCH_LANGUAGE, "first": ids[0], "last": ids[-1]}).rowcount
+        last_id = ids[-1]
+    if filled:
+        print(f"Backfilled search vectors for {filled} journal entries.")
+
+
+def teardown(connection):
+    """Drops what setup() created outside the journal_entries table (used by reset_db)."""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS journal_entries_fts")
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("DROP FUNCTION IF EXISTS journal_entries_search_vector_update() CASCADE")
+
+
+def _filters(sentiment, notebook_id):
+    clauses, params = [], {}
+    if sentiment:
+        clauses.append("AND e.sentiment = :sentiment")
+        params["sentiment"] = sentiment
+    if notebook_id is not None:
+        clauses.append("AND e.notebook_id = :notebook_id")
+        params["notebook_id"] = notebook_id
+    return " ".join(clauses), params
+
+
+def _escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _postgres_statement(user_id, query, sentiment, notebook_id, limit, offset):
+    filters, params = _filters(sentiment, notebook_id)
+    # Rank and page first, then build snippets (ts_headline re-parses the
+    # text, so it only runs for the rows actually returned).
+    # Matches: stemmed words (GIN on search_vector), substrings (ILIKE via the
+    # trigram index) and near-miss spellings (word similarity, same index).
+    # The configuration is bound like any other value; written as
+    # CAST(:cfg AS regconfig) because text() doesn't see :cfg::regconfig as a parameter
+    sql = text(f"""
+        WITH q AS (SELECT websearch_to_tsquery(CAST(:cfg AS regconfig), :query) AS tsq),
+        ranked AS (
+            SELECT e.id, e.text_content, e.created_at,
+                   ts_rank_cd(e.search_vector, q.tsq) + word_similarity(:query, e.text_content) AS rank
+            FROM journal_entries e, q
+            WHERE e.user_id = :user_id
+              AND (e.search_vector @@ q.tsq OR e.text_content ILIKE :pattern OR :query <% e.text_content)
+              {filters}
+            ORDER BY rank DESC, e.created_at DESC, e.id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT ranked.id, ranked.rank,
+               ts_headline(CAST(:cfg AS regconfig), ranked.text_content, q.tsq,
+                           'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=20, MinWords=6, MaxFragments=2') AS snippet
+        FROM ranked, q
+        ORDER BY ranked.rank DESC, ranked.created_at DESC, ranked.id DESC
+    """)
+    params.update(cfg=SEARCH_LANGUAGE, query=query, user_id=user_id, pattern=f"%{_escape_like(query)}%",
+                  limit=limit, offset=offset)
+    return sql.bindparams(**params)
+
+
+def _fts5_query(query: str):
+    # Quote every word (so user input can't be FTS syntax) and allow prefixes: "walk"* matches "walking"
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _sqlite_statement(user_id, query, sentiment, notebook_id, limit, offset):
+    match = _fts5_query(query)
+    if not match:
+        return None
+    filters, params = _filters(sentiment, notebook_id)
+    sql = text(f"""
+        SELECT e.id,
+               -bm25(journal_entries_fts) AS rank,
+               snippet(journal_entries_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS snippet
+        FROM journal_entries_fts
+        JOIN journal_entries e ON e.id = journal_entries_fts.rowid
+        WHERE journal_entries_fts MATCH :match
+          AND e.user_id = :user_id
+          {filters}
+        ORDER BY bm25(journal_entries_fts), e.created_at DESC, e.id DESC
+        LIMIT :limit OFFSET :offset
+    """)
+    params.update(match=match, user_id=user_id, limit=limit, offset=offset)
+    return sql.bindparams(**params)
+
+
+def _scan_statement(user_id, query, sentiment, notebook_id, limit, offset):
+    # Unindexed fallback for other databases: substring match, newest first
+    entries = models.JournalEntry
+    statement = select(entries.id, literal(0.0).label("rank"), null().label("snippet")).where(
+        entries.user_id == user_id,
+        entries.text_content.ilike(f"%{_escape_like(query)}%", escape="\\"),
+    )
+    if sentiment:
+        statement = statement.where(entries.sentiment == sentiment)
+    if notebook_id is not None:
+        statement = statement.where(entries.notebook_id == notebook_id)
+    return statement.order_by(entries.created_at.desc(), entries.id.desc()).limit(limit).offset(offset)
+
+
+def search_statement(dialect: str, user_id: int, query: str, sentiment: str = None, notebook_id: int = None,
+                     limit: int = SEARCH_MAX_RESULTS, offset: int = 0):
+    """
+    The statement search_entries runs on the given dialect, with its
+    parameters bound; rows are (id, rank, snippet). None for a query with
+    nothing to search for. Also used by explain_queries.py.
+    """
+    query = query.strip()
+    if not query:
+        return None
+    if dialect == "postgresql":
+        return _postgres_statement(user_id, query, sentiment, notebook_id, limit, offset)
+    if dialect == "sqlite":
+        return _sqlite_statement(user_id, query, sentiment, notebook_id, limit, offset)
+    return _scan_statement(user_id, query, sentiment, notebook_id, limit, offset)
+
+
+def search_entries(db, user_id: int, query: str, sentiment: str = None, notebook_id: int = None,
+                   limit: int = SEARCH_MAX_RESULTS, offset: int = 0):
+    """
+    Full-text search over one user's entries, best matches first.
+    Returns SearchHit(entry_id, rank, snippet) tuples; snippets have the
+    matched words wrapped in <mark>...</mark>.
+    """
+    statement = search_statement(db.get_bind().dialect.name, user_id, query, sentiment, notebook_id, limit, offset)
+    if statement is None:
+        return []
+    return [SearchHit(row.id, float(row.rank), row.snippet) for row in db.execute(statement)]
@@ -0,0 +1,195 @@
+"""
+Captures the query plans of the API's hot database queries, to check
+that they use indexes (and how long they take) before and after a
+schema change.
+
+    python explain_queries.py --output plans_before.json
+    python migrate_db.py
+    python explain_queries.py --output plans_after.json --compare plans_before.json
+
+On Postgres this runs EXPLAIN (ANALYZE, BUFFERS), which executes the
+(read-only) queries; pass --no-analyze for plans only. On SQLite it runs
+EXPLAIN QUERY PLAN. Point it at a database with realistic data
+(see seed_data.py); --user-id defaults to the user with the most entries.
+"""
+import argparse
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+
+import entry_search
+import models
+import pagination
+from database import SessionLocal
+
+ENTRY_COLUMNS = [
+    models.JournalEntry.id, models.JournalEntry.user_id, models.JournalEntry.text_content,
+    models.JournalEntry.image_url, models.JournalEntry.latitude, models.JournalEntry.longitude,
+    models.JournalEntry.sentiment, models.JournalEntry.created_at, models.JournalEntry.notebook_id,
+]
+
+
+def _busiest_user(db):
+    row = db.query(models.JournalEntry.user_id, func.count().label("entries")).group_by(
+        models.JournalEntry.user_id
+    ).order_by(func.count().desc()).first()
+    if row is None:
+        raise SystemExit("No journal entries to explain queries against; run seed_data.py first.")
+    return row.user_id
+
+
+def _notebook_summaries(db, user_id: int):
+    # Same statement as notebook_summaries() in main.py
+    entries = models.JournalEntry
+    in_user_notebooks = (entries.user_id == user_id, entries.notebook_id.isnot(None))
+    stats = db.query(
+        entries.notebook_id,
+        func.count(entries.id).label("entry_count"),
+        func.min(entries.created_at).label("first_entry_at"),
+        func.max(entries.created_at).label("last_entry_at"),
+    ).filter(*in_user_notebooks).group_by(entries.notebook_id).subquery()
+    sentiments = db.query(
+        entries.notebook_id,
+        entries.sentiment,
+        func.row_number().over(
+            partition_by=entries.notebook_id,
+            order_by=(func.count(entries.id).desc(), entries.sentiment),
+        ).label("position"),
+    ).filter(*in_user_notebooks, entries.sentiment.isnot(None)).group_by(entries.notebook_id, entries.sentiment).subquery()
+    return db.query(
+        models.Notebook.id,
+        models.Notebook.title,
+        models.Notebook.created_at,
+        models.Notebook.user_id,
+        func.coalesce(stats.c.entry_count, 0).label("entry_count"),
+        stats.c.first_entry_at,
+        stats.c.last_entry_at,
+        sentiments.c.sentiment.label("dominant_sentiment"),
+    ).outerjoin(stats, stats.c.notebook_id == models.Notebook.id).outerjoin(
+        sentiments, (sentiments.c.notebook_id == models.Notebook.id) & (sentiments.c.position == 1)
+    ).filter(models.Notebook.user_id == user_id).order_by(models.Notebook.created_at, models.Notebook.id)
+
+
+def endpoint_queries(db, user_id: int, search: str):
+    """The statement each endpoint runs, by name (mirrors main.py)."""
+    entries = models.JournalEntry
+    by_user = db.query(*ENTRY_COLUMNS).filter(entries.user_id == user_id)
+    newest_first = (entries.created_at.desc(), entries.id.desc())
+    page_size = pagination.DEFAULT_PAGE_SIZE
+
+    # A cursor from the middle of the user's entries, for the second-page query
+    middle = db.query(entries.created_at, entries.id).filter(entries.user_id == user_id).order_by(
+        *newest_first).offset(page_size).first()
+    cursor = pagination.encode_cursor(middle.created_at, middle.id) if middle else \
+        pagination.encode_cursor(datetime.now(timezone.utc), 0)
+    # The user's biggest notebook, for the notebook queries
+    notebook = db.query(entries.notebook_id).filter(entries.user_id == user_id, entries.notebook_id.isnot(None)).group_by(
+        entries.notebook_id).order_by(func.count().desc()).first()
+    notebook_id = notebook.notebook_id if notebook else 0
+    now = datetime.now(timezone.utc)
+
+    queries = {
+        "GET /journal-entries": by_user.order_by(*newest_first),
+        "GET /journal-entries?limit": by_user.order_by(*newest_first).limit(page_size + 1),
+        "GET /journal-entries?limit&cursor": by_user.filter(
+            pagination.keyset_after(entries.created_at, entries.id, cursor, db.get_bind().dialect.name)
+        ).order_by(*newest_first).limit(page_size + 1),
+        "GET /journal-entries?sentiment": by_user.filter(entries.sentiment == "positive").order_by(*newest_first),
+        "GET /journal-entries?notebook_id": by_user.filter(entries.notebook_id == notebook_id).order_by(*newest_first),
+        "GET /notebooks?summary": _notebook_summaries(db, user_id),
+        "GET /notebooks/{id}/entries": by_user.filter(entries.notebook_id == notebook_id).order_by(
+            *newest_first).limit(page_size + 1),
+        "POST /notebooks/auto-generate": db.query(entries).filter(
+            entries.user_id == user_id,
+            entries.created_at >= now - timedelta(days=7),
+            entries.created_at <= now,
+            entries.notebook_id == None,
+        ),
+        "POST /chat (index build)": db.query(
+            entries.id, entries.embedding, entries.embedding_model, entries.embedding_version
+        ).filter(entries.user_id == user_id),
+    }
+    statements = {name: query.statement for name, query in queries.items()}
+    search_statement = entry_search.search_statement(db.get_bind().dialect.name, user_id, search)
+    if search_statement is not None:
+        statements["GET /journal-entries?search"] = search_statement
+    return statements
+
+
+def explain(db, statement, analyze: bool = True):
+    """Returns the plan of `statement` as a list of lines."""
+    connection = db.connection()
+    dialect = connection.dialect
+    compiled = statement.compile(dialect=dialect)
+    if dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    elif dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    rows = connection.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    if dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def summarize(plan):
+    """Indexes used, tables scanned sequentially, and the execution time (Postgres ANALYZE only)."""
+    text = "\n".join(plan)
+    indexes = sorted(set(re.findall(r"(?:Index Scan|Index Only Scan) using (\w+)", text))
+                     | set(re.findall(r"Bitmap Index Scan on (\w+)", text))
+                     | set(re.findall(r"USING (?:COVERING )?INDEX (\w+)", text)))
+    scans = sorted(set(re.findall(r"Seq Scan on (\w+)", text)) | set(re.findall(r"^SCAN (\w+)(?!\w| VIRTUAL TABLE)", text, re.MULTILINE)))
+    timing = re.search(r"Execution Time: ([\d.]+) ms", text)
+    return {"indexes": indexes, "seq_scans": scans, "ms": float(timing.group(1)) if timing else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture EXPLAIN plans of the API's hot queries.")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--search", default="today", help="Search term for the search query")
+    parser.add_argument("--output", default="plans.json")
+    parser.add_argument("--compare", default=None, help="Earlier --output file to compare against")
+    parser.add_argument("--no-analyze", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_id = args.user_id or _busiest_user(db)
+        results = {}
+        for name, statement in endpoint_queries(db, user_id, args.search).items():
+            plan = explain(db, statement, analyze=not args.no_analyze)
+            results[name] = {"plan": plan, **summarize(plan)}
+        db.rollback()
+    finally:
+        db.close()
+
+    with open(args.output, "w") as f:
+        json.dump({"user_id": user_id, "queries": results}, f, indent=2)
+    print(f"Saved {len(results)} plans for user {user_id} to {args.output}\n")
+
+    before = {}
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)["queries"]
+
+    for name, result in results.items():
+        print(f"--- {name} ---")
+        if name in before:
+            old = before[name]
+            print(f"  before: indexes={old['indexes'] or '-'} seq_scans={old['seq_scans'] or '-'} ms={old['ms']}")
+            print(f"  after:  indexes={result['indexes'] or '-'} seq_scans={result['seq_scans'] or '-'} ms={result['ms']}")
+        else:
+            print(f"  indexes={result['indexes'] or '-'} seq_scans={result['seq_scans'] or '-'} ms={result['ms']}")
+            print("  " + "\n  ".join(result["plan"]))
+
+
+if __name__ == "__main__":
+    main()
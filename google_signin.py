@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from google.auth import transport
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+import metrics
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# Where Google's ID-token signing certificates are fetched from (point it
+# at a local stand-in for tests, see verify_google_auth.py)
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# Connections kept open to Google
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "4"))
+# Timeout (seconds) for fetching the certificates
+GOOGLE_HTTP_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", "10"))
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+metrics.describe("google_certs_cache_hits_total", "counter", "Google certificate lookups answered from the cache")
+metrics.describe("google_certs_fetches_total", "counter", "Google certificate downloads")
+
+
+class _CachedResponse(transport.Response):
+    def __init__(self, status, headers, data):
+        self._status = status
+        self._headers = headers
+        self._data = data
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def data(self):
+        return self._data
+
+
+def _max_age(headers) -> float:
+    """Seconds a response may be reused for, from Cache-Control max-age minus Age (0: don't cache)."""
+    cache_control = headers.get("Cache-Control", headers.get("cache-control", "")).lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if not match:
+        return 0
+    age = headers.get("Age", headers.get("age", "0"))
+    return max(0, int(match.group(1)) - (int(age) if str(age).isdigit() else 0))
+
+
+class CachingRequest(transport.Request):
+    """
+    google-auth transport shared by the whole process: requests go over
+    one pooled HTTP session (kept-alive connections), and successful GET
+    responses are reused for as long as their Cache-Control max-age
+    allows. Google's certificate endpoint sends a max-age of several
+    hours, so verifying an ID token is normally local CPU work only.
+    Only one thread re-downloads an expired response; the others wait
+    for it.
+    """
+
+    def __init__(self, pool_size: int = GOOGLE_HTTP_POOL_SIZE, timeout: float = GOOGLE_HTTP_TIMEOUT_SECONDS):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self._request = google_requests.Request(session=session)
+        self.timeout = timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _cached(self, url):
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        timeout = timeout or self.timeout
+        if method != "GET" or body is not None:
+            return self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        response = self._cached(url)
+        if response is not None:
+            metrics.inc("google_certs_cache_hits_total")
+            return response
+        with self._fetch_lock:
+            # Another thread may have refreshed it while we waited
+            response = self._cached(url)
+            if response is not None:
+                metrics.inc("google_certs_cache_hits_total")
+                return response
+            response = self._request(url, method="GET", headers=headers, timeout=timeout, **kwargs)
+            metrics.inc("google_certs_fetches_total")
+            max_age = _max_age(response.headers) if response.status == 200 else 0
+            if max_age > 0:
+                response = _CachedResponse(response.status, dict(response.headers), response.data)
+                with self._lock:
+                    self._cache[url] = (response, time.monotonic() + max_age)
+            return response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# One transport (and certificate cache) per process
+http_request = CachingRequest()
+
+
+def verify_id_token(token: str, audience: str, request: transport.Request = http_request):
+    """
+    Verifies a Google ID token (signature, expiry, audience and issuer)
+    and returns its claims. Raises ValueError if it isn't valid.
+    """
+    id_info = id_token.verify_token(token, request, audience=audience, certs_url=GOOGLE_CERTS_URL)
+    if id_info.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {id_info.get('iss')}")
+    return id_info
+
+
+def unique_username(db, base_username: str) -> str:
+    """
+    `base_username`, or base_username + the smallest number that isn't
+    taken, found with one query for every username starting with it.
+    """
+    escaped = base_username.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    taken = {
+        row.username for row in
+        db.query(models.User.username).filter(models.User.username.like(f"{escaped}%", escape="\\"))
+    }
+    username = base_username
+    counter = 1
+    while username in taken:
+        username = f"{base_username}{counter}"
+        counter += 1
+    return username
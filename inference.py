@@ -0,0 +1,33 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- .env variables ---
+# How many model calls may run at the same time
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# Every model call (and audio decode) runs on this pool instead of the
+# event loop or FastAPI's request threadpool. PyTorch releases the GIL
+# during forward passes, so threads give real parallelism here while
+# sharing one copy of the weights.
+_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+def call(fn, *args, **kwargs):
+    """Runs fn on the inference pool and waits for the result (for sync code)."""
+    return _executor.submit(fn, *args, **kwargs).result()
+
+
+async def run(fn, *args, **kwargs):
+    """Runs fn on the inference pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# Results kept in each in-process LRU (sentiment labels are tiny, embeddings ~1.5 KB each)
+INFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("INFERENCE_CACHE_MAX_ENTRIES", "10000"))
+# Set to 0 to skip the database tier and only cache in memory
+INFERENCE_CACHE_PERSIST = os.getenv("INFERENCE_CACHE_PERSIST", "1") == "1"
+# Database rows older than this many days are deleted (0: no age limit)
+INFERENCE_CACHE_TTL_DAYS = int(os.getenv("INFERENCE_CACHE_TTL_DAYS", "30"))
+# Most database rows kept per kind; the oldest go first (0: no limit)
+INFERENCE_CACHE_MAX_ROWS = int(os.getenv("INFERENCE_CACHE_MAX_ROWS", "100000"))
+# How often each process prunes the table (seconds)
+INFERENCE_CACHE_PRUNE_SECONDS = float(os.getenv("INFERENCE_CACHE_PRUNE_SECONDS", "3600"))
+
+metrics.describe("inference_cache_hits_total", "counter", "Model outputs served from the inference cache, by tier")
+metrics.describe("inference_cache_misses_total", "counter", "Texts that had to go through the model")
+
+
+def normalize(text: str) -> str:
+    """Unicode NFC with whitespace collapsed. Case is kept: the models are case-sensitive."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(kind: str, model_tag: str, text: str) -> str:
+    return hashlib.sha256(f"{kind}\0{model_tag}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+def prune(db, kind: str, ttl_days: int = INFERENCE_CACHE_TTL_DAYS, max_rows: int = INFERENCE_CACHE_MAX_ROWS) -> int:
+    """
+    Deletes one kind's persisted rows that are older than `ttl_days`, then
+    the oldest ones beyond `max_rows`. Returns how many were deleted.
+    """
+    entries = models.InferenceCacheEntry
+    removed = 0
+    if ttl_days > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+        removed += db.query(entries).filter(
+            entries.kind == kind, entries.created_at < cutoff
+        ).delete(synchronize_session=False)
+    if max_rows > 0:
+        # created_at of the newest row over the limit (ix_inference_cache_kind_created)
+        newest_excess = db.query(entries.created_at).filter(entries.kind == kind).order_by(
+            entries.created_at.desc()
+        ).offset(max_rows).limit(1).scalar()
+        if newest_excess is not None:
+            removed += db.query(entries).filter(
+                entries.kind == kind, entries.created_at <= newest_excess
+            ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+class InferenceCache:
+    """
+    Two-tier cache of one model's per-text outputs, keyed by a hash of the
+    normalized text and the model tag (so a model change never serves old
+    results).
+
+    Lookups go to an in-process LRU first, then (with a `session_factory`)
+    to the inference_cache table, and only the remaining texts are passed to
+    `compute(texts)`. Callers that compute elsewhere (e.g. on a batcher
+    thread) use lookup() and store() around it instead.
+    `dump`/`load` convert a result to and from bytes.
+    The table is pruned by age and size (see prune) every
+    INFERENCE_CACHE_PRUNE_SECONDS, when new results are written.
+    """
+
+    def __init__(self, kind: str, model_tag: str, dump, load, session_factory=None,
+                 max_entries: int = INFERENCE_CACHE_MAX_ENTRIES):
+        self.kind = kind
+        self.model_tag = model_tag
+        self.dump = dump
+        self.load = load
+        self.session_factory = session_factory if INFERENCE_CACHE_PERSIST else None
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def peek(self, text: str):
+        """In-memory lookup only (never touches the database). Returns None on a miss."""
+        key = cache_key(self.kind, self.model_tag, text)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                metrics.inc("inference_cache_hits_total", kind=self.kind, tier="memory")
+                return self._lru[key]
+        return None
+
+    def lookup(self, text: str):
+        """
+        Memory, then database lookup for one text. Returns None on a miss;
+        the caller computes the result and hands it to store().
+        """
+        value = self.peek(text)
+        if value is not None:
+            return value
+        key = cache_key(self.kind, self.model_tag, text)
+        value = self._load_persisted([key]).get(key)
+        if value is not None:
+            metrics.inc("inference_cache_hits_total", kind=self.kind, tier="db")
+            self._remember(key, value)
+            return value
+        metrics.inc("inference_cache_misses_total", kind=self.kind)
+        return None
+
+    def store(self, text: str, value):
+        """Caches a result computed after a lookup() miss, in both tiers."""
+        key = cache_key(self.kind, self.model_tag, text)
+        self._remember(key, value)
+        self._persist({key: value})
+
+    def get_many(self, texts, compute):
+        """Returns one result per text, calling `compute` only for texts no tier has seen."""
+        keys = [cache_key(self.kind, self.model_tag, text) for text in texts]
+        results = [None] * len(texts)
+
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    results[i] = self._lru[key]
+                else:
+                    missing.setdefault(key, []).append(i)
+        memory_hits = len(texts) - sum(len(positions) for positions in missing.values())
+        if memory_hits:
+            metrics.inc("inference_cache_hits_total", memory_hits, kind=self.kind, tier="memory")
+        if not missing:
+            return results
+
+        for key, value in self._load_persisted(list(missing)).items():
+            for i in missing.pop(key):
+                results[i] = value
+                metrics.inc("inference_cache_hits_total", kind=self.kind, tier="db")
+            self._remember(key, value)
+        if not missing:
+            return results
+
+        # Each distinct text goes through the model once, however often it repeats
+        pending = list(missing)
+        metrics.inc("inference_cache_misses_total", len(pending), kind=self.kind)
+        computed = compute([texts[missing[key][0]] for key in pending])
+        for key, value in zip(pending, computed):
+            for i in missing[key]:
+                results[i] = value
+            self._remember(key, value)
+        self._persist(dict(zip(pending, computed)))
+        return results
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _load_persisted(self, keys):
+        if self.session_factory is None:
+            return {}
+        db = self.session_factory()
+        try:
+            rows = db.query(models.InferenceCacheEntry.key, models.InferenceCacheEntry.value).filter(
+                models.InferenceCacheEntry.key.in_(keys)
+            ).all()
+            return {row.key: self.load(row.value) for row in rows}
+        except Exception as e:
+            print(f"Inference cache lookup failed: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def _persist(self, values):
+        if self.session_factory is None or not values:
+            return
+        db = self.session_factory()
+        try:
+            db.add_all([
+                models.InferenceCacheEntry(key=key, kind=self.kind, value=self.dump(value))
+                for key, value in values.items()
+            ])
+            db.commit()
+        except IntegrityError:
+            # Another worker cached the same text first; its result is just as good
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to persist inference cache entries: {e}")
+        try:
+            self._maybe_prune(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to prune the inference cache: {e}")
+        finally:
+            db.close()
+
+    def _maybe_prune(self, db):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + INFERENCE_CACHE_PRUNE_SECONDS
+        removed = prune(db, self.kind)
+        if removed:
+            print(f"Pruned {removed} old {self.kind} rows from the inference cache.")
+
+
+def dump_json(value) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def load_json(blob: bytes):
+    return json.loads(blob)
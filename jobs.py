@@ -0,0 +1,243 @@
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+load_dotenv()
+
+# --- .env variables ---
+# Where uploads wait until their job has run (must survive restarts)
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", "job_uploads")
+# Number of background threads processing voice jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+# How often idle workers check the database for queued jobs
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+# A job interrupted this many times (e.g. by crashes) is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job belongs to its worker for this long (seconds) and the worker
+# renews it every third of that; a job whose lease runs out (its process
+# died) is re-queued by any other process
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+def create_voice_job(db, user_id: int, upload_file, notebook_id=None, idempotency_key=None):
+    """
+    Stores the upload on disk and queues a job for it.
+    If the same user already sent this idempotency key, returns that job instead.
+    """
+    def existing_job():
+        return db.query(models.VoiceJob).filter(
+            models.VoiceJob.user_id == user_id,
+            models.VoiceJob.idempotency_key == idempotency_key,
+        ).first()
+
+    if idempotency_key:
+        existing = existing_job()
+        if existing:
+            return existing
+
+    os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    suffix = os.path.splitext(upload_file.filename or "")[1] or ".webm"
+    audio_path = os.path.join(JOB_UPLOAD_DIR, f"{job_id}{suffix}")
+    with open(audio_path, "wb") as buffer:
+        shutil.copyfileobj(upload_file.file, buffer)
+
+    job = models.VoiceJob(
+        id=job_id,
+        user_id=user_id,
+        idempotency_key=idempotency_key,
+        status="queued",
+        stage="queued",
+        progress=0,
+        attempts=0,
+        audio_path=audio_path,
+        notebook_id=notebook_id,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key got there first (the
+        # database enforces one job per user and key)
+        db.rollback()
+        os.remove(audio_path)
+        existing = existing_job() if idempotency_key else None
+        if existing is None:
+            raise
+        return existing
+    db.refresh(job)
+    return job
+
+
+class JobWorker:
+    """
+    Runs queued voice jobs on background threads.
+
+    `handler(db, job, report)` does the actual work and returns the new
+    entry's ID; it calls `report(stage, progress)` as it moves through the
+    pipeline. Job state lives in the database, so any process can report on
+    it. A running job is leased to the worker process that claimed it,
+    which keeps renewing the lease; jobs whose lease ran out (their process
+    stopped) are re-queued, while those of live processes are left alone.
+    """
+
+    def __init__(self, session_factory, handler, workers: int = JOB_WORKERS,
+                 poll_seconds: float = JOB_POLL_SECONDS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.handler = handler
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims in voice_jobs.worker_id
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._requeue_expired()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"voice-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="voice-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def wake(self):
+        """Tells idle workers a job was just queued."""
+        self._wake.set()
+
+    def _lease_expiry(self):
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    def _requeue_expired(self):
+        db = self.session_factory()
+        try:
+            requeued = db.query(models.VoiceJob).filter(
+                models.VoiceJob.status == "running",
+                or_(models.VoiceJob.lease_expires_at.is_(None),
+                    models.VoiceJob.lease_expires_at < datetime.now(timezone.utc)),
+            ).update({
+                "status": "queued",
+                "worker_id": None,
+                "lease_expires_at": None,
+                "updated_at": func.now(),
+            }, synchronize_session=False)
+            db.commit()
+            if requeued:
+                print(f"Re-queued {requeued} interrupted voice job(s).")
+                self.wake()
+        finally:
+            db.close()
+
+    def _renew_leases(self):
+        db = self.session_factory()
+        try:
+            db.query(models.VoiceJob).filter(
+                models.VoiceJob.status == "running",
+                models.VoiceJob.worker_id == self.worker_id,
+            ).update({"lease_expires_at": self._lease_expiry()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self._renew_leases()
+                self._requeue_expired()
+            except Exception as e:
+                print(f"Voice job heartbeat error: {e}")
+
+    def _claim(self, db):
+        """Atomically moves the oldest queued job to 'running'. Returns it or None."""
+        while True:
+            candidate = db.query(models.VoiceJob.id).filter(
+                models.VoiceJob.status == "queued"
+            ).order_by(models.VoiceJob.created_at).first()
+            if candidate is None:
+                return None
+
+            claimed = db.query(models.VoiceJob).filter(
+                models.VoiceJob.id == candidate.id,
+                models.VoiceJob.status == "queued",
+            ).update({
+                "status": "running",
+                "attempts": models.VoiceJob.attempts + 1,
+                "worker_id": self.worker_id,
+                "lease_expires_at": self._lease_expiry(),
+                "updated_at": func.now(),
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.query(models.VoiceJob).filter(models.VoiceJob.id == candidate.id).first()
+            # Another worker got it first; try the next one
+
+    def _update(self, job_id, **values):
+        # Progress goes through its own short session so it is visible immediately.
+        # Only while we still hold the job: if our lease ran out and another
+        # process took it over, its updates win.
+        db = self.session_factory()
+        try:
+            values["updated_at"] = func.now()
+            if values.get("status") in TERMINAL_STATUSES:
+                values.update(worker_id=None, lease_expires_at=None)
+            db.query(models.VoiceJob).filter(
+                models.VoiceJob.id == job_id,
+                models.VoiceJob.worker_id == self.worker_id,
+            ).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            db = self.session_factory()
+            try:
+                job = self._claim(db)
+                if job is None:
+                    db.close()
+                    self._wake.wait(self.poll_seconds)
+                    self._wake.clear()
+                    continue
+                self._process(db, job)
+            except Exception as e:
+                print(f"Voice job worker error: {e}")
+            finally:
+                db.close()
+
+    def _process(self, db, job):
+        job_id = job.id
+        if job.attempts > JOB_MAX_ATTEMPTS:
+            self._update(job_id, status="failed", stage="failed", error="Too many attempts")
+            return
+
+        def report(stage, progress):
+            self._update(job_id, stage=stage, progress=progress)
+
+        try:
+            entry_id = self.handler(db, job, report)
+        except Exception as e:
+            db.rollback()
+            print(f"Voice job {job_id} failed: {e}")
+            self._update(job_id, status="failed", stage="failed", error=str(e))
+            return
+
+        self._update(job_id, status="succeeded", stage="done", progress=100, entry_id=entry_id)
+        try:
+            os.remove(job.audio_path)
+        except OSError:
+            pass
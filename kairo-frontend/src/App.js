@@ -69,7 +69,7 @@ function App() {
   const fetchAllEntries = async () => {
     try {
       // Fetch all entries for stats and dashboard
-      const data = await api.getEntries(token);
+      const data = await api.getAllEntries(token);
       setAllEntries(data);
     } catch (err) {
       console.error('Failed to fetch entries:', err);
@@ -1,6 +1,12 @@
 import axios from 'axios';
 
 const API_URL = 'http://127.0.0.1:8000';
+// Entries per page in the journal list, and per request when loading them all
+// (the server's DEFAULT_PAGE_SIZE / MAX_PAGE_SIZE)
+const ENTRY_PAGE_SIZE = 50;
+const MAX_ENTRY_PAGE_SIZE = 200;
+// Safety stop for getAllEntries (MAX_ENTRY_PAGES * MAX_ENTRY_PAGE_SIZE entries)
+const MAX_ENTRY_PAGES = 500;
 
 const api = {
     // --- Auth ---
@@ -63,7 +69,9 @@ const api = {
 
     // --- Notebooks ---
     getNotebooks: async (token) => {
+        // Summary mode: entry counts instead of every notebook's entries
         const response = await axios.get(`${API_URL}/notebooks`, {
+            params: { summary: true },
             headers: { Authorization: `Bearer ${token}` }
         });
         return response.data;
@@ -84,23 +92,37 @@ const api = {
     },
 
     // --- Entries ---
-    getEntries: async (token, search = '', sentiment = '', notebookId = null) => {
-        let url = `${API_URL}/journal-entries`;
+    // One page of entries: { items, next_cursor } (next_cursor is null on the last page)
+    getEntries: async (token, search = '', sentiment = '', notebookId = null, cursor = null, limit = ENTRY_PAGE_SIZE) => {
         const params = new URLSearchParams();
         if (search) params.append('search', search);
         if (sentiment && sentiment !== 'All') params.append('sentiment', sentiment);
         if (notebookId && notebookId !== 'all') params.append('notebook_id', notebookId);
+        params.append('limit', limit);
+        if (cursor) params.append('cursor', cursor);
 
-        if (Array.from(params).length > 0) {
-            url += `?${params.toString()}`;
-        }
-
-        const response = await axios.get(url, {
+        const response = await axios.get(`${API_URL}/journal-entries?${params.toString()}`, {
             headers: { Authorization: `Bearer ${token}` }
         });
         return response.data;
     },
 
+    // Every entry, fetched page by page (for the dashboard views). Stops if the
+    // server hands back a cursor it already gave, or after MAX_ENTRY_PAGES pages.
+    getAllEntries: async (token) => {
+        const entries = [];
+        const seenCursors = new Set();
+        let cursor = null;
+        for (let pages = 0; pages < MAX_ENTRY_PAGES; pages++) {
+            const page = await api.getEntries(token, '', '', null, cursor, MAX_ENTRY_PAGE_SIZE);
+            entries.push(...page.items);
+            cursor = page.next_cursor;
+            if (!cursor || seenCursors.has(cursor)) break;
+            seenCursors.add(cursor);
+        }
+        return entries;
+    },
+
     createEntry: async (token, textContent, notebookId = null, imageUrl = null, latitude = null, longitude = null) => {
         const response = await axios.post(`${API_URL}/journal-entries`,
             {
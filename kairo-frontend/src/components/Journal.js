@@ -7,6 +7,8 @@ import heic2any from 'heic2any';
 
 function Journal({ notebookId, notebookTitle, token, onBack, initialText }) {
     const [entries, setEntries] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null); // null once every page is loaded
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
     const [newEntryText, setNewEntryText] = useState(initialText || '');
     const [newEntryImage, setNewEntryImage] = useState(null); // URL of uploaded image
     const [location, setLocation] = useState(null); // { lat, lng }
@@ -49,13 +51,30 @@ function Journal({ notebookId, notebookTitle, token, onBack, initialText }) {
     const handleGetEntries = async () => {
         if (!token) return;
         try {
-            const data = await api.getEntries(token, searchQuery, sentimentFilter, notebookId === 'all' ? null : notebookId);
-            setEntries(data);
+            const page = await api.getEntries(token, searchQuery, sentimentFilter, notebookId === 'all' ? null : notebookId);
+            setEntries(page.items);
+            setNextCursor(page.next_cursor);
         } catch (err) {
             console.error('Failed to fetch entries:', err);
         }
     };
 
+    const handleLoadMore = async () => {
+        if (!token || !nextCursor || isLoadingMore) return;
+        setIsLoadingMore(true);
+        try {
+            const page = await api.getEntries(token, searchQuery, sentimentFilter, notebookId === 'all' ? null : notebookId, nextCursor);
+            const shown = new Set(entries.map(entry => entry.id));
+            setEntries([...entries, ...page.items.filter(entry => !shown.has(entry.id))]);
+            // A repeated cursor would only load the same page again
+            setNextCursor(page.next_cursor !== nextCursor ? page.next_cursor : null);
+        } catch (err) {
+            console.error('Failed to fetch more entries:', err);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     const handleCreateEntry = async (e) => {
         e.preventDefault();
         // Allow submission if there is text OR an image
@@ -441,6 +460,15 @@ function Journal({ notebookId, notebookTitle, token, onBack, initialText }) {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <div style={{ textAlign: 'center', marginTop: '1.5rem' }}>
+                            <NeoButton
+                                text={isLoadingMore ? "Loading..." : "Load more"}
+                                color="#2F81F7"
+                                onClick={handleLoadMore}
+                            />
+                        </div>
+                    )}
                 </div>
                 {/* Google Maps Modal */}
                 {viewingLocation && (
@@ -29,7 +29,7 @@ const NotebookCard = ({ notebook, onClick, onDelete }) => {
             </div>
             <div className="card-body">
                 <h3 className="card-title">{notebook.title}</h3>
-                <p className="card-meta">{date} • {notebook.entries ? notebook.entries.length : 0} entries</p>
+                <p className="card-meta">{date} • {notebook.entry_count ?? (notebook.entries ? notebook.entries.length : 0)} entries</p>
             </div>
         </div>
     );
@@ -3,6 +3,32 @@ import './VoiceRecorder.css';
 import NeoButton from './NeoButton';
 import api from '../api';
 
+// How long to wait for the server's final transcript after sending "stop"
+const FINAL_TRANSCRIPT_TIMEOUT_MS = 10000;
+
+// Sends "stop" (the server then transcribes the words it was still unsure
+// of) and resolves with the final transcript, or null if none arrives
+const finishStream = (ws, onText) => new Promise((resolve) => {
+  if (!ws || ws.readyState !== WebSocket.OPEN) {
+    resolve(null);
+    return;
+  }
+  const timer = setTimeout(() => resolve(null), FINAL_TRANSCRIPT_TIMEOUT_MS);
+  ws.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    if (data.text) onText(data.text);
+    if (data.type === 'final') {
+      clearTimeout(timer);
+      resolve(data.text || '');
+    }
+  };
+  ws.onclose = () => {
+    clearTimeout(timer);
+    resolve(null);
+  };
+  ws.send('stop');
+});
+
 const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) => {
   const [isRecording, setIsRecording] = useState(false);
   const [isProcessing, setIsProcessing] = useState(false);
@@ -10,6 +36,12 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
   const websocketRef = useRef(null);
+  const latestTextRef = useRef(''); // realTimeText, readable from the recorder callbacks
+
+  const showText = (text) => {
+    latestTextRef.current = text;
+    setRealTimeText(text);
+  };
 
   const startRecording = async () => {
     try {
@@ -17,10 +49,10 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
       const mediaRecorder = new MediaRecorder(stream);
       mediaRecorderRef.current = mediaRecorder;
       audioChunksRef.current = [];
-      setRealTimeText('');
+      showText('');
 
       // --- WebSocket Setup ---
-      const ws = new WebSocket('ws://127.0.0.1:8000/ws/transcribe');
+      const ws = new WebSocket('ws://127.0.0.1:8000/ws/transcribe?format=opus');
       websocketRef.current = ws;
 
       ws.onopen = () => {
@@ -30,8 +62,8 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
       ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
         if (data.text) {
-          // The backend now returns the full transcription of the growing file
-          setRealTimeText(data.text);
+          // Confirmed words followed by the current (still changing) guess
+          showText(data.text);
         }
       };
 
@@ -43,16 +75,15 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
         if (event.data.size > 0) {
           audioChunksRef.current.push(event.data);
 
-          // Send the FULL accumulated audio so far (ensures valid headers)
+          // Stream just the new chunk; the server decodes it as one continuous stream
           if (ws.readyState === WebSocket.OPEN) {
-            const fullBlob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
-            ws.send(fullBlob);
+            ws.send(event.data);
           }
         }
       };
 
-      // Start recording with 2-second chunks for streaming
-      mediaRecorder.start(2000);
+      // Start recording with small chunks so text appears quickly
+      mediaRecorder.start(250);
       setIsRecording(true);
     } catch (error) {
       console.error('Error starting recording:', error);
@@ -62,11 +93,9 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
 
   const stopRecording = async (action = 'transcribe') => {
     if (mediaRecorderRef.current && isRecording) {
-      // Close WebSocket
-      if (websocketRef.current) {
-        websocketRef.current.close();
-      }
+      const ws = websocketRef.current;
 
+      // Runs after the recorder's last chunk has been sent on the socket
       mediaRecorderRef.current.onstop = async () => {
         const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
 
@@ -74,11 +103,13 @@ const VoiceRecorder = ({ onTranscriptionComplete, onSave, token, notebookId }) =
         mediaRecorderRef.current.stream.getTracks().forEach(track => track.stop());
 
         if (action === 'transcribe') {
-          // Use the real-time text we already got!
-          // Or fall back to full transcription if needed (but let's trust the stream for now)
-          console.log('Final Real-time Text:', realTimeText);
-          onTranscriptionComplete(realTimeText);
+          // Flush the stream so the last words (still unconfirmed) are included
+          const finalText = await finishStream(ws, showText);
+          if (ws) ws.close();
+          onTranscriptionComplete(finalText ?? latestTextRef.current);
         } else if (action === 'save') {
+          // The upload is transcribed in full on the server
+          if (ws) ws.close();
           await handleSave(audioBlob);
         }
       };
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# --- .env variables ---
+# Whisper's receptive field is 30 s, so that is the natural window length
+LONGFORM_WINDOW_SECONDS = float(os.getenv("LONGFORM_WINDOW_SECONDS", "30.0"))
+# Audio shared by neighbouring windows, so words at a cut are heard whole by one of them
+LONGFORM_OVERLAP_SECONDS = float(os.getenv("LONGFORM_OVERLAP_SECONDS", "5.0"))
+# How far back from the nominal window end to look for a quiet spot to cut at
+LONGFORM_SILENCE_SEARCH_SECONDS = float(os.getenv("LONGFORM_SILENCE_SEARCH_SECONDS", "3.0"))
+# Windows sent to the ASR pipeline per forward pass
+LONGFORM_BATCH_SIZE = int(os.getenv("LONGFORM_BATCH_SIZE", "4"))
+
+# Frame size used to measure loudness when looking for silence
+_FRAME_SECONDS = 0.02
+
+
+def _silence_cut(audio: np.ndarray, target: int, search: int, frame: int) -> int:
+    """Returns the sample index of the quietest frame in audio[target - search:target]."""
+    start = max(frame, target - search)
+    region = audio[start:target]
+    frames = len(region) // frame
+    if frames == 0:
+        return target
+    energy = np.square(region[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+def iter_windows(blocks, sample_rate: int = SAMPLE_RATE,
+                 window_seconds: float = LONGFORM_WINDOW_SECONDS,
+                 overlap_seconds: float = LONGFORM_OVERLAP_SECONDS,
+                 search_seconds: float = LONGFORM_SILENCE_SEARCH_SECONDS):
+    """
+    Cuts a stream of sample blocks into overlapping windows.
+
+    Yields (start_seconds, end_seconds, samples, handoff_seconds): words
+    whose midpoint falls before `handoff_seconds` belong to this window,
+    later ones to the next window (None for the last window). Only about
+    one window of audio is held at a time.
+    """
+    window = int(window_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), window - overlap - 1)
+    frame = int(_FRAME_SECONDS * sample_rate)
+
+    blocks = iter(blocks)
+    buffer = np.zeros(0, dtype='float32')
+    buffer_start = 0
+    exhausted = False
+
+    while True:
+        pieces = [buffer]
+        buffered = len(buffer)
+        while not exhausted and buffered <= window:
+            try:
+                block = next(blocks)
+            except StopIteration:
+                exhausted = True
+                break
+            pieces.append(block)
+            buffered += len(block)
+        buffer = np.concatenate(pieces) if len(pieces) > 1 else buffer
+
+        if len(buffer) == 0:
+            return
+        start_seconds = buffer_start / sample_rate
+        if exhausted and len(buffer) <= window:
+            yield start_seconds, (buffer_start + len(buffer)) / sample_rate, buffer, None
+            return
+
+        end = _silence_cut(buffer, window, search, frame)
+        next_start = max(end - overlap, 1)
+        end_seconds = (buffer_start + end) / sample_rate
+        # Hand off in the middle of the overlap, where both windows have context
+        handoff = (buffer_start + (next_start + end) / 2) / sample_rate
+        yield start_seconds, end_seconds, buffer[:end], handoff
+
+        buffer = buffer[next_start:]
+        buffer_start += next_start
+
+
+def _stitch(result, start_seconds, lower, upper):
+    """Shifts one window's word chunks to absolute time and keeps those in [lower, upper)."""
+    window_end = start_seconds + LONGFORM_WINDOW_SECONDS
+    words = []
+    for chunk in result.get("chunks", []):
+        start, end = chunk.get("timestamp") or (None, None)
+        start = start_seconds + (start or 0.0)
+        end = start_seconds + end if end is not None else window_end
+        midpoint = (start + end) / 2
+        if midpoint < lower or (upper is not None and midpoint >= upper):
+            continue
+        words.append({"text": chunk["text"], "timestamp": (start, end)})
+    return words
+
+
+def transcribe_long(blocks, transcribe_batch, batch_size: int = LONGFORM_BATCH_SIZE,
+                    sample_rate: int = SAMPLE_RATE):
+    """
+    Long-form transcription over a stream of sample blocks (see
+    audio_decode.stream_audio).
+
+    Windows are sent `batch_size` at a time to `transcribe_batch(list_of_arrays)`,
+    which must return one pipeline result with word-level "chunks" per window,
+    e.g. `transcriber(arrays, batch_size=len(arrays), return_timestamps="word")`.
+    Each word is kept by exactly one window, so the overlaps don't produce
+    duplicates. Returns {"text": ..., "chunks": [...]} with absolute timestamps,
+    like a single pipeline call would.
+    """
+    words = []
+    pending = []
+    lower = 0.0
+
+    def flush():
+        nonlocal lower
+        results = transcribe_batch([samples for _, _, samples, _ in pending])
+        for (start_seconds, _, _, handoff), result in zip(pending, results):
+            words.extend(_stitch(result, start_seconds, lower, handoff))
+            lower = handoff
+        pending.clear()
+
+    for window in iter_windows(blocks, sample_rate):
+        pending.append(window)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+    text = "".join(word["text"] for word in words).strip()
+    return {"text": text, "chunks": words}
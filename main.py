@@ -1,20 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Response, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Response, UploadFile, File, Form, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session, joinedload
-from transformers import pipeline
 from  database import  engine, SessionLocal
-from typing import List, Optional
+from typing import List, Optional, Union
 import librosa
 import time
 import schemas
-import utils
 import auth
+import auth_cache
+import password_pool
+import google_signin
 import numpy as np
 import io
 import pydantic
-from sentence_transformers import SentenceTransformer
-import faiss
+import vector_store
+import embeddings
+import retrieval
+import batching
+import inference
+import jobs
+import streaming
+import audio_decode
+import longform
+import ai_models
+from model_registry import ModelRegistry, ModelNotReady
+import metrics
+import inference_cache
+import answer_cache
+import pagination
+import entry_search
+import migrate_db
+import database
+import asyncio
+import contextlib
+import json
 import warnings
 from datetime import datetime, timedelta, date
 from sqlalchemy import func
@@ -27,47 +50,139 @@ warnings.filterwarnings("ignore", category=FutureWarning, module="librosa")
 # Import our new models file and the engine from database.py
 import models
 from database import engine
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 # ---------------------
 
-# --- NEW: CREATE THE DATABASE TABLES ---
-# This line tells SQLAlchemy to find all the classes that
-# inherit from 'Base' (our User and JournalEntry models)
-# and create them as tables in our database.
-models.Base.metadata.create_all(bind=engine)
-# -------------------------------------
 
 # --- AI Models Setup ---
-transcriber = pipeline(
-    'automatic-speech-recognition',
-    model='distil-whisper/distil-medium.en',
-    device='mps'
+# Device and precision (fp32 / int8) come from MODEL_DEVICE and MODEL_PRECISION.
+# The models load in parallel in the background (see startup_event), so the
+# server answers requests that don't need them (login, listing entries, ...)
+# straight away. Endpoints that do need one declare it with require_models().
+print(f"Models will load with precision={ai_models.MODEL_PRECISION}, device={ai_models.resolve_device()}, "
+      f"default backend={ai_models.MODEL_BACKEND}")
+embedding_dimension = vector_store.EMBEDDING_DIMENSION
+
+model_registry = ModelRegistry(sizer=ai_models.model_memory_bytes)
+model_registry.register("transcriber", ai_models.load_transcriber, ai_models.warm_up_transcriber)
+model_registry.register("sentiment", ai_models.load_sentiment_analyzer, ai_models.warm_up_sentiment_analyzer)
+model_registry.register(
+    "embedding",
+    ai_models.load_embedding_model,
+    lambda model: ai_models.warm_up_embedding_model(model, embedding_dimension),
 )
-print("--- Whisper model loaded successfully in 1.84 seconds. ---")
+model_registry.register("summarizer", ai_models.load_summarizer, ai_models.warm_up_summarizer)
+
+def ensure_models_ready(*names):
+    """
+    Answers 503 (with Retry-After) while any of the models is still on its
+    first load, instead of holding the request open. Models that were
+    unloaded to save memory are reloaded, and the request waits for them.
+    """
+    for name in names:
+        try:
+            model_registry.get(name, wait_for_reload=True)
+        except ModelNotReady as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "5"},
+            )
 
-print("Loading Sentiment Analysis model...")
-sentiment_analyzer = pipeline(
-    'text-classification',
-    model='j-hartmann/emotion-english-distilroberta-base',
+def require_models(*names):
+    """Dependency version of ensure_models_ready, for endpoints that always need the models."""
+    def check():
+        ensure_models_ready(*names)
+    return check
+
+# Sentiment labels and embeddings are cached by (model, normalized text):
+# an in-process LRU, in front of the inference_cache table for sentiment.
+# The model only sees texts no tier has seen before.
+sentiment_cache = inference_cache.InferenceCache(
+    "sentiment", ai_models.SENTIMENT_MODEL_TAG,
+    dump=inference_cache.dump_json, load=inference_cache.load_json,
+    session_factory=SessionLocal,
+)
+# Embeddings are cached in memory only: the one worth keeping is already
+# stored on its journal entry row
+embedding_cache = inference_cache.InferenceCache(
+    "embedding", ai_models.EMBEDDING_MODEL_TAG,
+    dump=embeddings.pack, load=embeddings.unpack,
 )
-print("--- Sentiment model loaded successfully. ---")
 
-print("Loading Embedding model for RAG...")
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-# FAISS Index (will be initialized/populated on startup)
-vector_index = None
-# Mapping from FAISS index ID to Database Entry ID
-index_id_to_entry_id = {}
-print("--- Embedding model loaded. ---")
+def run_sentiment_model(texts):
+    return inference.call(model_registry.wait("sentiment"), texts, batch_size=len(texts), truncation=True)
 
-print("Loading Summarization model...")
-summarizer = pipeline("summarization", model="sshleifer/distilbart-cnn-12-6")
-print("--- Summarization model loaded. ---")
+# Concurrent sentiment requests are grouped into one batched forward pass.
+# Each caller gets back its own {'label': ..., 'score': ...} dict. Only cache
+# misses reach it: lookups and write-backs (database I/O) happen on the
+# callers' threads, so the batcher thread does nothing but inference.
+sentiment_batcher = batching.MicroBatcher(
+    run_sentiment_model,
+    max_batch_size=batching.SENTIMENT_MAX_BATCH_SIZE,
+    max_wait_ms=batching.SENTIMENT_MAX_WAIT_MS,
+    name="sentiment-batcher",
+)
+
+def classify_sentiment(text):
+    """Sentiment for one text; cache hits (either tier) skip the batcher entirely."""
+    cached = sentiment_cache.lookup(text)
+    if cached is not None:
+        return cached
+    result = sentiment_batcher(text)
+    sentiment_cache.store(text, result)
+    return result
+
+def encode_texts(texts, wait=False):
+    """
+    Embeddings (one row per text) through the embedding cache. With wait=True
+    (background work) the call waits for the model instead of failing fast.
+    """
+    def run_model(missing):
+        model = model_registry.wait("embedding") if wait else model_registry.get("embedding", wait_for_reload=True)
+        return list(inference.call(model.encode, missing))
+    return np.vstack(embedding_cache.get_many(texts, run_model))
+
+# --- Awaitable model wrappers ---
+# Async endpoints must never call a model (or decode audio) directly: a
+# single Whisper run would freeze the event loop for every other request.
+# These run the work on the inference pool instead.
+def transcribe_recording(audio_bytes):
+    """
+    Decodes and transcribes a whole upload in long-form mode: overlapping
+    windows, batched through Whisper, stitched back together. Memory stays
+    bounded by the batch of windows, however long the recording is.
+    """
+    transcriber = model_registry.wait("transcriber")
+    return longform.transcribe_long(
+        audio_decode.stream_audio(audio_bytes),
+        lambda windows: transcriber(windows, batch_size=len(windows),
+                                    return_timestamps=ai_models.TRANSCRIBER_TIMESTAMPS),
+    )
+
+async def transcribe_recording_async(audio_bytes):
+    return await inference.run(transcribe_recording, audio_bytes)
+
+def transcribe_words(audio_data):
+    """Transcription with word-level timestamps (segment-level on ONNX), as the streaming session needs."""
+    return model_registry.wait("transcriber")(audio_data, return_timestamps=ai_models.TRANSCRIBER_TIMESTAMPS)
+
+async def classify_sentiment_async(text):
+    # Memory hits are answered on the loop; the database tier goes through the threadpool
+    cached = sentiment_cache.peek(text)
+    if cached is None:
+        cached = await run_in_threadpool(sentiment_cache.lookup, text)
+    if cached is not None:
+        return cached
+    result = await asyncio.wrap_future(sentiment_batcher.submit(text))
+    await run_in_threadpool(sentiment_cache.store, text, result)
+    return result
+
+async def embed_async(texts):
+    return await run_in_threadpool(encode_texts, texts)
 
 def get_db():
     db = SessionLocal()
@@ -76,11 +191,82 @@ def get_db():
     finally:
         db.close()
 
+@contextlib.asynccontextmanager
+async def async_session():
+    """
+    Session for async code: an AsyncSession when an async engine is
+    configured (see database.py), otherwise a regular Session. Run queries
+    on either with run_db().
+    """
+    if database.AsyncSessionLocal is not None:
+        async with database.AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def get_async_db():
+    async with async_session() as db:
+        yield db
+
+async def run_db(db, fn, *args):
+    """
+    Runs fn(session, *args), plain (sync) SQLAlchemy code, without blocking
+    the event loop. On an AsyncSession its queries are awaited on the loop,
+    so no thread or pooled connection is held while the request waits for
+    anything else; on a regular Session the call runs in the threadpool.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args)
+    return await db.run_sync(fn, *args)
+
+async def run_db_in_thread(db, fn, *args):
+    """
+    Like run_db() for results of unbounded size, returned as a ready
+    JSONResponse. run_sync() runs fn on the event-loop thread, so loading
+    and converting thousands of rows (and FastAPI encoding them) would
+    stall every other request: here all of it happens in the threadpool,
+    on a regular Session when db is an AsyncSession.
+    """
+    def call(session):
+        return JSONResponse(jsonable_encoder(fn(session, *args)))
+
+    if isinstance(db, Session):
+        return await run_in_threadpool(call, db)
+
+    def call_with_session():
+        session = SessionLocal()
+        try:
+            return call(session)
+        finally:
+            session.close()
+    return await run_in_threadpool(call_with_session)
+
+# bcrypt runs on its own bounded process pool (see password_pool.py)
+password_hasher = password_pool.PasswordPool()
+
+def run_password_job(fn, *args):
+    """Runs a password_hasher call; 503 with Retry-After when its queue is full (or its workers keep crashing)."""
+    try:
+        return fn(*args)
+    except password_pool.PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now, please try again shortly.",
+            headers={"Retry-After": "2"},
+        )
+
+# Recently verified tokens and the users they belong to (see auth_cache.py)
+credential_cache = auth_cache.AuthCache()
+
 # --- NEW: "GET CURRENT USER" DEPENDENCY ---
 def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
     """
     Dependency that verifies a user's token and returns
-    the user object from the database.
+    the user (an auth_cache.CachedUser, not a database row).
     """
     
     # This is the exception we'll raise if the token is bad
@@ -90,17 +276,9 @@ def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Dep
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Verify the token
-    token_data = auth.verify_access_token(token, credentials_exception)
-    
-    # Get the user from the database using the ID in the token
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
-    
-    if user is None:
-        raise credentials_exception
-        
-    # Return the full user object
-    return user
+    # Verify the token and get its user, from the auth cache when possible
+    # (no JWT decode or database query for recently seen tokens/users)
+    return credential_cache.authenticate(token, db, credentials_exception)
 
 # --- API Server Setup ---
 # Create an instance of the FastAPI class
@@ -155,11 +333,17 @@ def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session =
         )
         
     # 3. Check if password is correct
-    if not utils.verify_password(user_credentials.password, user.hashed_password):
+    if not run_password_job(password_hasher.verify, user_credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid credentials"
         )
+
+    # Upgrade hashes made with an older BCRYPT_ROUNDS (when the pool has room)
+    new_hash = password_hasher.rehash_if_idle(user_credentials.password, user.hashed_password)
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
         
     # 4. User is valid, create an access token
     # We store the user's ID in the token
@@ -184,11 +368,8 @@ def google_auth(auth_request: schemas.GoogleAuthRequest, db: Session = Depends(g
         # BUT google lib requires audience.
         # We will assume the user will update GOOGLE_CLIENT_ID in main.py too.
         
-        id_info = id_token.verify_oauth2_token(
-            auth_request.token, 
-            google_requests.Request(), 
-            audience=GOOGLE_CLIENT_ID
-        )
+        # Signing certificates are cached for their max-age (see google_signin.py)
+        id_info = google_signin.verify_id_token(auth_request.token, audience=GOOGLE_CLIENT_ID)
 
         email = id_info['email']
         name = id_info.get('name', '')
@@ -206,16 +387,10 @@ def google_auth(auth_request: schemas.GoogleAuthRequest, db: Session = Depends(g
             # Generate a random password (they won't use it, but we need it for DB)
             import secrets
             random_password = secrets.token_urlsafe(16)
-            hashed_password = utils.hash_password(random_password)
+            hashed_password = run_password_job(password_hasher.hash, random_password)
             
-            # Generate username from email (part before @)
-            base_username = email.split("@")[0]
-            # Ensure uniqueness
-            username = base_username
-            counter = 1
-            while db.query(models.User).filter(models.User.username == username).first():
-                username = f"{base_username}{counter}"
-                counter += 1
+            # Generate username from email (part before @), made unique with a number
+            username = google_signin.unique_username(db, email.split("@")[0])
             
             new_user = models.User(
                 email=email,
@@ -234,6 +409,9 @@ def google_auth(auth_request: schemas.GoogleAuthRequest, db: Session = Depends(g
         
         return {"access_token": access_token, "token_type": "bearer"}
 
+    except HTTPException:
+        # Our own errors (account exists, busy) go out as they are
+        raise
     except ValueError as e:
         # Invalid token
         raise HTTPException(status_code=400, detail=f"Invalid Google Token: {str(e)}")
@@ -242,7 +420,7 @@ def google_auth(auth_request: schemas.GoogleAuthRequest, db: Session = Depends(g
 
 # --- NEW: PROTECTED ENDPOINT ---
 @app.get("/users/me", response_model=schemas.UserResponse)
-def get_user_me(current_user: models.User = Depends(get_current_user)):
+def get_user_me(current_user: auth_cache.CachedUser = Depends(get_current_user)):
     """
     A protected route that returns the information
     for the currently logged-in user.
@@ -254,40 +432,47 @@ def get_user_me(current_user: models.User = Depends(get_current_user)):
 def update_user_me(
     user_update: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Updates the currently logged-in user's profile.
     """
+    # current_user may come from the auth cache; change the actual row
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+
     # Check for username/email uniqueness if they are being changed
-    if user_update.email and user_update.email != current_user.email:
+    if user_update.email and user_update.email != user.email:
         existing_email = db.query(models.User).filter(models.User.email == user_update.email).first()
         if existing_email:
             raise HTTPException(status_code=400, detail="Email already registered")
-        current_user.email = user_update.email
+        user.email = user_update.email
 
-    if user_update.username and user_update.username != current_user.username:
+    if user_update.username and user_update.username != user.username:
         existing_username = db.query(models.User).filter(models.User.username == user_update.username).first()
         if existing_username:
             raise HTTPException(status_code=400, detail="Username already taken")
-        current_user.username = user_update.username
+        user.username = user_update.username
 
     if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
+        user.full_name = user_update.full_name
 
     if user_update.password:
-        current_user.hashed_password = utils.hash_password(user_update.password)
+        user.hashed_password = run_password_job(password_hasher.hash, user_update.password)
 
     if user_update.profile_picture_url:
-        current_user.profile_picture_url = user_update.profile_picture_url
+        user.profile_picture_url = user_update.profile_picture_url
 
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    # Profile (or password) changed: don't keep serving the old user from the cache
+    credential_cache.invalidate_user(user.id)
+    return user
 
 # --- NEW: FILE UPLOAD ENDPOINT ---
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...), current_user: models.User = Depends(get_current_user)):
+async def upload_file(file: UploadFile = File(...), current_user: auth_cache.CachedUser = Depends(get_current_user)):
     try:
         # Create a unique filename
         file_ext = os.path.splitext(file.filename)[1]
@@ -304,21 +489,21 @@ async def upload_file(file: UploadFile = File(...), current_user: models.User =
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
 # --- NEW: CREATE JOURNAL ENTRY ENDPOINT ---
-@app.post("/journal-entries", status_code=status.HTTP_201_CREATED, response_model=schemas.JournalEntryResponse)
+@app.post("/journal-entries", status_code=status.HTTP_201_CREATED, response_model=schemas.JournalEntryResponse,
+          dependencies=[Depends(require_models("sentiment"))])
 def create_journal_entry(
     entry: schemas.JournalEntryCreate, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Creates a new journal entry for the currently logged-in user.
     """
     
-    # 1. Run sentiment analysis on the text
-    # The new model returns a list of lists (because of top_k=1)
-    # e.g. [{'label': 'joy', 'score': 0.99}]
-    sentiment_result = sentiment_analyzer(entry.text_content)
-    sentiment_label = sentiment_result[0]['label']  # Extract the label
+    # 1. Run sentiment analysis on the text (batched with concurrent requests)
+    # e.g. {'label': 'joy', 'score': 0.99}
+    sentiment_result = classify_sentiment(entry.text_content)
+    sentiment_label = sentiment_result['label']  # Extract the label
     
     # 2. Create the new entry in the database
     # We get the text from the request (entry.text_content)
@@ -332,9 +517,11 @@ def create_journal_entry(
         latitude=str(entry.latitude) if entry.latitude is not None else None,
         longitude=str(entry.longitude) if entry.longitude is not None else None
     )
+    embed_entry(new_entry)
     
     # 3. Add to database and commit
     db.add(new_entry)
+    answer_cache.bump_journal_version(db, current_user.id)
     db.commit()
     db.refresh(new_entry) # Get the new data back from the DB (like the ID)
     
@@ -348,44 +535,145 @@ def create_journal_entry(
     return new_entry
 
 # --- NEW: GET ALL JOURNAL ENTRIES ENDPOINT ---
-@app.get("/journal-entries", response_model=List[schemas.JournalEntryResponse])
-def get_journal_entries(
+# Columns a client may ask for with ?fields=, in response order
+ENTRY_FIELDS = list(schemas.JournalEntryResponse.model_fields)
+
+def entry_row_to_dict(row, fields):
+    """Builds the response dict for one projected row (no ORM object involved)."""
+    item = {}
+    for field in fields:
+        value = getattr(row, field)
+        if field in ("latitude", "longitude") and value is not None:
+            # Stored as strings, returned as numbers (as JournalEntryResponse does)
+            value = float(value)
+        item[field] = value
+    return item
+
+def select_entry_fields(fields: Optional[str]):
+    """Parses ?fields=a,b,c (400 on unknown names); all fields when not given."""
+    if not fields:
+        return ENTRY_FIELDS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in ENTRY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ENTRY_FIELDS)}"
+        )
+    return selected
+
+def search_journal_entries(db, user_id, search, sentiment, notebook_id, limit, cursor, selected):
+    """
+    Ranked full-text search (see entry_search), best matches first, each
+    entry with a "snippet" of the matching text (matches in <mark>).
+    Search results are paged with an offset cursor since they aren't in
+    created_at order.
+    """
+    try:
+        offset = pagination.decode_offset_cursor(cursor) if cursor else 0
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    paged = limit is not None or cursor is not None
+    page_size = limit or (pagination.DEFAULT_PAGE_SIZE if cursor else entry_search.SEARCH_MAX_RESULTS)
+
+    # Fetch one extra hit to know whether another page exists
+    hits = entry_search.search_entries(db, user_id, search, sentiment, notebook_id, page_size + 1, offset)
+    next_cursor = pagination.encode_offset_cursor(offset + page_size) if len(hits) > page_size else None
+    hits = hits[:page_size]
+
+    # Load the selected columns of all hits in one query, then restore rank order
+    needed = list(dict.fromkeys(selected + ["id"]))
+    rows = db.query(*[getattr(models.JournalEntry, field) for field in needed]).filter(
+        models.JournalEntry.id.in_([hit.entry_id for hit in hits])
+    ).all() if hits else []
+    rows_by_id = {row.id: row for row in rows}
+    items = []
+    for hit in hits:
+        row = rows_by_id.get(hit.entry_id)
+        if row is None:
+            continue  # Deleted between the search and the load
+        item = entry_row_to_dict(row, selected)
+        item["snippet"] = hit.snippet
+        items.append(item)
+
+    if not paged:
+        return items
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/journal-entries", response_model=Union[List[schemas.JournalEntryItem], schemas.JournalEntryPage],
+         response_model_exclude_unset=True)
+async def get_journal_entries(
     search: Optional[str] = None,
     sentiment: Optional[str] = None,
     notebook_id: Optional[int] = None,
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db = Depends(get_async_db),
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
-    Gets all journal entries for the currently logged-in user.
-    Optionally filters by a search query and/or sentiment.
+    Gets journal entries for the currently logged-in user, newest first.
+    Optionally filters by sentiment and/or notebook.
+
+    With `search`, returns the matching entries ranked by relevance
+    instead, each with a highlighted "snippet" (at most
+    SEARCH_MAX_RESULTS of them unless paged with limit/cursor).
+
+    Pass `limit` (and then the returned `cursor`) to page through them:
+    the response becomes {"items": [...], "next_cursor": "..."}, with
+    next_cursor null on the last page (the frontend always pages). Without
+    limit/cursor the full list is returned, for older clients.
+
+    `fields` (e.g. "id,created_at,sentiment") returns only those columns;
+    only they are read from the database.
     """
-    
-    # 1. Query the database
-    query = db.query(models.JournalEntry).filter(models.JournalEntry.user_id == current_user.id)
-    
-    if search:
-        # Case-insensitive search on text_content
-        query = query.filter(models.JournalEntry.text_content.ilike(f"%{search}%"))
+    selected = select_entry_fields(fields)
+
+    sentiment = sentiment.lower() if sentiment and sentiment.lower() != "all" else None
+    if search and search.strip():
+        # At most SEARCH_MAX_RESULTS hits, or one page
+        return await run_db(db, search_journal_entries, current_user.id, search, sentiment, notebook_id, limit, cursor, selected)
+    if limit is None and cursor is None:
+        # The full list, for older clients: keep it off the event loop
+        return await run_db_in_thread(db, list_journal_entries, current_user.id, sentiment, notebook_id, limit, cursor, selected)
+    return await run_db(db, list_journal_entries, current_user.id, sentiment, notebook_id, limit, cursor, selected)
+
+def list_journal_entries(db, user_id, sentiment, notebook_id, limit, cursor, selected):
+    """ The user's entries newest first, as a list or (with limit/cursor) one page. """
+    # 1. Query only the needed columns (the cursor always needs id and created_at)
+    needed = list(dict.fromkeys(selected + ["id", "created_at"]))
+    query = db.query(*[getattr(models.JournalEntry, field) for field in needed]).filter(
+        models.JournalEntry.user_id == user_id
+    )
         
-    if sentiment and sentiment.lower() != "all":
+    if sentiment:
         # Filter by sentiment (exact match, case-insensitive)
-        query = query.filter(models.JournalEntry.sentiment == sentiment.lower())
+        query = query.filter(models.JournalEntry.sentiment == sentiment)
 
     if notebook_id is not None:
         query = query.filter(models.JournalEntry.notebook_id == notebook_id)
-        
-    entries = query.order_by(models.JournalEntry.created_at.desc()).all()
-    
+
     # 2. Return the list of entries
-    return entries
+    if limit is None and cursor is None:
+        rows = query.order_by(models.JournalEntry.created_at.desc(), models.JournalEntry.id.desc()).all()
+        return [entry_row_to_dict(row, selected) for row in rows]
+
+    try:
+        rows, next_cursor = pagination.paginate(
+            query, models.JournalEntry.created_at, models.JournalEntry.id,
+            limit or pagination.DEFAULT_PAGE_SIZE, cursor,
+        )
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"items": [entry_row_to_dict(row, selected) for row in rows], "next_cursor": next_cursor}
 
 # --- NEW: DELETE A JOURNAL ENTRY ENDPOINT ---
 @app.delete("/journal-entries/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_journal_entry(
     entry_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Deletes a specific journal entry by its ID.
@@ -414,53 +702,42 @@ def delete_journal_entry(
         
     # 4. If both checks pass, delete the entry
     entry_query.delete(synchronize_session=False)
+    answer_cache.bump_journal_version(db, current_user.id)
     db.commit()
+
+    # 5. Tombstone it in the RAG index so /chat stops returning it
+    vector_indexes.remove(current_user.id, [entry_id])
     
-    # 5. Return the 204 "No Content" response
+    # 6. Return the 204 "No Content" response
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 import shutil
-import tempfile
-import os
 
 # --- NEW: AUDIO TRANSCRIPTION ENDPOINT ---
-@app.post("/transcribe-audio")
+@app.post("/transcribe-audio", dependencies=[Depends(require_models("transcriber"))])
 async def transcribe_audio(
     audio: UploadFile = File(...),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Transcribes an audio file using the Whisper AI model.
     Returns the transcribed text.
     """
     try:
-        # 1. Save to a temporary file
-        # We use a suffix based on the filename or default to .webm
-        suffix = os.path.splitext(audio.filename)[1] or ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            shutil.copyfileobj(audio.file, tmp_file)
-            tmp_path = tmp_file.name
+        # 1. Read the upload; it is decoded in memory (no temp file) while transcribing
+        audio_bytes = await audio.read()
         
-        try:
-            # 2. Load the audio using librosa from the file path
-            # librosa can now use ffmpeg to handle webm/mp4 etc.
-            audio_data, sampling_rate = librosa.load(tmp_path, sr=16000)
-            
-            # 3. Run the transcription
-            print(f"Transcribing audio for user {current_user.email}...")
-            result = transcriber(audio_data)
-            
-            print(f"Transcription complete: {result['text']}")
-            
-            # 4. Return the transcribed text
-            return {
-                "text": result['text'],
-                "success": True
-            }
-        finally:
-            # Cleanup the temp file
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+        # 2. Run the transcription
+        print(f"Transcribing audio for user {current_user.email}...")
+        result = await transcribe_recording_async(audio_bytes)
+        
+        print(f"Transcription complete: {result['text']}")
+        
+        # 3. Return the transcribed text
+        return {
+            "text": result['text'],
+            "success": True
+        }
     
     except Exception as e:
         print(f"Transcription error: {str(e)}")
@@ -471,119 +748,223 @@ async def transcribe_audio(
 
 # --- RAG Pipeline Logic ---
 
-def refresh_vector_index(db: Session):
+def build_user_index(user_id: int, db: Session):
     """
-    Refreshes the FAISS index with all journal entries from the database.
+    Builds the FAISS index for one user's journal entries from the
+    embeddings stored in the database. Called by the index manager
+    the first time that user needs it.
     """
-    global vector_index, index_id_to_entry_id
-    
-    print("Refreshing RAG Vector Index...")
-    entries = db.query(models.JournalEntry).all()
-    
-    if not entries:
-        print("No entries found. Index is empty.")
-        # Initialize empty index
-        vector_index = faiss.IndexFlatL2(384) # 384 is dimension of all-MiniLM-L6-v2
-        index_id_to_entry_id = {}
-        return
+    user_index = vector_store.UserVectorIndex(user_id, embedding_dimension)
+    rows = db.query(
+        models.JournalEntry.id,
+        models.JournalEntry.embedding,
+        models.JournalEntry.embedding_model,
+        models.JournalEntry.embedding_version,
+    ).filter(models.JournalEntry.user_id == user_id).all()
 
-    # Extract text content
-    texts = [entry.text_content for entry in entries]
-    ids = [entry.id for entry in entries]
-    
-    # Generate embeddings
-    embeddings = embedding_model.encode(texts)
-    
-    # Initialize FAISS index
-    dimension = embeddings.shape[1]
-    vector_index = faiss.IndexFlatL2(dimension)
-    
-    # Add to index
-    vector_index.add(np.array(embeddings).astype('float32'))
-    
-    # Update mapping
-    index_id_to_entry_id = {i: entry_id for i, entry_id in enumerate(ids)}
-    
-    print(f"Index refreshed with {len(entries)} entries.")
+    current = [row for row in rows if embeddings.is_current(row.embedding, row.embedding_model, row.embedding_version,
+                                                      ai_models.EMBEDDING_MODEL_TAG)]
+    if current:
+        user_index.add([row.id for row in current], embeddings.unpack_many([row.embedding for row in current]))
+
+    # Entries with no vector (or one from an older model) are encoded in the
+    # background and added to the index as each batch finishes
+    if len(current) < len(rows):
+        embedding_backfill.wake()
+
+    return user_index
+
+# One FAISS index per active user, loaded lazily and kept in an LRU.
+# Indexes are persisted as snapshots + a write-ahead log so restarts
+# don't have to re-embed every entry.
+vector_indexes = vector_store.VectorIndexManager(
+    loader=build_user_index,
+    memory_budget_bytes=vector_store.VECTOR_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+    idle_seconds=vector_store.VECTOR_INDEX_IDLE_SECONDS,
+    store=vector_store.IndexStore(
+        vector_store.VECTOR_INDEX_DIR,
+        dimension=embedding_dimension,
+        model_tag=ai_models.EMBEDDING_MODEL_TAG,
+        lexical_class=retrieval.BM25Index,
+    ),
+    # BM25 keyword index kept next to each user's vector index for hybrid search
+    # (saved with its snapshots; built from the database when they have none)
+    lexical_loader=retrieval.build_lexical_index,
+)
+
+def on_backfill_batch(user_id, entry_ids, vectors):
+    """Newly embedded entries become searchable, which can change /chat answers."""
+    vector_indexes.add(user_id, entry_ids, vectors)
+    db = SessionLocal()
+    try:
+        answer_cache.bump_journal_version(db, user_id)
+        db.commit()
+    finally:
+        db.close()
+
+embedding_backfill = embeddings.EmbeddingBackfill(
+    session_factory=SessionLocal,
+    encode=lambda texts: encode_texts(texts, wait=True),
+    on_batch=on_backfill_batch,
+    model_tag=ai_models.EMBEDDING_MODEL_TAG,
+)
+
+def embed_entry(entry):
+    """
+    Computes the entry's embedding and stores it on the row.
+    If this fails the background backfill will embed it later.
+    """
+    try:
+        embeddings.stamp(entry, encode_texts([entry.text_content])[0], ai_models.EMBEDDING_MODEL_TAG)
+    except Exception as e:
+        print(f"Failed to embed entry: {e}")
+
+async def embed_entry_async(entry):
+    """Same as embed_entry, for async endpoints."""
+    try:
+        embeddings.stamp(entry, (await embed_async([entry.text_content]))[0], ai_models.EMBEDDING_MODEL_TAG)
+    except Exception as e:
+        print(f"Failed to embed entry: {e}")
 
 def add_entry_to_index(entry):
     """
-    Adds a single new entry to the FAISS index.
+    Adds a single new entry to its owner's FAISS and keyword indexes,
+    using the embedding already stored on the row.
     """
-    global vector_index, index_id_to_entry_id
-    
-    if vector_index is None:
-        # Should have been initialized on startup, but just in case
-        vector_index = faiss.IndexFlatL2(384)
-        index_id_to_entry_id = {}
-        
-    # Embed
-    embedding = embedding_model.encode([entry.text_content])
-    
-    # Add
-    vector_index.add(np.array(embedding).astype('float32'))
-    
-    # Map (The new index is current total - 1)
-    new_idx = vector_index.ntotal - 1
-    index_id_to_entry_id[new_idx] = entry.id
-    print(f"Added entry {entry.id} to RAG index. Total: {vector_index.ntotal}")
+    vector = embeddings.unpack(entry.embedding).reshape(1, -1) if entry.embedding is not None else None
+
+    # Add (only updates memory if the owner's index is currently loaded)
+    vector_indexes.add(entry.user_id, [entry.id], vector, texts=[entry.text_content])
+    print(f"Added entry {entry.id} to RAG index for user {entry.user_id}.")
 
 @app.on_event("startup")
 def startup_event():
-    # Create a new session just for this startup task
-    db = SessionLocal()
-    try:
-        refresh_vector_index(db)
-    finally:
-        db.close()
+    # Bring the schema up to date before anything else touches the database
+    # (tables are no longer created at import; see migrate_db.py)
+    if migrate_db.AUTO_MIGRATE:
+        migrate_db.migrate()
+    else:
+        waiting = migrate_db.pending()
+        if waiting:
+            print(f"WARNING: {len(waiting)} database migration(s) pending; run `python migrate_db.py`.")
+    # Load the AI models in parallel on background threads; the server
+    # starts answering immediately and /readyz reports when they're done
+    model_registry.start()
+    # Embed any entries that are missing a vector or were made by an older model
+    embedding_backfill.start()
+    # Resume queued (and interrupted) background voice jobs
+    voice_job_worker.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Save any unsnapshotted index changes so the next start replays less log
+    vector_indexes.snapshot_all()
+    inference.shutdown()
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+# --- HEALTH PROBES ---
+def index_status():
+    # Per-user indexes load lazily from their snapshots; searching them only
+    # needs the snapshot directory and the embedding model for the query
+    store_dir = vector_store.VECTOR_INDEX_DIR
+    store_ok = os.access(store_dir, os.W_OK) if os.path.exists(store_dir) else os.access(".", os.W_OK)
+    return {"ready": store_ok and model_registry.is_ready("embedding"), **vector_indexes.stats()}
+
+@app.get("/healthz")
+def healthz():
+    """ Liveness: the process is up and serving requests. """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz(response: Response):
+    """
+    Readiness: 200 once every model and the vector index are ready, 503 before.
+    The body shows the state of each one either way.
+    """
+    index = index_status()
+    ready = model_registry.all_ready() and index["ready"]
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready, "models": model_registry.status(), "index": index}
+
+@app.get("/metrics")
+def get_metrics():
+    """ Prometheus metrics for this worker process (model loads/reloads, evictions, memory, ...). """
+    metrics.set_gauge("model_memory_budget_bytes", model_registry.memory_budget_bytes)
+    for key, value in vector_indexes.stats().items():
+        metrics.set_gauge(f"vector_index_{key}", value)
+    database.report_pool_metrics()
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
 
 # --- NEW: CHAT ENDPOINT (RAG) ---
 class ChatRequest(pydantic.BaseModel):
     question: str
 
-@app.post("/chat")
+# Recent /chat answers per user, reused for near-identical questions
+chat_answers = answer_cache.SemanticAnswerCache()
+
+@app.post("/chat", dependencies=[Depends(require_models("embedding", "sentiment"))])
 def chat_with_journal(
     request: ChatRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Chat with your journal. Finds relevant entries and returns them as context.
+    Candidates come from both the vector index (meaning) and the BM25 index
+    (exact keywords like names and places), merged with reciprocal-rank fusion.
+
+    Answers are cached per user for similar questions until the journal
+    changes (journal_version, read fresh on every request, plus the index's
+    in-memory generation for changes not yet applied to the index).
     """
-    global vector_index, index_id_to_entry_id
+    journal_version = answer_cache.journal_version(db, current_user.id)
+    user_index = vector_indexes.get(current_user.id, db)
+    cache_version = (journal_version, user_index.generation)
     
-    if vector_index is None or vector_index.ntotal == 0:
+    if user_index.ntotal == 0 and not user_index.lexical:
         return {"answer": "I don't have enough journal entries to answer that yet.", "context": []}
     
     # 1. Embed the question
-    question_embedding = embedding_model.encode([request.question])
+    # (a repeated question is answered from the cache without running the model)
+    question_embedding = encode_texts([request.question])
+
+    cached_answer = chat_answers.lookup(current_user.id, cache_version, question_embedding[0])
+    if cached_answer is not None:
+        return cached_answer
     
     # 2. Analyze Question Sentiment
-    q_sentiment_result = sentiment_analyzer(request.question)
-    q_sentiment = q_sentiment_result[0]['label']
+    q_sentiment_result = classify_sentiment(request.question)
+    q_sentiment = q_sentiment_result['label']
     print(f"Question Sentiment: {q_sentiment}")
 
-    # 3. Search FAISS index (Get more candidates)
+    # 3. Search both indexes (Get more candidates) and fuse the rankings
     k_candidates = 10 
-    distances, indices = vector_index.search(np.array(question_embedding).astype('float32'), k_candidates)
+    dense_matches = user_index.search(question_embedding, k_candidates)
+    keyword_matches = user_index.lexical.search(request.question, k_candidates)
+    fused = retrieval.reciprocal_rank_fusion([
+        [entry_id for entry_id, _ in dense_matches],
+        [entry_id for entry_id, _ in keyword_matches],
+    ])[:k_candidates]
+    fused_scores = dict(fused)
     
-    # 4. Retrieve and Filter Entries
+    # 4. Retrieve all candidates in one query
     all_candidates = []
     
-    for i, idx in enumerate(indices[0]):
-        if idx != -1 and idx in index_id_to_entry_id:
-            entry_id = index_id_to_entry_id[idx]
-            entry = db.query(models.JournalEntry).filter(models.JournalEntry.id == entry_id).first()
-            
-            if entry and entry.user_id == current_user.id:
-                candidate = {
-                    "id": entry.id,
-                    "text": entry.text_content,
-                    "date": entry.created_at,
-                    "sentiment": entry.sentiment,
-                    "score": float(distances[0][i])
-                }
-                all_candidates.append(candidate)
+    for entry in retrieval.hydrate_entries(db, current_user.id, [entry_id for entry_id, _ in fused]):
+        candidate = {
+            "id": entry.id,
+            "text": entry.text_content,
+            "date": entry.created_at,
+            "sentiment": entry.sentiment,
+            "score": fused_scores[entry.id]  # RRF score, higher is better
+        }
+        all_candidates.append(candidate)
 
     # Filter Logic
     final_results = []
@@ -594,37 +975,132 @@ def chat_with_journal(
         if sentiment_matches:
             final_results = sentiment_matches[:3] # Top 3 matching sentiment
         else:
-            final_results = all_candidates[:3] # Fallback to top 3 by distance
+            final_results = all_candidates[:3] # Fallback to top 3 by fused rank
     else:
         final_results = all_candidates[:3] # Standard top 3
 
     # 5. Construct Answer
     if not final_results:
-        return {"answer": "I couldn't find any relevant entries.", "context": []}
-        
-    return {
-        "answer": f"Here are some entries related to your question (Sentiment: {q_sentiment}):",
-        "context": final_results
-    }
+        answer = {"answer": "I couldn't find any relevant entries.", "context": []}
+    else:
+        answer = {
+            "answer": f"Here are some entries related to your question (Sentiment: {q_sentiment}):",
+            "context": final_results
+        }
+
+    chat_answers.store(current_user.id, cache_version, question_embedding[0], answer)
+    return answer
 
 @app.post("/notebooks", status_code=status.HTTP_201_CREATED, response_model=schemas.NotebookResponse)
-def create_notebook(notebook: schemas.NotebookCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def create_notebook(notebook: schemas.NotebookCreate, db: Session = Depends(get_db), current_user: auth_cache.CachedUser = Depends(get_current_user)):
     new_notebook = models.Notebook(title=notebook.title, user_id=current_user.id)
     db.add(new_notebook)
     db.commit()
     db.refresh(new_notebook)
     return new_notebook
 
-@app.get("/notebooks", response_model=List[schemas.NotebookResponse])
-def get_notebooks(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Notebook).options(joinedload(models.Notebook.entries)).filter(models.Notebook.user_id == current_user.id).all()
+def notebook_summaries(db: Session, user_id: int):
+    """
+    Every notebook of the user with its entry count, date range and most
+    common sentiment, in one query (aggregates per notebook, no entry rows
+    are sent back).
+    """
+    entries = models.JournalEntry
+    in_user_notebooks = (entries.user_id == user_id, entries.notebook_id.isnot(None))
+    stats = db.query(
+        entries.notebook_id,
+        func.count(entries.id).label("entry_count"),
+        func.min(entries.created_at).label("first_entry_at"),
+        func.max(entries.created_at).label("last_entry_at"),
+    ).filter(*in_user_notebooks).group_by(entries.notebook_id).subquery()
+    # Entries per (notebook, sentiment), ranked within each notebook; ties go to the alphabetically first
+    sentiments = db.query(
+        entries.notebook_id,
+        entries.sentiment,
+        func.row_number().over(
+            partition_by=entries.notebook_id,
+            order_by=(func.count(entries.id).desc(), entries.sentiment),
+        ).label("position"),
+    ).filter(*in_user_notebooks, entries.sentiment.isnot(None)).group_by(entries.notebook_id, entries.sentiment).subquery()
+
+    rows = db.query(
+        models.Notebook.id,
+        models.Notebook.title,
+        models.Notebook.created_at,
+        models.Notebook.user_id,
+        func.coalesce(stats.c.entry_count, 0).label("entry_count"),
+        stats.c.first_entry_at,
+        stats.c.last_entry_at,
+        sentiments.c.sentiment.label("dominant_sentiment"),
+    ).outerjoin(stats, stats.c.notebook_id == models.Notebook.id).outerjoin(
+        sentiments, (sentiments.c.notebook_id == models.Notebook.id) & (sentiments.c.position == 1)
+    ).filter(models.Notebook.user_id == user_id).order_by(models.Notebook.created_at, models.Notebook.id).all()
+    return [schemas.NotebookSummary.model_validate(row) for row in rows]
+
+def notebooks_with_entries(db: Session, user_id: int):
+    notebooks = db.query(models.Notebook).options(joinedload(models.Notebook.entries)).filter(models.Notebook.user_id == user_id).all()
+    return [schemas.NotebookResponse.model_validate(notebook) for notebook in notebooks]
+
+@app.get("/notebooks", response_model=Union[List[schemas.NotebookSummary], List[schemas.NotebookResponse]])
+async def get_notebooks(
+    summary: bool = False,
+    db = Depends(get_async_db),
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
+):
+    """
+    Lists the user's notebooks.
+
+    With `summary=true` each notebook comes without its entries, but with
+    entry_count, first_entry_at/last_entry_at and dominant_sentiment
+    (schemas.NotebookSummary); fetch the entries themselves page by page
+    from /notebooks/{id}/entries. Without it, every notebook includes all
+    of its entries as before.
+    """
+    if summary:
+        return await run_db(db, notebook_summaries, current_user.id)
+    return await run_db_in_thread(db, notebooks_with_entries, current_user.id)
+
+@app.get("/notebooks/{id}/entries", response_model=schemas.JournalEntryPage, response_model_exclude_unset=True)
+async def get_notebook_entries(
+    id: int,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db = Depends(get_async_db),
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
+):
+    """
+    One page of a notebook's entries, newest first:
+    {"items": [...], "next_cursor": "..."} (null on the last page).
+    `fields` works as for GET /journal-entries.
+    """
+    selected = select_entry_fields(fields)
+    return await run_db(db, notebook_entries_page, id, current_user.id, limit, cursor, selected)
+
+def notebook_entries_page(db: Session, notebook_id: int, user_id: int, limit, cursor, selected):
+    notebook = db.query(models.Notebook.id).filter(models.Notebook.id == notebook_id, models.Notebook.user_id == user_id).first()
+    if not notebook:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notebook not found")
+
+    needed = list(dict.fromkeys(selected + ["id", "created_at"]))
+    query = db.query(*[getattr(models.JournalEntry, field) for field in needed]).filter(
+        models.JournalEntry.notebook_id == notebook_id,
+        models.JournalEntry.user_id == user_id,
+    )
+    try:
+        rows, next_cursor = pagination.paginate(query, models.JournalEntry.created_at, models.JournalEntry.id, limit, cursor)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"items": [entry_row_to_dict(row, selected) for row in rows], "next_cursor": next_cursor}
 
 @app.delete("/notebooks/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_notebook(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def delete_notebook(id: int, db: Session = Depends(get_db), current_user: auth_cache.CachedUser = Depends(get_current_user)):
     notebook_query = db.query(models.Notebook).filter(models.Notebook.id == id, models.Notebook.user_id == current_user.id)
     if not notebook_query.first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notebook not found")
     notebook_query.delete(synchronize_session=False)
+    # Its entries move out of the notebook (notebook_id is set to NULL)
+    answer_cache.bump_journal_version(db, current_user.id)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -634,7 +1110,7 @@ def auto_generate_notebook(
     end_date: Optional[str] = None,   # YYYY-MM-DD
     mode: Optional[str] = "daily",    # daily, weekly, monthly, custom
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Automatically groups entries from a specific date range into a new notebook
@@ -687,7 +1163,9 @@ def auto_generate_notebook(
     if len(full_text) > 50:
         try:
             # Summarize
-            summary = summarizer(full_text, max_length=15, min_length=5, do_sample=False)
+            # Rarely used, so the summarizer may have been unloaded; this reloads it
+            summarizer = model_registry.get("summarizer", wait_for_reload=True)
+            summary = inference.call(summarizer, full_text, max_length=15, min_length=5, do_sample=False)
             generated_title = summary[0]['summary_text'].strip()
             final_title = f"{prefix}{generated_title}"
         except Exception as e:
@@ -705,6 +1183,7 @@ def auto_generate_notebook(
     # 5. Move entries to this notebook
     for entry in entries:
         entry.notebook_id = new_notebook.id
+    answer_cache.bump_journal_version(db, current_user.id)
     
     db.commit()
     
@@ -715,59 +1194,71 @@ def auto_generate_notebook(
 async def create_voice_journal_entry(
     audio: UploadFile = File(...),
     notebook_id: Optional[int] = Form(None),
+    async_job: bool = Form(False),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: auth_cache.CachedUser = Depends(get_current_user)
 ):
     """
     Creates a new journal entry from an audio file.
     Transcribes the audio, analyzes sentiment, and saves to DB.
+
+    With async_job=true the upload is queued instead and a 202 with a job ID
+    is returned right away; poll GET /jobs/{id} or stream /jobs/{id}/events.
+    Retries that send the same Idempotency-Key header get the same job back.
     """
+    if async_job:
+        job = await run_in_threadpool(
+            jobs.create_voice_job, db, current_user.id, audio, notebook_id, idempotency_key
+        )
+        voice_job_worker.wake()
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            },
+        )
+
+    # Queued jobs wait for the models in the background; this path needs them now
+    await run_in_threadpool(ensure_models_ready, "transcriber", "sentiment")
+
     try:
-        # 1. Save to a temporary file
-        suffix = os.path.splitext(audio.filename)[1] or ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            shutil.copyfileobj(audio.file, tmp_file)
-            tmp_path = tmp_file.name
+        # 1. Decode the upload in memory (no temp file) and Transcribe
+        audio_bytes = await audio.read()
+        
+        print(f"Transcribing voice entry for user {current_user.email}...")
+        transcription_result = await transcribe_recording_async(audio_bytes)
+        text_content = transcription_result['text']
+        print(f"Transcription: {text_content}")
 
+        # 2. Analyze Sentiment
+        sentiment_result = await classify_sentiment_async(text_content)
+        sentiment_label = sentiment_result['label']
+        
+        # 3. Create Entry
+        new_entry = models.JournalEntry(
+            text_content=text_content,
+            user_id=current_user.id,
+            sentiment=sentiment_label,
+            notebook_id=notebook_id
+        )
+        await embed_entry_async(new_entry)
+        
+        db.add(new_entry)
+        answer_cache.bump_journal_version(db, current_user.id)
+        db.commit()
+        db.refresh(new_entry)
+        
+        # 4. Update RAG Index
         try:
-            # 2. Load and Transcribe
-            audio_data, sampling_rate = librosa.load(tmp_path, sr=16000)
-            
-            print(f"Transcribing voice entry for user {current_user.email}...")
-            transcription_result = transcriber(audio_data, return_timestamps=True)
-            text_content = transcription_result['text']
-            print(f"Transcription: {text_content}")
-
-            # 3. Analyze Sentiment
-            sentiment_result = sentiment_analyzer(text_content)
-            sentiment_label = sentiment_result[0]['label']
-            
-            # 4. Create Entry
-            new_entry = models.JournalEntry(
-                text_content=text_content,
-                user_id=current_user.id,
-                sentiment=sentiment_label,
-                notebook_id=notebook_id
-            )
-            
-            db.add(new_entry)
-            db.commit()
-            db.refresh(new_entry)
-            
-            db.refresh(new_entry)
-            
-            # 5. Update RAG Index
-            try:
-                add_entry_to_index(new_entry)
-            except Exception as e:
-                print(f"Failed to update index: {e}")
+            add_entry_to_index(new_entry)
+        except Exception as e:
+            print(f"Failed to update index: {e}")
 
-            return new_entry
-            
-        finally:
-            # Clean up temp file
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+        return new_entry
 
     except Exception as e:
         import traceback
@@ -775,54 +1266,174 @@ async def create_voice_journal_entry(
         print(f"Error processing voice entry: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- NEW: BACKGROUND VOICE JOBS ---
+def run_voice_job(db: Session, job: models.VoiceJob, report):
+    """
+    The background version of create_voice_journal_entry:
+    decode -> transcribe -> sentiment -> save -> index.
+    The entry is saved in the same transaction that records it on the job,
+    so a job retried after a crash never creates a second entry.
+    """
+    if job.entry_id is None:
+        report("decoding", 10)
+        with open(job.audio_path, "rb") as f:
+            audio_bytes = f.read()
+
+        report("transcribing", 25)
+        transcription_result = inference.call(transcribe_recording, audio_bytes)
+        text_content = transcription_result['text']
+
+        report("analyzing", 70)
+        sentiment_label = classify_sentiment(text_content)['label']
+
+        report("saving", 85)
+        new_entry = models.JournalEntry(
+            text_content=text_content,
+            user_id=job.user_id,
+            sentiment=sentiment_label,
+            notebook_id=job.notebook_id
+        )
+        embed_entry(new_entry)
+        db.add(new_entry)
+        db.flush()
+        job.entry_id = new_entry.id
+        answer_cache.bump_journal_version(db, job.user_id)
+        db.commit()
+    else:
+        new_entry = db.query(models.JournalEntry).filter(models.JournalEntry.id == job.entry_id).first()
+
+    report("indexing", 95)
+    if new_entry is not None:
+        try:
+            add_entry_to_index(new_entry)
+        except Exception as e:
+            print(f"Failed to update index: {e}")
+        return new_entry.id
+    return None
+
+voice_job_worker = jobs.JobWorker(session_factory=SessionLocal, handler=run_voice_job)
+
+def get_user_job(job_id: str, user_id: int, db: Session):
+    job = db.query(models.VoiceJob).filter(
+        models.VoiceJob.id == job_id,
+        models.VoiceJob.user_id == user_id
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+def job_state(db: Session, job_id: str, user_id: int):
+    return schemas.JobResponse.model_validate(get_user_job(job_id, user_id, db))
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+async def get_job(job_id: str, db = Depends(get_async_db), current_user: auth_cache.CachedUser = Depends(get_current_user)):
+    """ Returns the status of a background voice job. """
+    return await run_db(db, job_state, job_id, current_user.id)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, current_user: auth_cache.CachedUser = Depends(get_current_user)):
+    """
+    Server-sent events with the job's stage and progress.
+    Sends an event whenever either changes and closes once the job finishes.
+    """
+    async def load_state():
+        async with async_session() as db:
+            job = await run_db(db, job_state, job_id, current_user.id)
+        return job.model_dump(mode="json")
+
+    # Check the job exists before starting the stream, so a bad ID is a plain 404
+    state = await load_state()
+
+    async def event_stream():
+        last = None
+        current = state
+        while True:
+            snapshot = (current["status"], current["stage"], current["progress"])
+            if snapshot != last:
+                yield f"event: progress\ndata: {json.dumps(current)}\n\n"
+                last = snapshot
+            if current["status"] in jobs.TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(0.5)
+            current = await load_state()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # --- NEW: WEBSOCKET TRANSCRIPTION ENDPOINT ---
 from fastapi import WebSocket, WebSocketDisconnect
 
 @app.websocket("/ws/transcribe")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, format: str = "opus"):
+    """
+    Streaming transcription.
+
+    The client sends audio as binary messages:
+      - format=opus (default): consecutive chunks of one WebM/Ogg Opus stream,
+        e.g. each MediaRecorder dataavailable blob as it is produced
+      - format=pcm: raw 16 kHz mono signed 16-bit little-endian frames
+    and may send the text message "stop" to flush the last words.
+
+    The server replies with {"type": "partial" | "final", "text": <full transcript so far>,
+    "committed": <confirmed text>, "partial": <unconfirmed tail>}.
+    """
     await websocket.accept()
     print("WebSocket connected")
-    
+    if not model_registry.is_ready("transcriber"):
+        # 1013 = "try again later"
+        await websocket.close(code=1013, reason="Transcription model is still loading")
+        return
+
+    session = streaming.StreamingSession(transcribe=transcribe_words)
+    decoder = streaming.FFmpegStreamDecoder() if format == "opus" else None
+
+    async def send_update(kind):
+        text = " ".join(part for part in (session.committed_text, session.partial_text) if part)
+        await websocket.send_json({
+            "type": kind,
+            "text": text,
+            "committed": session.committed_text,
+            "partial": session.partial_text,
+        })
+
     try:
         while True:
-            # Receive audio chunk (bytes)
-            data = await websocket.receive_bytes()
-            
-            # TODO: In a real production app, we would:
-            # 1. Append this chunk to a rolling buffer
-            # 2. Use a streaming-optimized model (like faster-whisper)
-            # 3. Transcribe the buffer
-            
-            # For this MVP/Prototype with standard Whisper:
-            # We will save the chunk to a temp file and transcribe it.
-            # This works best if the frontend sends "sentences" or larger chunks (e.g. every 2-3s).
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp_file:
-                tmp_file.write(data)
-                tmp_path = tmp_file.name
-            
-            try:
-                # Load and transcribe
-                # Note: sr=16000 is standard for Whisper
-                audio_data, _ = librosa.load(tmp_path, sr=16000)
-                result = transcriber(audio_data)
-                text = result['text']
-                
-                # Send back the text
-                if text.strip():
-                    await websocket.send_json({"text": text})
-                    
-            except Exception as e:
-                print(f"Error transcribing chunk: {e}")
-                await websocket.send_json({"error": str(e)})
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-                    
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("text") == "stop":
+                # Flush: decode whatever is left and confirm every pending word
+                if decoder is not None:
+                    session.add_audio(await asyncio.to_thread(decoder.finish))
+                await inference.run(session.finish)
+                await send_update("final")
+                break
+
+            data = message.get("bytes")
+            if not data:
+                continue
+
+            if decoder is not None:
+                await asyncio.to_thread(decoder.feed, data)
+                session.add_audio(decoder.read())
+            else:
+                session.add_audio(streaming.pcm16_to_float32(data))
+
+            if session.ready():
+                try:
+                    await inference.run(session.process)
+                    await send_update("partial")
+                except Exception as e:
+                    print(f"Error transcribing chunk: {e}")
+                    await websocket.send_json({"error": str(e)})
+
     except WebSocketDisconnect:
         print("WebSocket disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
+    finally:
+        if decoder is not None:
+            decoder.close()
 
 # --- NEW: USER REGISTRATION ENDPOINT ---
 @app.post("/users", status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse)
@@ -846,7 +1457,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
     
     # 2. Hash the user's password
-    hashed_password = utils.hash_password(user.password)
+    hashed_password = run_password_job(password_hasher.hash, user.password)
     
     # 3. Generate Avatar (if not provided)
     # Using DiceBear 'avataaars' style with username + 4 random digits
@@ -872,7 +1483,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # 6. Return the new user (using the UserResponse schema)
     return new_user 
 
-@app.get("/prototype/run_transcription_test")
+@app.get("/prototype/run_transcription_test", dependencies=[Depends(require_models("transcriber"))])
 def run_transcription_test():
     """
     This is the main prototype endpoint.
@@ -889,7 +1500,7 @@ def run_transcription_test():
     
     # 2. Run the transcription
     start_inference = time.time()
-    result = transcriber(sample_audio)
+    result = inference.call(model_registry.get("transcriber"), sample_audio)
     inference_time = time.time() - start_inference
     
     print("Transcription complete.")
@@ -897,7 +1508,7 @@ def run_transcription_test():
     # 3. Return the result as JSON
     return {
         "prototype_status": "Success",
-        "model_used": "openai/whisper-base",
+        "model_used": ai_models.TRANSCRIBER_MODEL,
         "audio_duration_seconds": audio_duration,
         "transcription_time_seconds": inference_time,
         "transcription_result": result['text']
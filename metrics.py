@@ -0,0 +1,97 @@
+import threading
+
+# Minimal in-process metrics with Prometheus' text exposition format, so
+# /metrics can be scraped without adding a client library. Values are per
+# process (each uvicorn worker reports its own).
+
+# Upper bounds (seconds) for latency histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_help = {}
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name: str, kind: str, help_text: str):
+    """Registers the TYPE and HELP lines for a metric (optional, but nicer to scrape)."""
+    _help[name] = (kind, help_text)
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Adds to a counter."""
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+    """Records one observation (e.g. a latency in seconds) in a histogram."""
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def get_counter(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def render() -> str:
+    """All metrics in Prometheus text format."""
+    lines = []
+    seen = set()
+
+    def header(name, default_kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, help_text = _help.get(name, (default_kind, None))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(_gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(_histograms.items()):
+            header(name, "histogram")
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
@@ -1,14 +1,268 @@
+import argparse
+import contextlib
+import os
+import time
+from collections import namedtuple
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+
+import entry_search
+import models
 from database import engine
-from sqlalchemy import text
 
-def migrate():
-    with engine.connect() as connection:
+load_dotenv()
+
+# --- .env variables ---
+# Apply pending migrations when the API starts. Set to 0 to run
+# `python migrate_db.py` as a deploy step instead.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+
+# Arbitrary key for the Postgres advisory lock that stops two processes
+# (e.g. several uvicorn workers starting together) migrating at once
+_LOCK_KEY = 72_634_001
+# How often a process waiting for that lock checks it again (seconds)
+_LOCK_POLL_SECONDS = 1.0
+
+# `apply(connection)` makes the change. Transactional migrations run in
+# one transaction with their schema_migrations row; the others run in
+# autocommit mode, which CREATE INDEX CONCURRENTLY requires, so they must
+# be safe to run again if interrupted halfway.
+Migration = namedtuple("Migration", ["version", "description", "apply", "transactional"])
+
+
+def create_index(connection, name: str, table: str, columns: str, unique: bool = False):
+    """
+    Creates an index if it doesn't exist. On Postgres it is built
+    CONCURRENTLY, so the table stays writable while it builds.
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    if connection.dialect.name != "postgresql":
+        connection.exec_driver_sql(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+    # An interrupted concurrent build leaves an invalid index behind, which
+    # IF NOT EXISTS would happily keep; drop it and build again
+    invalid = connection.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    connection.exec_driver_sql(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def drop_index(connection, name: str):
+    """Drops an index if it exists (CONCURRENTLY on Postgres)."""
+    concurrently = "CONCURRENTLY " if connection.dialect.name == "postgresql" else ""
+    connection.exec_driver_sql(f"DROP INDEX {concurrently}IF EXISTS {name}")
+
+
+def add_missing_columns(connection, table: str, names):
+    """Adds the named model columns to `table` unless they already exist."""
+    existing = {column["name"] for column in inspect(connection).get_columns(table)}
+    for name in names:
+        if name in existing:
+            continue
+        column = models.Base.metadata.tables[table].c[name]
+        ddl = f"{name} {column.type.compile(dialect=connection.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg.text}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+
+# --- Migrations ---
+
+def _baseline(connection):
+    # Fresh databases get every table straight from models.py. Because of
+    # that, later migrations must cope with their change already existing.
+    models.Base.metadata.create_all(bind=connection)
+
+
+def _legacy_columns(connection):
+    # Columns databases created before versioned migrations may be missing
+    add_missing_columns(connection, "journal_entries", ["image_url", "embedding", "embedding_model", "embedding_version"])
+    add_missing_columns(connection, "users", ["journal_version"])
+
+
+def _hot_path_indexes(connection):
+    # Entry listing (and keyset pagination), newest first
+    create_index(connection, "ix_journal_entries_user_created", "journal_entries", "user_id, created_at DESC, id DESC")
+    # Notebook filter and notebook contents
+    create_index(connection, "ix_journal_entries_user_notebook", "journal_entries", "user_id, notebook_id")
+    # Pages of one notebook's entries (GET /notebooks/{id}/entries), newest
+    # first; also serves the GET /notebooks join and ON DELETE SET NULL
+    create_index(connection, "ix_journal_entries_notebook_created", "journal_entries", "notebook_id, created_at DESC, id DESC")
+    # Sentiment filter, newest first
+    create_index(connection, "ix_journal_entries_user_sentiment_created", "journal_entries", "user_id, sentiment, created_at DESC")
+    # GET /notebooks
+    create_index(connection, "ix_notebooks_user_created", "notebooks", "user_id, created_at")
+
+
+def _username_prefix_index(connection):
+    # Username prefix lookups (LIKE 'name%') when allocating usernames for
+    # Google sign-ups. Postgres only uses a btree for LIKE with the
+    # pattern opclass (unless the database collation is C).
+    if connection.dialect.name == "postgresql":
+        create_index(connection, "ix_users_username_pattern", "users", "username text_pattern_ops")
+
+
+def _voice_job_leases(connection):
+    # Worker leases, so a restarting process only re-queues jobs whose
+    # worker is gone
+    add_missing_columns(connection, "voice_jobs", ["worker_id", "lease_expires_at"])
+    # One job per (user, idempotency key), enforced by the database. Keys
+    # reused before this existed are kept on the oldest job only.
+    connection.exec_driver_sql("""
+        UPDATE voice_jobs SET idempotency_key = NULL
+        WHERE idempotency_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM voice_jobs older
+            WHERE older.user_id = voice_jobs.user_id
+              AND older.idempotency_key = voice_jobs.idempotency_key
+              AND (older.created_at < voice_jobs.created_at
+                   OR (older.created_at = voice_jobs.created_at AND older.id < voice_jobs.id))
+        )
+    """)
+    create_index(connection, "ux_voice_jobs_user_idempotency_key", "voice_jobs", "user_id, idempotency_key", unique=True)
+    drop_index(connection, "ix_voice_jobs_idempotency_key")
+
+
+def _inference_cache_pruning(connection):
+    # Embeddings are no longer persisted in the inference cache (the entry
+    # row already stores them); drop the copies
+    connection.exec_driver_sql("DELETE FROM inference_cache WHERE kind = 'embedding'")
+    create_index(connection, "ix_inference_cache_kind_created", "inference_cache", "kind, created_at")
+
+
+MIGRATIONS = [
+    Migration(1, "create tables", _baseline, transactional=True),
+    Migration(2, "add columns from before versioned migrations", _legacy_columns, transactional=True),
+    Migration(3, "full-text search for journal entries", entry_search.setup, transactional=False),
+    Migration(4, "composite indexes for journal entry and notebook queries", _hot_path_indexes, transactional=False),
+    Migration(5, "index for username prefix lookups", _username_prefix_index, transactional=False),
+    Migration(6, "voice job leases and unique idempotency keys", _voice_job_leases, transactional=False),
+    Migration(7, "index for pruning the inference cache", _inference_cache_pruning, transactional=False),
+]
+
+
+# --- Runner ---
+
+def _ensure_version_table(connection):
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+
+
+def applied_versions(bind=engine):
+    with bind.begin() as connection:
+        _ensure_version_table(connection)
+        return {row.version for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending(bind=engine):
+    """Migrations not yet applied to the database, in order."""
+    applied = applied_versions(bind)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def _record(connection, migration):
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+        {"version": migration.version, "description": migration.description},
+    )
+
+
+@contextlib.contextmanager
+def _without_statement_timeout(connection):
+    # DB_STATEMENT_TIMEOUT_MS is meant for request queries; index builds and
+    # backfills may legitimately take longer
+    if connection.dialect.name != "postgresql":
+        yield connection
+        return
+    connection.execute(text("SET statement_timeout = 0"))
+    try:
+        yield connection
+    finally:
+        connection.execute(text("RESET statement_timeout"))
+
+
+def _apply(bind, migration):
+    if migration.transactional:
+        with bind.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Only for this transaction
+                connection.execute(text("SET LOCAL statement_timeout = 0"))
+            migration.apply(connection)
+            _record(connection, migration)
+        return
+    with bind.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        with _without_statement_timeout(connection):
+            migration.apply(connection)
+            _record(connection, migration)
+
+
+def _acquire_lock(connection):
+    # Polls pg_try_advisory_lock instead of blocking in pg_advisory_lock: a
+    # session waiting inside a statement holds a snapshot open, and CREATE
+    # INDEX CONCURRENTLY in the process that is migrating waits for every
+    # older snapshot. The two would wait on each other forever, on different
+    # sessions, so Postgres would never see (or break) the deadlock.
+    waiting = False
+    while not connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY}).scalar():
+        if not waiting:
+            print("Another process is applying migrations; waiting for it...")
+            waiting = True
+        time.sleep(_LOCK_POLL_SECONDS)
+
+
+def migrate(bind=engine, target: int = None):
+    """
+    Applies the pending migrations in order (up to and including
+    `target`, if given). Returns the versions applied.
+    """
+    with bind.connect() as lock_connection:
+        # Autocommit: an open transaction here would make the CONCURRENTLY
+        # index builds wait on it forever
+        lock_connection = lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        postgres = bind.dialect.name == "postgresql"
+        if postgres:
+            _acquire_lock(lock_connection)
         try:
-            connection.execute(text("ALTER TABLE journal_entries ADD COLUMN image_url VARCHAR"))
-            connection.commit()
-            print("Successfully added image_url column to journal_entries table.")
-        except Exception as e:
-            print(f"Migration failed (column might already exist): {e}")
+            applied = []
+            # Read the pending list only once we hold the lock, so a process
+            # that waited on another one sees what that one already did
+            for migration in pending(bind):
+                if target is not None and migration.version > target:
+                    break
+                start_time = time.time()
+                _apply(bind, migration)
+                applied.append(migration.version)
+                print(f"Applied migration {migration.version}: {migration.description} ({time.time() - start_time:.2f}s).")
+            return applied
+        finally:
+            if postgres:
+                lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+
+
+def print_status(bind=engine):
+    applied = applied_versions(bind)
+    for migration in MIGRATIONS:
+        mark = "x" if migration.version in applied else " "
+        print(f"[{mark}] {migration.version}: {migration.description}")
+
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="Apply versioned database migrations.")
+    parser.add_argument("--to", type=int, default=None, help="Stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    args = parser.parse_args()
+    if args.status:
+        print_status()
+    else:
+        versions = migrate(target=args.to)
+        print(f"Applied {len(versions)} migration(s)." if versions else "Database is up to date.")
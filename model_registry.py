@@ -0,0 +1,253 @@
+import gc
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# --- .env variables ---
+# Total memory (in MB) the loaded models may use; 0 means no limit.
+# Over budget, the least recently used idle models are unloaded and
+# loaded again the next time something asks for them.
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# A model must be unused for at least this long before it can be unloaded
+MODEL_MIN_IDLE_SECONDS = int(os.getenv("MODEL_MIN_IDLE_SECONDS", "300"))
+# How often the registry checks the budget
+MODEL_SWEEP_SECONDS = int(os.getenv("MODEL_SWEEP_SECONDS", "30"))
+# How long a request may wait for an unloaded model to be loaded again
+MODEL_RELOAD_WAIT_SECONDS = float(os.getenv("MODEL_RELOAD_WAIT_SECONDS", "60"))
+
+metrics.describe("model_load_seconds", "histogram", "Time to load and warm up a model (first load and reloads)")
+metrics.describe("model_reload_seconds", "histogram", "Time to reload a model that was unloaded to save memory")
+metrics.describe("model_evictions_total", "counter", "Models unloaded because the memory budget was exceeded")
+metrics.describe("model_memory_bytes", "gauge", "Estimated memory held by each loaded model")
+metrics.describe("model_loaded", "gauge", "1 if the model is loaded, 0 otherwise")
+
+
+class ModelNotReady(Exception):
+    """Raised when a model is requested before it has finished loading (or after it failed)."""
+
+    def __init__(self, name: str, state: str, error: str = None):
+        self.name = name
+        self.state = state
+        self.error = error
+        message = f"Model '{name}' is {state}"
+        super().__init__(f"{message}: {error}" if error else message)
+
+
+class _Entry:
+    def __init__(self, loader, warmup):
+        self.loader = loader
+        self.warmup = warmup
+        # pending -> loading -> ready [-> unloaded -> loading -> ready ...], or failed
+        self.state = "pending"
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self.memory_bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+
+
+class ModelRegistry:
+    """
+    Holds the AI models by name: loads them in the background, tracks how
+    much memory each one takes and when it was last used, and unloads idle
+    ones when the memory budget is exceeded.
+
+    `register(name, loader, warmup)` declares a model; `start()` loads all
+    of them concurrently on their own threads (then runs each warm-up
+    inference), so the server can answer requests that don't need a model
+    straight away. `get(name)` raises ModelNotReady while a model is on its
+    first load, and reloads models that were unloaded. `wait(name)` blocks
+    until the model is available, reloading it if needed.
+
+    `sizer(model)` estimates a loaded model's memory footprint in bytes.
+    """
+
+    def __init__(self, sizer=None, memory_budget_bytes: int = MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+                 min_idle_seconds: float = MODEL_MIN_IDLE_SECONDS, sweep_seconds: float = MODEL_SWEEP_SECONDS,
+                 reload_wait_seconds: float = MODEL_RELOAD_WAIT_SECONDS):
+        self.sizer = sizer
+        self.reload_wait_seconds = reload_wait_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.min_idle_seconds = min_idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = None
+
+    def register(self, name: str, loader, warmup=None):
+        self._entries[name] = _Entry(loader, warmup)
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def start(self):
+        """Starts loading every registered model in parallel. Returns immediately."""
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._entries)), thread_name_prefix="model-loader")
+        with self._lock:
+            for name in self._entries:
+                self._schedule_load(name)
+        if self.memory_budget_bytes > 0:
+            threading.Thread(target=self._sweep_loop, name="model-registry-sweeper", daemon=True).start()
+
+    # --- Lookups ---
+
+    def is_ready(self, name: str) -> bool:
+        return self._entries[name].state == "ready"
+
+    def all_ready(self) -> bool:
+        """True once every model has loaded at least once (unloaded models reload on demand)."""
+        return all(entry.state in ("ready", "unloaded") for entry in self._entries.values())
+
+    def get(self, name: str, wait_for_reload: bool = False):
+        """
+        Returns the loaded model, or raises ModelNotReady.
+        A model that was unloaded to save memory is loaded again; with
+        `wait_for_reload` the caller waits (up to reload_wait_seconds) for
+        it instead of failing. Models on their first load always fail fast.
+        """
+        with self._lock:
+            entry = self._entries[name]
+            if entry.state == "ready":
+                entry.last_used = time.time()
+                return entry.model
+            if entry.state == "unloaded":
+                self._schedule_load(name)
+            if not (wait_for_reload and entry.loads > 0 and entry.state == "loading"):
+                raise ModelNotReady(name, entry.state, entry.error)
+        return self.wait(name, self.reload_wait_seconds)
+
+    def wait(self, name: str, timeout: float = None):
+        """
+        Returns the model, loading it again first if it was unloaded.
+        Raises ModelNotReady if loading failed or took longer than `timeout`.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._lock:
+            entry = self._entries[name]
+            while entry.state != "ready":
+                if entry.state == "failed":
+                    raise ModelNotReady(name, entry.state, entry.error)
+                if entry.state == "unloaded":
+                    self._schedule_load(name)
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise ModelNotReady(name, entry.state)
+                self._changed.wait(remaining)
+            entry.last_used = time.time()
+            return entry.model
+
+    def status(self):
+        with self._lock:
+            return {
+                name: {
+                    "state": entry.state,
+                    "load_seconds": round(entry.load_seconds, 2) if entry.load_seconds is not None else None,
+                    "memory_mb": round(entry.memory_bytes / 1024 / 1024, 1),
+                    "idle_seconds": round(time.time() - entry.last_used, 1) if entry.last_used else None,
+                    "error": entry.error,
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def memory_bytes(self) -> int:
+        return sum(entry.memory_bytes for entry in self._entries.values() if entry.state == "ready")
+
+    # --- Loading ---
+
+    def _schedule_load(self, name: str):
+        # Caller holds the lock
+        self._entries[name].state = "loading"
+        self._executor.submit(self._load, name)
+
+    def _load(self, name: str):
+        entry = self._entries[name]
+        reload = entry.loads > 0
+        start_time = time.time()
+        try:
+            print(f"{'Reloading' if reload else 'Loading'} {name} model...")
+            model = entry.loader()
+            if entry.warmup is not None:
+                entry.warmup(model)
+            memory_bytes = self.sizer(model) if self.sizer is not None else 0
+        except Exception as e:
+            with self._lock:
+                entry.error = str(e)
+                entry.state = "failed"
+                self._changed.notify_all()
+            print(f"Failed to load {name} model: {e}")
+            return
+
+        elapsed = time.time() - start_time
+        with self._lock:
+            entry.model = model
+            entry.memory_bytes = memory_bytes
+            entry.load_seconds = elapsed
+            entry.last_used = time.time()
+            entry.loads += 1
+            entry.error = None
+            entry.state = "ready"
+            self._changed.notify_all()
+        print(f"--- {name} model ready in {elapsed:.2f} seconds ({memory_bytes / 1024 / 1024:.0f} MB). ---")
+
+        metrics.observe("model_load_seconds", elapsed, model=name)
+        if reload:
+            metrics.observe("model_reload_seconds", elapsed, model=name)
+        self._update_gauges()
+        self.enforce_budget()
+
+    # --- Eviction ---
+
+    def enforce_budget(self):
+        """Unloads least recently used idle models until the loaded ones fit in the budget."""
+        if self.memory_budget_bytes <= 0:
+            return
+        evicted = []
+        with self._lock:
+            now = time.time()
+            total = self.memory_bytes()
+            candidates = sorted(
+                (entry.last_used, name) for name, entry in self._entries.items()
+                if entry.state == "ready" and now - entry.last_used >= self.min_idle_seconds
+            )
+            for _, name in candidates:
+                if total <= self.memory_budget_bytes:
+                    break
+                entry = self._entries[name]
+                total -= entry.memory_bytes
+                # Requests that already hold the model keep using it; the
+                # memory is freed once they are done with it
+                entry.model = None
+                entry.state = "unloaded"
+                evicted.append(name)
+        for name in evicted:
+            print(f"Unloaded idle {name} model (model memory budget is {self.memory_budget_bytes / 1024 / 1024:.0f} MB).")
+            metrics.inc("model_evictions_total", model=name)
+        if evicted:
+            gc.collect()
+            self._update_gauges()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.enforce_budget()
+            except Exception as e:
+                print(f"Model registry sweep failed: {e}")
+
+    def _update_gauges(self):
+        for name, entry in self._entries.items():
+            loaded = entry.state == "ready"
+            metrics.set_gauge("model_loaded", 1 if loaded else 0, model=name)
+            metrics.set_gauge("model_memory_bytes", entry.memory_bytes if loaded else 0, model=name)
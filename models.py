@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary, Text, Index, func
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.expression import text
 from sqlalchemy.orm import relationship
@@ -18,8 +18,11 @@ class User(Base):
     full_name = Column(String, nullable=True)
     profile_picture_url = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
+    # Bumped whenever the user's entries change (create, delete, notebook moves);
+    # cached /chat answers are only valid for the version they were made with
+    journal_version = Column(Integer, nullable=False, default=0, server_default=text('0'))
     created_at = Column(TIMESTAMP(timezone=True), 
-                        nullable=False, server_default=text('now()'))
+                        nullable=False, server_default=func.now())
     
     notebooks = relationship("Notebook", back_populates="owner")
 
@@ -37,8 +40,12 @@ class JournalEntry(Base):
     latitude = Column(String, nullable=True) # Store as string for simplicity, or Float
     longitude = Column(String, nullable=True)
     sentiment = Column(String, nullable=True) # For our stretch goal
+    # Sentence embedding for RAG, stored as raw float32 bytes (see embeddings.py)
+    embedding = Column(LargeBinary, nullable=True)
+    embedding_model = Column(String, nullable=True)
+    embedding_version = Column(Integer, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), 
-                        nullable=False, server_default=text('now()'))
+                        nullable=False, server_default=func.now())
     
     # This tells SQLAlchemy how to link this entry back to its owner (the User)
     owner = relationship("User")
@@ -52,7 +59,54 @@ class Notebook(Base):
     id = Column(Integer, primary_key=True, nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
     
     owner = relationship("User", back_populates="notebooks")
-    entries = relationship("JournalEntry", back_populates="notebook")
\ No newline at end of file
+    entries = relationship("JournalEntry", back_populates="notebook")
+
+class VoiceJob(Base):
+    """
+    A voice entry being processed in the background (see jobs.py).
+    Kept in the database so queued work survives a restart.
+    """
+    __tablename__ = "voice_jobs"
+
+    id = Column(String, primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Client-supplied key so a retried upload returns the existing job
+    # (unique per user, see __table_args__)
+    idempotency_key = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="queued") # queued, running, succeeded, failed
+    stage = Column(String, nullable=False, default="queued")
+    progress = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    audio_path = Column(String, nullable=False)
+    notebook_id = Column(Integer, ForeignKey("notebooks.id", ondelete="SET NULL"), nullable=True)
+    entry_id = Column(Integer, ForeignKey("journal_entries.id", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    # Lease of the worker process running the job; it is re-queued once the lease expires
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ux_voice_jobs_user_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
+
+class InferenceCacheEntry(Base):
+    """
+    Persistent tier of the inference cache (see inference_cache.py): one
+    model output per (model, normalized text) hash, shared by all workers.
+    """
+    __tablename__ = "inference_cache"
+
+    key = Column(String, primary_key=True, nullable=False) # sha256 of kind + model tag + normalized text
+    kind = Column(String, nullable=False) # "sentiment" or "embedding"
+    value = Column(LargeBinary, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Pruning by age and size (inference_cache.prune)
+        Index("ix_inference_cache_kind_created", "kind", "created_at"),
+    )
@@ -0,0 +1,92 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import func, literal, tuple_
+
+load_dotenv()
+
+# --- .env variables ---
+# Page size when the client asks for a page without saying how big
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+# Largest page a client may ask for
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we didn't issue."""
+
+
+def encode_cursor(created_at: datetime, entry_id: int) -> str:
+    """Opaque cursor pointing just past the given (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), entry_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor. Returns (created_at, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for results without a stable key order (e.g. ranked search results)."""
+    raw = json.dumps({"offset": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """Inverse of encode_offset_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded))["offset"])
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if offset < 0:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def _sort_key(created_at_column, dialect: str):
+    if dialect == "sqlite":
+        # SQLite keeps timestamps as text, and rows written by the server default
+        # ("YYYY-MM-DD HH:MM:SS") don't compare as text with the bound cursor
+        # ("YYYY-MM-DD HH:MM:SS.ffffff"); normalize both to one format
+        return func.strftime("%Y-%m-%d %H:%M:%f", created_at_column)
+    return created_at_column
+
+
+def keyset_after(created_at_column, id_column, cursor: str, dialect: str = None):
+    """
+    Filter for the rows after `cursor` in (created_at DESC, id DESC) order.
+    With an index on (user_id, created_at, id) every page is one index range
+    scan, no matter how deep the page is, unlike OFFSET.
+    """
+    created_at, entry_id = decode_cursor(cursor)
+    # Bound through the column's own type, so it is stored-format on every database
+    bound = literal(created_at, type_=created_at_column.type)
+    # Row-value comparison, which Postgres matches directly against the index
+    return tuple_(_sort_key(created_at_column, dialect), id_column) < tuple_(_sort_key(bound, dialect), entry_id)
+
+
+def paginate(query, created_at_column, id_column, limit: int, cursor: str = None):
+    """
+    Applies keyset pagination to `query` (newest first).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Rows must expose the two key columns as `.created_at` and `.id`.
+    """
+    dialect = query.session.get_bind().dialect.name
+    if cursor:
+        query = query.filter(keyset_after(created_at_column, id_column, cursor, dialect))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(_sort_key(created_at_column, dialect).desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
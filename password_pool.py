@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+import metrics
+import utils
+
+load_dotenv()
+
+# --- .env variables ---
+# Processes doing bcrypt work (hashing and verifying passwords)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Password jobs allowed to wait for a worker; beyond that requests get a 503.
+# Each waiting job holds one request thread, so keep workers + queue well
+# below the server's threadpool size (40 by default).
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "16"))
+# bcrypt work factor for new hashes (log2 of the rounds). Changing it
+# rehashes each user's password at their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+metrics.describe("password_hash_seconds", "histogram", "Time a worker spent on one bcrypt operation, by op (hash, verify)")
+metrics.describe("password_hash_wait_seconds", "histogram", "Time a bcrypt job waited for a worker, by op")
+metrics.describe("password_hash_queue_depth", "gauge", "bcrypt jobs waiting for a worker")
+metrics.describe("password_hash_in_flight", "gauge", "bcrypt jobs waiting or running")
+metrics.describe("password_hash_rejected_total", "counter", "bcrypt jobs turned away because the queue was full")
+metrics.describe("password_rehash_total", "counter", "Password hashes upgraded to the current work factor at login")
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool's queue is full."""
+
+
+class PasswordPoolUnavailable(PasswordPoolBusy):
+    """Raised when the workers crashed, even on a fresh pool (callers treat it like a full queue)."""
+
+
+def _timed(fn, *args):
+    # Runs in the worker process; the worker time lets the caller split
+    # latency into queue wait and bcrypt time
+    start_time = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start_time
+
+
+class PasswordPool:
+    """
+    Runs bcrypt on a small dedicated process pool, away from the request
+    threads and the event loop, with bounded admission: at most
+    `workers + queue_limit` jobs wait or run at once, and the rest fail
+    fast with PasswordPoolBusy. A login storm then slows down logins
+    only, instead of tying up every request thread.
+
+    `hash` and `verify` block the calling (request) thread until done.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.rounds = rounds
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use; "spawn" because forking a process that
+        # already runs model threads isn't safe
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _update_gauges(self):
+        # Caller holds the lock
+        metrics.set_gauge("password_hash_in_flight", self._in_flight)
+        metrics.set_gauge("password_hash_queue_depth", max(0, self._in_flight - self.workers))
+
+    def _run(self, op: str, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                metrics.inc("password_hash_rejected_total", op=op)
+                raise PasswordPoolBusy(f"Password {op} queue is full ({self._in_flight} jobs)")
+            self._in_flight += 1
+            self._update_gauges()
+        try:
+            # A worker dying breaks the whole pool (and fails every job on it);
+            # retry once on a fresh pool so one crash doesn't fail the login
+            for attempt in range(2):
+                executor = self._get_executor()
+                submitted_at = time.perf_counter()
+                try:
+                    result, worker_seconds = executor.submit(_timed, fn, *args).result()
+                    break
+                except BrokenProcessPool:
+                    with self._lock:
+                        if self._executor is executor:
+                            self._executor = None
+                    print(f"Password worker pool broke during {op} (attempt {attempt + 1} of 2).")
+            else:
+                raise PasswordPoolUnavailable(f"Password workers keep crashing ({op})")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._update_gauges()
+        metrics.observe("password_hash_seconds", worker_seconds, op=op)
+        metrics.observe("password_hash_wait_seconds", max(0.0, time.perf_counter() - submitted_at - worker_seconds), op=op)
+        return result
+
+    def hash(self, password: str) -> str:
+        """Hashes a password with the configured work factor."""
+        return self._run("hash", utils.hash_password, password, self.rounds)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run("verify", utils.verify_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True if the hash was made with a different work factor than the configured one."""
+        rounds = utils.hash_rounds(hashed_password)
+        return rounds is not None and rounds != self.rounds
+
+    def rehash_if_idle(self, password: str, hashed_password: str):
+        """
+        A new hash at the current work factor if `hashed_password` uses
+        another one, or None. Skipped (None) while every worker is busy,
+        so a login storm after changing BCRYPT_ROUNDS isn't doubled; the
+        user gets rehashed at a later login.
+        """
+        if not self.needs_rehash(hashed_password):
+            return None
+        with self._lock:
+            if self._in_flight >= self.workers:
+                return None
+        try:
+            new_hash = self.hash(password)
+        except PasswordPoolBusy:
+            return None
+        metrics.inc("password_rehash_total")
+        return new_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,13 @@
 from database import engine, Base
+import entry_search
+import migrate_db
 import models
 
 print("Dropping all tables...")
 Base.metadata.drop_all(bind=engine)
+with engine.begin() as connection:
+    entry_search.teardown(connection)
+    connection.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
 print("Creating all tables...")
-Base.metadata.create_all(bind=engine)
+migrate_db.migrate()
 print("Database reset complete.")
@@ -0,0 +1,156 @@
+import math
+import re
+import threading
+from collections import Counter
+
+import models
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Constant from the reciprocal-rank fusion paper; dampens the weight of the top few ranks
+RRF_K = 60
+
+# Very common words that only add noise to keyword matching
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "did", "do", "for", "from", "had",
+    "has", "have", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "so", "that",
+    "the", "this", "to", "was", "we", "were", "what", "when", "where", "which", "who", "why",
+    "with", "you", "your",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str):
+    """Lowercases and splits text into keyword tokens, dropping stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over one user's entries.
+    """
+
+    def __init__(self):
+        # term -> {entry_id: term frequency}
+        self.postings = {}
+        # entry_id -> Counter of its terms (needed to undo an add)
+        self.doc_terms = {}
+        # entry_id -> number of terms
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, entry_id: int, text: str):
+        terms = Counter(tokenize(text))
+        with self.lock:
+            if entry_id in self.doc_terms:
+                return
+            self.doc_terms[entry_id] = terms
+            self.doc_lengths[entry_id] = sum(terms.values())
+            self.total_length += self.doc_lengths[entry_id]
+            for term, freq in terms.items():
+                self.postings.setdefault(term, {})[entry_id] = freq
+
+    def remove(self, entry_id: int):
+        with self.lock:
+            terms = self.doc_terms.pop(entry_id, None)
+            if terms is None:
+                return
+            self.total_length -= self.doc_lengths.pop(entry_id)
+            for term in terms:
+                docs = self.postings.get(term)
+                if docs is not None:
+                    docs.pop(entry_id, None)
+                    if not docs:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int):
+        """Returns up to k (entry_id, score) pairs, best first."""
+        query_terms = set(tokenize(query))
+        with self.lock:
+            n_docs = len(self.doc_terms)
+            if n_docs == 0 or not query_terms:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores = {}
+            for term in query_terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for entry_id, freq in docs.items():
+                    norm = freq + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[entry_id] / avg_length)
+                    scores[entry_id] = scores.get(entry_id, 0.0) + idf * freq * (BM25_K1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size (roughly 100 bytes per indexed term)."""
+        return self.total_length * 100
+
+    def state(self) -> dict:
+        """The term counts of every entry, as JSON-serializable data (see from_state)."""
+        with self.lock:
+            return {"docs": {str(entry_id): dict(terms) for entry_id, terms in self.doc_terms.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BM25Index":
+        """Rebuilds an index saved with state(), without re-tokenizing any text."""
+        lexical = cls()
+        for entry_id, terms in state["docs"].items():
+            entry_id = int(entry_id)
+            lexical.doc_terms[entry_id] = Counter(terms)
+            lexical.doc_lengths[entry_id] = sum(terms.values())
+            lexical.total_length += lexical.doc_lengths[entry_id]
+            for term, freq in terms.items():
+                lexical.postings.setdefault(term, {})[entry_id] = freq
+        return lexical
+
+
+def build_lexical_index(user_id: int, db) -> BM25Index:
+    """
+    Builds the BM25 index for one user's entries from the database.
+    Only needed when the user's index snapshot has no saved copy of it.
+    """
+    lexical = BM25Index()
+    rows = db.query(models.JournalEntry.id, models.JournalEntry.text_content).filter(
+        models.JournalEntry.user_id == user_id
+    ).all()
+    for row in rows:
+        lexical.add(row.id, row.text_content)
+    return lexical
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """
+    Merges several ranked lists of entry IDs into one.
+    Each list contributes 1 / (k + rank) for every ID it contains.
+    Returns (entry_id, fused_score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, entry_id in enumerate(ranking, start=1):
+            fused[entry_id] = fused.get(entry_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def hydrate_entries(db, user_id: int, entry_ids):
+    """
+    Loads the given entries in one query, keeping the order of `entry_ids`.
+    Entries that no longer exist or belong to someone else are dropped.
+    """
+    if not entry_ids:
+        return []
+    entries = db.query(models.JournalEntry).filter(
+        models.JournalEntry.id.in_(entry_ids),
+        models.JournalEntry.user_id == user_id,
+    ).all()
+    by_id = {entry.id: entry for entry in entries}
+    return [by_id[entry_id] for entry_id in entry_ids if entry_id in by_id]
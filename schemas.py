@@ -46,6 +46,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     id: Optional[str] = None
+    expires_at: Optional[datetime] = None
 
 class GoogleAuthRequest(BaseModel):
     token: str
@@ -76,6 +77,28 @@ class JournalEntryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class JournalEntryItem(BaseModel):
+    """
+    One entry as listed by GET /journal-entries and /notebooks/{id}/entries:
+    only the fields the client asked for (see `fields`), plus the highlighted
+    `snippet` on search results. Fields that weren't selected are left out.
+    """
+    id: Optional[int] = None
+    text_content: Optional[str] = None
+    created_at: Optional[datetime] = None
+    user_id: Optional[int] = None
+    sentiment: Optional[str] = None
+    notebook_id: Optional[int] = None
+    image_url: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    snippet: Optional[str] = None
+
+class JournalEntryPage(BaseModel):
+    """ One page of entries; next_cursor is null on the last page. """
+    items: List[JournalEntryItem]
+    next_cursor: Optional[str] = None
+
 # --- Notebook Schemas ---
 class NotebookCreate(BaseModel):
     title: str
@@ -88,4 +111,32 @@ class NotebookResponse(BaseModel):
     entries: List[JournalEntryResponse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class NotebookSummary(BaseModel):
+    """ A notebook without its entries (GET /notebooks?summary=true). """
+    id: int
+    title: str
+    created_at: datetime
+    user_id: int
+    entry_count: int = 0
+    first_entry_at: Optional[datetime] = None
+    last_entry_at: Optional[datetime] = None
+    dominant_sentiment: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# --- Voice Job Schemas ---
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    stage: str
+    progress: int
+    entry_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
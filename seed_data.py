@@ -1,11 +1,12 @@
 import models
 from database import SessionLocal, engine
 import utils
+import migrate_db
 from datetime import datetime, timedelta
 import random
 
-# Create tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+# Create tables (and indexes) if they don't exist
+migrate_db.migrate()
 
 def seed_data():
     db = SessionLocal()
@@ -0,0 +1,199 @@
+import os
+import re
+import subprocess
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# --- .env variables ---
+# Run the model once at least this much new audio (in seconds) has arrived
+STREAM_MIN_CHUNK_SECONDS = float(os.getenv("STREAM_MIN_CHUNK_SECONDS", "1.0"))
+# If nothing has been confirmed for this long, force-confirm the oldest hypothesis
+# so the re-decoded tail (and the per-call cost) stays bounded
+STREAM_MAX_BUFFER_SECONDS = float(os.getenv("STREAM_MAX_BUFFER_SECONDS", "20.0"))
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Converts raw little-endian 16-bit PCM bytes to float32 samples in [-1, 1]."""
+    usable = len(data) - (len(data) % 2)
+    return np.frombuffer(data[:usable], dtype='<i2').astype('float32') / 32768.0
+
+
+class FFmpegStreamDecoder:
+    """
+    Decodes one continuous compressed stream (e.g. the WebM/Opus chunks a
+    browser MediaRecorder emits) with a single long-lived ffmpeg process,
+    so each chunk costs only its own decode instead of a fresh process and
+    a re-decode of everything before it.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.process = subprocess.Popen(
+            # Small probe window so output starts after the first chunk, not after ~5 MB
+            ["ffmpeg", "-loglevel", "error", "-fflags", "nobuffer",
+             "-probesize", "4096", "-analyzeduration", "0", "-i", "pipe:0",
+             "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._decoded = bytearray()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    def _read_stdout(self):
+        while True:
+            data = self.process.stdout.read1(65536)
+            if not data:
+                return
+            with self._lock:
+                self._decoded.extend(data)
+
+    def feed(self, data: bytes):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def read(self) -> np.ndarray:
+        """Returns the samples decoded since the last call."""
+        with self._lock:
+            usable = len(self._decoded) - (len(self._decoded) % 4)
+            samples = np.frombuffer(bytes(self._decoded[:usable]), dtype='<f4')
+            del self._decoded[:usable]
+        return samples
+
+    def finish(self) -> np.ndarray:
+        """Closes the input, waits for ffmpeg to flush, and returns the last samples."""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self._reader.join(timeout=5)
+        self.process.wait(timeout=5)
+        return self.read()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+class StreamingSession:
+    """
+    Incremental transcription over a rolling audio buffer.
+
+    Audio is appended as it arrives. Each `process()` call transcribes only
+    the not-yet-confirmed tail of the buffer and applies the LocalAgreement-2
+    policy: words that two consecutive hypotheses agree on are confirmed
+    (final), the rest are returned as a partial hypothesis. Confirmed audio
+    is dropped from the buffer, so the model never re-reads it.
+
+    `transcribe(audio)` must return the pipeline's dict with word-level
+    "chunks", i.e. the result of `transcriber(audio, return_timestamps="word")`.
+    """
+
+    def __init__(self, transcribe, sample_rate: int = SAMPLE_RATE,
+                 min_chunk_seconds: float = STREAM_MIN_CHUNK_SECONDS,
+                 max_buffer_seconds: float = STREAM_MAX_BUFFER_SECONDS):
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.min_chunk_samples = int(min_chunk_seconds * sample_rate)
+        self.max_buffer_seconds = max_buffer_seconds
+        self.buffer = np.zeros(0, dtype='float32')
+        # Absolute time (seconds) of buffer[0]
+        self.buffer_offset = 0.0
+        self.unprocessed_samples = 0
+        # Confirmed words: (start, end, text), absolute times
+        self.committed = []
+        # Last unconfirmed hypothesis: (start, end, text), absolute times
+        self.hypothesis = []
+
+    def add_audio(self, samples: np.ndarray):
+        if len(samples):
+            self.buffer = np.concatenate([self.buffer, samples.astype('float32', copy=False)])
+            self.unprocessed_samples += len(samples)
+
+    def ready(self) -> bool:
+        """True once enough new audio has arrived to be worth a model run."""
+        return self.unprocessed_samples >= self.min_chunk_samples
+
+    @property
+    def committed_text(self) -> str:
+        return " ".join(word for _, _, word in self.committed)
+
+    @property
+    def partial_text(self) -> str:
+        return " ".join(word for _, _, word in self.hypothesis)
+
+    def _words(self, result):
+        """Turns the pipeline's chunks into absolute-time words, dropping already-confirmed ones."""
+        buffer_end = self.buffer_offset + len(self.buffer) / self.sample_rate
+        committed_end = self.committed[-1][1] if self.committed else 0.0
+        words = []
+        for chunk in result.get("chunks", []):
+            start, end = chunk.get("timestamp") or (None, None)
+            start = self.buffer_offset + (start or 0.0)
+            end = self.buffer_offset + end if end is not None else buffer_end
+            # Whisper sometimes repeats the word right at the cut
+            if end <= committed_end + 0.05:
+                continue
+            for text in chunk["text"].split():
+                words.append((start, end, text))
+        return words
+
+    def process(self):
+        """
+        Transcribes the buffered tail.
+        Returns (newly_confirmed_text, partial_text).
+        """
+        self.unprocessed_samples = 0
+        if len(self.buffer) == 0:
+            return "", ""
+
+        words = self._words(self.transcribe(self.buffer))
+
+        # LocalAgreement-2: confirm the longest prefix both hypotheses share
+        agreed = 0
+        while (agreed < len(words) and agreed < len(self.hypothesis)
+               and _normalize(words[agreed][2]) == _normalize(self.hypothesis[agreed][2])):
+            agreed += 1
+        confirmed = words[:agreed]
+        self.hypothesis = words[agreed:]
+
+        # Don't let an unstable tail grow the buffer forever
+        buffer_seconds = len(self.buffer) / self.sample_rate
+        if not confirmed and self.hypothesis and buffer_seconds > self.max_buffer_seconds:
+            confirmed = self.hypothesis[:max(1, len(self.hypothesis) // 2)]
+            self.hypothesis = self.hypothesis[len(confirmed):]
+
+        if confirmed:
+            self.committed.extend(confirmed)
+            self._trim(confirmed[-1][1])
+
+        return " ".join(word for _, _, word in confirmed), self.partial_text
+
+    def finish(self) -> str:
+        """Flushes the stream: everything still pending becomes final. Returns the new final text."""
+        if self.unprocessed_samples:
+            self.process()
+        final = self.partial_text
+        self.committed.extend(self.hypothesis)
+        self.hypothesis = []
+        self.buffer = np.zeros(0, dtype='float32')
+        return final
+
+    def _trim(self, until: float):
+        """Drops buffered audio up to the end of the last confirmed word."""
+        cut = int((until - self.buffer_offset) * self.sample_rate)
+        if cut > 0:
+            self.buffer = self.buffer[cut:]
+            self.buffer_offset += cut / self.sample_rate
@@ -16,11 +16,11 @@ def _prepare_password(password: str) -> bytes:
     
     return password_bytes
 
-def hash_password(password: str) -> str:
-    """Hashes a plaintext password using bcrypt."""
+def hash_password(password: str, rounds: int = 12) -> str:
+    """Hashes a plaintext password using bcrypt with 2^rounds iterations."""
     prepared_password = _prepare_password(password)
     # Generate a salt and hash the password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(prepared_password, salt)
     # Return as string for storage in database
     return hashed.decode('utf-8')
@@ -29,4 +29,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plaintext password against a hash."""
     prepared_password = _prepare_password(plain_password)
     hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(prepared_password, hashed_bytes)
\ No newline at end of file
+    return bcrypt.checkpw(prepared_password, hashed_bytes)
+
+def hash_rounds(hashed_password: str):
+    """The bcrypt cost (log2 rounds) a hash was made with, or None if it isn't a bcrypt hash."""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
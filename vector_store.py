@@ -0,0 +1,676 @@
+import base64
+import itertools
+from concurrent.futures import Future
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import faiss
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- .env variables ---
+# Size of the embedding vectors (384 for all-MiniLM-L6-v2). Known up front so
+# the indexes work before the embedding model has finished loading.
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "384"))
+# How much memory (in MB) the loaded per-user indexes may use in total
+VECTOR_INDEX_MEMORY_BUDGET_MB = int(os.getenv("VECTOR_INDEX_MEMORY_BUDGET_MB", "256"))
+# Indexes not used for this many seconds are dropped from memory
+VECTOR_INDEX_IDLE_SECONDS = int(os.getenv("VECTOR_INDEX_IDLE_SECONDS", "900"))
+# Where index snapshots and write-ahead logs are stored
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_indexes")
+# Take a new snapshot once this many changes have been logged since the last one
+VECTOR_INDEX_SNAPSHOT_EVERY = int(os.getenv("VECTOR_INDEX_SNAPSHOT_EVERY", "500"))
+
+# Compact a user's index once this many deleted entries are waiting,
+# and at least this fraction of the index is deleted
+VECTOR_INDEX_COMPACT_MIN = int(os.getenv("VECTOR_INDEX_COMPACT_MIN", "64"))
+VECTOR_INDEX_COMPACT_RATIO = float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.2"))
+
+# Rough cost of one entry's ID (in FAISS, its reverse map and our sets)
+_ID_BYTES_PER_ENTRY = 100
+
+# Bumped whenever the on-disk snapshot layout changes
+_SNAPSHOT_FORMAT = 2
+
+# Source of UserVectorIndex.generation values
+_generations = itertools.count(1)
+
+
+class UserVectorIndex:
+    """
+    The FAISS index for a single user's journal entries, keyed by entry ID.
+
+    Deleting an entry only records a tombstone; the vector stays in FAISS and
+    is filtered out of search results until the index is compacted.
+    """
+
+    def __init__(self, user_id: int, dimension: int = EMBEDDING_DIMENSION):
+        self.user_id = user_id
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        # Entry IDs currently searchable
+        self.entry_ids = set()
+        # Entry IDs deleted but still physically present in the FAISS index
+        self.tombstones = set()
+        # Optional keyword index over the same entries (see retrieval.BM25Index)
+        self.lexical = None
+        # Sequence number of the last logged change applied to this index
+        self.lsn = 0
+        # Number of logged changes applied since the last snapshot
+        self.changes_since_snapshot = 0
+        # Changes with every add/delete; unique across index objects in this process,
+        # so a value seen before always means the same contents
+        self.generation = next(_generations)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def ntotal(self) -> int:
+        """Number of live (not deleted) entries."""
+        return len(self.entry_ids)
+
+    def add(self, entry_ids, embeddings):
+        """Adds a batch of embeddings, skipping entries already in the index."""
+        vectors = np.asarray(embeddings, dtype='float32').reshape(len(entry_ids), -1)
+        with self.lock:
+            keep = [
+                i for i, entry_id in enumerate(entry_ids)
+                if entry_id not in self.entry_ids and entry_id not in self.tombstones
+            ]
+            if not keep:
+                return
+            ids = np.array([entry_ids[i] for i in keep], dtype='int64')
+            self.index.add_with_ids(vectors[keep], ids)
+            self.entry_ids.update(int(entry_id) for entry_id in ids)
+
+    def remove(self, entry_ids):
+        """Tombstones the given entries so searches no longer return them."""
+        with self.lock:
+            removed = self.entry_ids.intersection(entry_ids)
+            self.entry_ids -= removed
+            self.tombstones |= removed
+
+    def needs_compaction(self, min_tombstones: int, ratio: float) -> bool:
+        return len(self.tombstones) >= max(min_tombstones, ratio * self.index.ntotal)
+
+    def compact(self):
+        """Physically removes tombstoned vectors from the FAISS index."""
+        with self.lock:
+            if not self.tombstones:
+                return 0
+            selector = faiss.IDSelectorBatch(np.array(sorted(self.tombstones), dtype='int64'))
+            removed = self.index.remove_ids(selector)
+            self.tombstones.clear()
+            return removed
+
+    def search(self, query_embedding, k: int):
+        """
+        Returns up to k (entry_id, distance) pairs, closest first.
+        """
+        with self.lock:
+            if self.index.ntotal == 0:
+                return []
+            query = np.asarray(query_embedding, dtype='float32').reshape(1, -1)
+            # Over-fetch by the number of tombstones so k live results survive the filter
+            fetch = min(k + len(self.tombstones), self.index.ntotal)
+            distances, ids = self.index.search(query, fetch)
+            tombstones = self.tombstones
+
+            results = []
+            for distance, entry_id in zip(distances[0], ids[0]):
+                if entry_id != -1 and entry_id not in tombstones:
+                    results.append((int(entry_id), float(distance)))
+                    if len(results) == k:
+                        break
+        return results
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of this index."""
+        size = self.index.ntotal * (self.index.d * 4 + _ID_BYTES_PER_ENTRY)
+        if self.lexical is not None:
+            size += self.lexical.memory_bytes()
+        return size
+
+
+class IndexStore:
+    """
+    On-disk persistence for per-user indexes.
+
+    Each user has a snapshot (a FAISS index file keyed by entry ID plus an .npy
+    array of its tombstones and, given a `lexical_class`, a JSON copy of the
+    keyword index) and an append-only write-ahead log of the adds and deletes
+    made since. A small JSON manifest names the current snapshot and the
+    last log sequence number (LSN) it contains; swapping the manifest is what
+    commits a snapshot, so a crash mid-write never leaves a half-written one.
+
+    Snapshots are tagged with the embedding model that produced them and are
+    ignored once that model changes. The store assumes a single server process
+    owns the directory.
+    """
+
+    def __init__(self, directory: str, dimension: int = EMBEDDING_DIMENSION, model_tag: str = None,
+                 lexical_class=None):
+        self.directory = directory
+        self.dimension = dimension
+        self.model_tag = model_tag
+        # Keyword index type saved with snapshots (state() / from_state(), e.g. retrieval.BM25Index)
+        self.lexical_class = lexical_class
+        os.makedirs(directory, exist_ok=True)
+        # user_id -> last LSN handed out
+        self._lsns = {}
+        # user_id -> LSN of the user's usable snapshot, or None without one
+        self._snapshot_lsns = {}
+        self._user_locks = {}
+        self._lock = threading.Lock()
+
+    # --- Paths ---
+
+    def _manifest_path(self, user_id):
+        return os.path.join(self.directory, f"user_{user_id}.json")
+
+    def _wal_path(self, user_id):
+        return os.path.join(self.directory, f"user_{user_id}.wal")
+
+    def _snapshot_paths(self, user_id, seq):
+        base = os.path.join(self.directory, f"user_{user_id}.{seq}")
+        return f"{base}.faiss", f"{base}.tombstones.npy"
+
+    def _lexical_path(self, user_id, seq):
+        return os.path.join(self.directory, f"user_{user_id}.{seq}.lexical.json")
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    # --- Manifest and log helpers ---
+
+    def _read_manifest(self, user_id):
+        try:
+            with open(self._manifest_path(user_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _usable(self, manifest):
+        # Written in this layout, by the current embedding model
+        return (manifest is not None and manifest.get("format") == _SNAPSHOT_FORMAT
+                and manifest.get("dimension") == self.dimension and manifest.get("model") == self.model_tag)
+
+    def _snapshot_lsn(self, user_id):
+        # Caller holds the user's lock
+        if user_id not in self._snapshot_lsns:
+            manifest = self._read_manifest(user_id)
+            self._snapshot_lsns[user_id] = manifest["lsn"] if self._usable(manifest) else None
+        return self._snapshot_lsns[user_id]
+
+    def _read_wal(self, user_id):
+        """Returns the logged records in order, ignoring a torn last line."""
+        records = []
+        try:
+            with open(self._wal_path(user_id)) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _next_lsn(self, user_id):
+        # Caller holds the user's lock
+        if user_id not in self._lsns:
+            manifest = self._read_manifest(user_id)
+            last = manifest["lsn"] if manifest else 0
+            for record in self._read_wal(user_id):
+                last = max(last, record["lsn"])
+            self._lsns[user_id] = last
+        self._lsns[user_id] += 1
+        return self._lsns[user_id]
+
+    def _append(self, user_id, records):
+        with self._user_lock(user_id):
+            if self._snapshot_lsn(user_id) is None:
+                # Without a snapshot the next load rebuilds the index from the
+                # database (and drops the log), so there is nothing to log for
+                return None
+            lines = []
+            for record in records:
+                record["lsn"] = self._next_lsn(user_id)
+                lines.append(json.dumps(record) + "\n")
+            with open(self._wal_path(user_id), "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            return records[-1]["lsn"] if records else None
+
+    # --- Public API ---
+
+    def log_add(self, user_id, entry_ids, embeddings, texts=None):
+        """
+        Appends one 'add' record per entry, with its vector and/or its text
+        (for the keyword index). Returns the last LSN written, or None when
+        the user has no snapshot to replay it onto.
+        """
+        records = [{"op": "add", "entry_id": int(entry_id)} for entry_id in entry_ids]
+        if embeddings is not None:
+            vectors = np.asarray(embeddings, dtype='float32').reshape(len(entry_ids), -1)
+            for record, vector in zip(records, vectors):
+                record["vector"] = base64.b64encode(vector.tobytes()).decode('ascii')
+        if texts is not None:
+            for record, text in zip(records, texts):
+                record["text"] = text
+        return self._append(user_id, records)
+
+    def log_delete(self, user_id, entry_ids):
+        """Appends one 'delete' record per entry. Returns the last LSN written (None as for log_add)."""
+        return self._append(user_id, [{"op": "delete", "entry_id": int(entry_id)} for entry_id in entry_ids])
+
+    def log_backlog(self, user_id) -> int:
+        """Number of changes logged since the user's snapshot (0 without one)."""
+        with self._user_lock(user_id):
+            snapshot_lsn = self._snapshot_lsn(user_id)
+            if snapshot_lsn is None or user_id not in self._lsns:
+                return 0
+            return self._lsns[user_id] - snapshot_lsn
+
+    def load(self, user_id):
+        """
+        Loads the user's latest snapshot and replays the log on top of it.
+        Returns None if there is no usable snapshot.
+        """
+        manifest = self._read_manifest(user_id)
+        if not self._usable(manifest):
+            # None yet, or built with a different embedding model
+            return None
+
+        index_path, tombstones_path = self._snapshot_paths(user_id, manifest["seq"])
+        try:
+            # Read into memory rather than memory-mapping: the index is changed
+            # in place afterwards (log replay, new entries, compaction), which
+            # FAISS doesn't support on a mapped index
+            index = faiss.read_index(index_path)
+            tombstones = np.load(tombstones_path)
+        except (RuntimeError, OSError, ValueError) as e:
+            print(f"Could not read RAG snapshot for user {user_id}: {e}")
+            return None
+
+        user_index = UserVectorIndex(user_id, self.dimension)
+        user_index.index = index
+        user_index.tombstones = {int(entry_id) for entry_id in tombstones}
+        user_index.entry_ids = {int(entry_id) for entry_id in faiss.vector_to_array(index.id_map)} - user_index.tombstones
+        user_index.lsn = manifest["lsn"]
+        if manifest.get("lexical") and self.lexical_class is not None:
+            # Older snapshots have none; the manager then builds it from the database
+            try:
+                with open(self._lexical_path(user_id, manifest["seq"])) as f:
+                    user_index.lexical = self.lexical_class.from_state(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not read keyword index snapshot for user {user_id}: {e}")
+
+        # Replay the changes made since the snapshot
+        lexical = user_index.lexical
+        for record in self._read_wal(user_id):
+            if record["lsn"] <= user_index.lsn:
+                continue
+            if record["op"] == "add":
+                if "vector" in record:
+                    vector = np.frombuffer(base64.b64decode(record["vector"]), dtype='float32')
+                    user_index.add([record["entry_id"]], vector.reshape(1, -1))
+                if "text" in record and lexical is not None:
+                    lexical.add(record["entry_id"], record["text"])
+            elif record["op"] == "delete":
+                user_index.remove([record["entry_id"]])
+                if lexical is not None:
+                    lexical.remove(record["entry_id"])
+            user_index.lsn = record["lsn"]
+            user_index.changes_since_snapshot += 1
+
+        return user_index
+
+    def reset(self, user_id):
+        """
+        Forgets the user's log before an index is rebuilt from the database.
+        Returns the LSN the rebuilt index should start from.
+        """
+        with self._user_lock(user_id):
+            lsn = self._next_lsn(user_id)
+            try:
+                os.remove(self._wal_path(user_id))
+            except FileNotFoundError:
+                pass
+            # Nothing is logged until the rebuilt index has been snapshotted
+            self._snapshot_lsns[user_id] = None
+            return lsn
+
+    def save_snapshot(self, user_index: UserVectorIndex):
+        """Writes a new snapshot of the index and trims the log it covers."""
+        user_id = user_index.user_id
+        with user_index.lock:
+            index_bytes = faiss.serialize_index(user_index.index)
+            tombstones = np.array(sorted(user_index.tombstones), dtype='int64')
+            lsn = user_index.lsn
+            dimension = user_index.index.d
+            lexical_state = (user_index.lexical.state()
+                             if user_index.lexical is not None and self.lexical_class is not None else None)
+            user_index.changes_since_snapshot = 0
+
+        with self._user_lock(user_id):
+            old_manifest = self._read_manifest(user_id)
+            seq = old_manifest["seq"] + 1 if old_manifest else 1
+            index_path, tombstones_path = self._snapshot_paths(user_id, seq)
+
+            with open(index_path, "wb") as f:
+                f.write(index_bytes.tobytes())
+            with open(tombstones_path, "wb") as f:
+                np.save(f, tombstones)
+            if lexical_state is not None:
+                with open(self._lexical_path(user_id, seq), "w") as f:
+                    json.dump(lexical_state, f)
+
+            manifest_tmp = self._manifest_path(user_id) + ".tmp"
+            with open(manifest_tmp, "w") as f:
+                json.dump({
+                    "format": _SNAPSHOT_FORMAT,
+                    "seq": seq,
+                    "lsn": lsn,
+                    "dimension": dimension,
+                    "model": self.model_tag,
+                    "lexical": lexical_state is not None,
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(manifest_tmp, self._manifest_path(user_id))
+            self._snapshot_lsns[user_id] = lsn
+
+            # Keep only log records newer than the snapshot
+            newer = [record for record in self._read_wal(user_id) if record["lsn"] > lsn]
+            wal_tmp = self._wal_path(user_id) + ".tmp"
+            with open(wal_tmp, "w") as f:
+                f.writelines(json.dumps(record) + "\n" for record in newer)
+            os.replace(wal_tmp, self._wal_path(user_id))
+
+            if old_manifest:
+                old_seq = old_manifest["seq"]
+                for path in (*self._snapshot_paths(user_id, old_seq), self._lexical_path(user_id, old_seq)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+        print(f"Saved RAG snapshot for user {user_id} ({user_index.ntotal} entries).")
+
+
+class VectorIndexManager:
+    """
+    Keeps one UserVectorIndex per active user in an LRU.
+
+    Indexes come from the user's on-disk snapshot when there is one, and are
+    otherwise built by `loader(user_id, db)` the first time a user needs one.
+    They are dropped once they have been idle for `idle_seconds`, and evicted
+    least recently used first when the total size goes over `memory_budget_bytes`.
+
+    Deletes are tombstoned; once enough pile up in an index, a background
+    worker compacts it and takes a fresh snapshot. The same worker folds the
+    log of a user whose index isn't loaded into a new snapshot once
+    `snapshot_every` changes have piled up there, so logs stay bounded for
+    users who rarely use /chat.
+
+    If `lexical_loader(user_id, db)` is given, its result is attached to each
+    loaded index as `.lexical` and kept in step with adds and deletes. It is
+    only called when the store's snapshot has no saved keyword index.
+    """
+
+    def __init__(self, loader, memory_budget_bytes: int, idle_seconds: int, store: IndexStore = None,
+                 lexical_loader=None,
+                 snapshot_every: int = VECTOR_INDEX_SNAPSHOT_EVERY,
+                 compact_min: int = VECTOR_INDEX_COMPACT_MIN,
+                 compact_ratio: float = VECTOR_INDEX_COMPACT_RATIO):
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_seconds = idle_seconds
+        self.store = store
+        self.lexical_loader = lexical_loader
+        self.snapshot_every = snapshot_every
+        self.compact_min = compact_min
+        self.compact_ratio = compact_ratio
+        self._indexes = OrderedDict()
+        # user_id -> list of (op, entry_ids, embeddings, texts, lsn) applied while that user's index was loading
+        self._loading = {}
+        # user_id -> Future of the index being loaded, which other requests for that user wait on
+        self._load_futures = {}
+        self._lock = threading.Lock()
+        self._compaction_queue = queue.Queue()
+        # user IDs already waiting in the compaction queue
+        self._compaction_pending = set()
+        self._compaction_thread = None
+
+    def get(self, user_id: int, db) -> UserVectorIndex:
+        """
+        Returns the user's index, loading it from disk or the database if needed.
+        Concurrent requests for a user whose index is loading wait for that
+        one load rather than starting their own.
+        """
+        loading = None
+        with self._lock:
+            evicted = self._evict_idle()
+            user_index = self._indexes.get(user_id)
+            if user_index is not None:
+                self._indexes.move_to_end(user_id)
+                user_index.last_used = time.monotonic()
+            elif user_id in self._load_futures:
+                loading = self._load_futures[user_id]
+            else:
+                self._load_futures[user_id] = Future()
+                self._loading[user_id] = []
+        self._snapshot_evicted(evicted)
+        if user_index is not None:
+            return user_index
+        if loading is not None:
+            # Raises the loader's exception if that load failed
+            return loading.result()
+
+        # Load outside the lock so other users are not blocked by this load
+        try:
+            user_index = self._load(user_id, db)
+        except Exception as e:
+            with self._lock:
+                self._loading.pop(user_id, None)
+                self._load_futures.pop(user_id).set_exception(e)
+            raise
+
+        with self._lock:
+            for op, entry_ids, embeddings, texts, lsn in self._loading.pop(user_id, []):
+                self._apply_to(user_index, op, entry_ids, embeddings, texts)
+                if lsn is not None:
+                    user_index.lsn = max(user_index.lsn, lsn)
+
+            user_index.last_used = time.monotonic()
+            self._indexes[user_id] = user_index
+            self._load_futures.pop(user_id).set_result(user_index)
+            evicted = self._enforce_budget()
+            print(f"Loaded RAG index for user {user_id} ({user_index.ntotal} entries).")
+        self._snapshot_evicted(evicted)
+        self._maybe_compact(user_index)
+        self._maybe_snapshot(user_index)
+        return user_index
+
+    def add(self, user_id: int, entry_ids, embeddings, texts=None):
+        """
+        Logs new embeddings and adds them to the user's index if it is in memory.
+        If it isn't, the next load picks them up from the log or the database.
+
+        `embeddings` may be None when only `texts` (for the keyword index) are known.
+        """
+        lsn = None
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings)
+        if self.store and (embeddings is not None or texts is not None):
+            lsn = self.store.log_add(user_id, entry_ids, embeddings, texts)
+        self._apply(user_id, "add", list(entry_ids), embeddings, texts, lsn)
+
+    def remove(self, user_id: int, entry_ids):
+        """Logs deleted entries and removes them from the user's index if it is in memory."""
+        lsn = self.store.log_delete(user_id, entry_ids) if self.store else None
+        self._apply(user_id, "delete", list(entry_ids), None, None, lsn)
+
+    def snapshot_all(self):
+        """Snapshots every loaded index that has unsaved changes (e.g. on shutdown)."""
+        with self._lock:
+            loaded = list(self._indexes.values())
+        self._snapshot_evicted(loaded)
+
+    def memory_bytes(self) -> int:
+        return sum(user_index.memory_bytes() for user_index in self._indexes.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded_users": len(self._indexes),
+                "memory_bytes": self.memory_bytes(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "tombstones": sum(len(user_index.tombstones) for user_index in self._indexes.values()),
+                "compactions_pending": len(self._compaction_pending),
+            }
+
+    # --- Internal helpers ---
+
+    def _load(self, user_id, db):
+        user_index = self.store.load(user_id) if self.store is not None else None
+        if user_index is None:
+            if self.store is not None:
+                # No usable snapshot: rebuild from the database and start a fresh log
+                lsn = self.store.reset(user_id)
+                user_index = self.loader(user_id, db)
+                user_index.lsn = lsn
+                user_index.changes_since_snapshot = self.snapshot_every
+            else:
+                user_index = self.loader(user_id, db)
+        if self.lexical_loader is not None and user_index.lexical is None:
+            user_index.lexical = self.lexical_loader(user_id, db)
+            if self.store is not None:
+                # Snapshot it so the next load doesn't read every entry again
+                user_index.changes_since_snapshot = self.snapshot_every
+        return user_index
+
+    @staticmethod
+    def _apply_to(user_index, op, entry_ids, embeddings, texts):
+        user_index.generation = next(_generations)
+        if op == "add":
+            if embeddings is not None:
+                user_index.add(entry_ids, embeddings)
+            if texts is not None and user_index.lexical is not None:
+                for entry_id, text in zip(entry_ids, texts):
+                    user_index.lexical.add(entry_id, text)
+        else:
+            user_index.remove(entry_ids)
+            if user_index.lexical is not None:
+                for entry_id in entry_ids:
+                    user_index.lexical.remove(entry_id)
+
+    def _apply(self, user_id, op, entry_ids, embeddings, texts, lsn):
+        with self._lock:
+            if user_id in self._loading:
+                self._loading[user_id].append((op, entry_ids, embeddings, texts, lsn))
+                return
+            user_index = self._indexes.get(user_id)
+        if user_index is None:
+            if lsn is not None and self.store.log_backlog(user_id) >= self.snapshot_every:
+                self._queue_maintenance(user_id, None)
+            return
+
+        self._apply_to(user_index, op, entry_ids, embeddings, texts)
+        if lsn is not None:
+            user_index.lsn = max(user_index.lsn, lsn)
+            user_index.changes_since_snapshot += len(entry_ids)
+
+        with self._lock:
+            evicted = self._enforce_budget()
+        self._snapshot_evicted(evicted)
+        if op == "delete":
+            self._maybe_compact(user_index)
+        self._maybe_snapshot(user_index)
+
+    def _maybe_compact(self, user_index):
+        if user_index.needs_compaction(self.compact_min, self.compact_ratio):
+            self._queue_maintenance(user_index.user_id, user_index)
+
+    def _queue_maintenance(self, user_id, user_index):
+        """Queues a loaded index for compaction, or (user_index None) an unloaded user's log for folding."""
+        with self._lock:
+            if user_id in self._compaction_pending:
+                return
+            self._compaction_pending.add(user_id)
+            if self._compaction_thread is None:
+                self._compaction_thread = threading.Thread(
+                    target=self._compaction_worker, name="vector-index-compaction", daemon=True
+                )
+                self._compaction_thread.start()
+        self._compaction_queue.put((user_id, user_index))
+
+    def _compaction_worker(self):
+        while True:
+            user_id, user_index = self._compaction_queue.get()
+            try:
+                if user_index is None:
+                    self._fold_log(user_id)
+                    continue
+                removed = user_index.compact()
+                print(f"Compacted RAG index for user {user_id} ({removed} deleted vectors removed).")
+                if self.store is not None and removed:
+                    user_index.changes_since_snapshot += 1
+                    self.store.save_snapshot(user_index)
+            except Exception as e:
+                print(f"RAG index maintenance failed for user {user_id}: {e}")
+            finally:
+                with self._lock:
+                    self._compaction_pending.discard(user_id)
+
+    def _fold_log(self, user_id):
+        # Snapshot + log -> new snapshot, without keeping the index in memory
+        with self._lock:
+            if user_id in self._indexes or user_id in self._loading:
+                return  # A loaded index takes its own snapshots
+        user_index = self.store.load(user_id)
+        if user_index is not None:
+            self.store.save_snapshot(user_index)
+
+    def _maybe_snapshot(self, user_index):
+        if self.store is not None and user_index.changes_since_snapshot >= self.snapshot_every:
+            self.store.save_snapshot(user_index)
+
+    def _snapshot_evicted(self, user_indexes):
+        if self.store is None:
+            return
+        for user_index in user_indexes:
+            if user_index.changes_since_snapshot > 0:
+                self.store.save_snapshot(user_index)
+
+    # --- Caller holds self._lock; both return the evicted indexes ---
+
+    def _evict_idle(self):
+        evicted = []
+        cutoff = time.monotonic() - self.idle_seconds
+        # The OrderedDict is kept in last-used order, so idle indexes are at the front
+        while self._indexes:
+            user_id, user_index = next(iter(self._indexes.items()))
+            if user_index.last_used >= cutoff:
+                break
+            self._indexes.popitem(last=False)
+            evicted.append(user_index)
+            print(f"Evicted idle RAG index for user {user_id}.")
+        return evicted
+
+    def _enforce_budget(self):
+        evicted = []
+        # Always keep the most recently used index, even if it alone is over budget
+        while len(self._indexes) > 1 and self.memory_bytes() > self.memory_budget_bytes:
+            user_id, user_index = self._indexes.popitem(last=False)
+            evicted.append(user_index)
+            print(f"Evicted RAG index for user {user_id} (memory budget).")
+        return evicted
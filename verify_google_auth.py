@@ -0,0 +1,146 @@
+"""
+Checks Google sign-in against a local stand-in for Google's certificate
+endpoint: signs ID tokens with a throwaway key, serves its certificate
+with a short Cache-Control max-age, and verifies that
+
+  - valid tokens verify, and tokens with a bad audience, issuer or
+    signature are rejected,
+  - the certificates are downloaded once per max-age, not per login,
+  - usernames are allocated with a single query,
+
+then prints the per-token verification latency. Uses a temporary SQLite
+database; exits non-zero on failure.
+
+    python verify_google_auth.py
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+# Must be set before the app modules read their configuration
+CERT_MAX_AGE_SECONDS = 2
+server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+os.environ["GOOGLE_CERTS_URL"] = f"http://127.0.0.1:{server.server_port}/oauth2/v1/certs"
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/verify_google_auth.db"
+
+from google.auth import crypt, jwt  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import google_signin  # noqa: E402
+import migrate_db  # noqa: E402
+import models  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+
+AUDIENCE = "test-client-id.apps.googleusercontent.com"
+KEY_ID = "local-test-key"
+failures = []
+
+
+def check(condition, message):
+    print(f"[{'ok' if condition else 'FAIL'}] {message}")
+    if not condition:
+        failures.append(message)
+
+
+def make_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "local-google-certs")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()).serial_number(x509.random_serial_number()).not_valid_before(
+        now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256())
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    return crypt.RSASigner.from_string(key_pem, KEY_ID), certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+signer, certificate_pem = make_key()
+other_signer, _ = make_key()
+fetches = []
+
+
+class CertsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        fetches.append(time.time())
+        body = json.dumps({KEY_ID: certificate_pem}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", f"public, max-age={CERT_MAX_AGE_SECONDS}, must-revalidate, no-transform")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def id_token(signer=signer, **claims):
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": AUDIENCE, "iat": now, "exp": now + 3600,
+               "sub": "1234", "email": "jack.tucker@example.com", "name": "Jack"}
+    payload.update(claims)
+    return jwt.encode(signer, payload).decode()
+
+
+def rejects(token):
+    try:
+        google_signin.verify_id_token(token, audience=AUDIENCE)
+    except ValueError:
+        return True
+    return False
+
+
+server.RequestHandlerClass = CertsHandler
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# --- Token verification and certificate caching ---
+claims = google_signin.verify_id_token(id_token(), audience=AUDIENCE)
+check(claims["email"] == "jack.tucker@example.com", "valid token verifies")
+check(rejects(id_token(aud="someone-else")), "wrong audience is rejected")
+check(rejects(id_token(iss="https://evil.example.com")), "wrong issuer is rejected")
+check(rejects(id_token(signer=other_signer)), "token signed by another key is rejected")
+check(rejects(id_token(exp=int(time.time()) - 600, iat=int(time.time()) - 4000)), "expired token is rejected")
+
+tokens = [id_token(sub=str(i)) for i in range(200)]
+start_time = time.perf_counter()
+for token in tokens:
+    google_signin.verify_id_token(token, audience=AUDIENCE)
+elapsed = time.perf_counter() - start_time
+check(len(fetches) == 1, f"certificates fetched once for {len(tokens) + 5} verifications (fetched {len(fetches)}x)")
+print(f"    verification: {elapsed / len(tokens) * 1000:.2f} ms per token (cached certificates)")
+
+time.sleep(CERT_MAX_AGE_SECONDS + 0.5)
+google_signin.verify_id_token(id_token(), audience=AUDIENCE)
+check(len(fetches) == 2, "certificates fetched again once max-age has passed")
+
+# --- Username allocation ---
+migrate_db.migrate()
+db = SessionLocal()
+for username in ["jack", "jack1", "jack2", "jackson", "jack_b"]:
+    db.add(models.User(email=f"{username}@example.com", username=username, hashed_password="x"))
+db.commit()
+
+statements = []
+event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+username = google_signin.unique_username(db, "jack")
+check(username == "jack3", f"next free username is jack3 (got {username})")
+check(len(statements) == 1, f"username allocated with one query ({len(statements)} queries)")
+check(google_signin.unique_username(db, "jill") == "jill", "free username is used as is")
+check(google_signin.unique_username(db, "jack_") == "jack_", "LIKE wildcards in usernames are matched literally")
+db.close()
+server.shutdown()
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll checks passed.")
@@ -0,0 +1,137 @@
+"""
+Checks full-text search over journal entries (entry_search.py):
+
+  - better matches rank first, and equal ranks come newest first,
+  - snippets wrap the matched words in <mark>...</mark>,
+  - the index follows entries that are edited or deleted (the FTS5
+    triggers on SQLite, the search_vector trigger on Postgres),
+  - offset cursors page through the hits without gaps or repeats,
+  - % and _ in a query are matched literally, not as LIKE wildcards,
+  - keyset cursors page through the plain entry list (newest first) to
+    the end, also for entries created within the same second.
+
+Uses a temporary SQLite database, or the database given on the command
+line (e.g. a scratch Postgres one, to check the tsvector setup). The
+database gets migrated; exits non-zero on failure.
+
+    python verify_search.py [DATABASE_URL]
+"""
+import os
+import sys
+import tempfile
+
+# Must be set before the app modules read their configuration
+os.environ["DATABASE_URL"] = (sys.argv[1] if len(sys.argv) > 1
+                              else f"sqlite:///{tempfile.mkdtemp()}/verify_search.db")
+
+import entry_search  # noqa: E402
+import migrate_db  # noqa: E402
+import models  # noqa: E402
+import pagination  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+
+failures = []
+
+
+def check(condition, message):
+    print(f"[{'ok' if condition else 'FAIL'}] {message}")
+    if not condition:
+        failures.append(message)
+
+
+def search(query, limit=entry_search.SEARCH_MAX_RESULTS, offset=0):
+    return entry_search.search_entries(db, user.id, query, limit=limit, offset=offset)
+
+
+def hit_ids(query, **kwargs):
+    return [hit.entry_id for hit in search(query, **kwargs)]
+
+
+def add_entry(text_content):
+    entry = models.JournalEntry(user_id=user.id, text_content=text_content)
+    db.add(entry)
+    db.commit()
+    return entry.id
+
+
+migrate_db.migrate()
+print(f"Searching on {engine.dialect.name}.")
+db = SessionLocal()
+user = models.User(email="search-check@example.com", username="search-check", hashed_password="x")
+other = models.User(email="search-other@example.com", username="search-other", hashed_password="x")
+db.add_all([user, other])
+db.commit()
+
+# --- Ranking and snippets ---
+casual = add_entry("Had some coffee, then a long walk through the park with friends before dinner.")
+focused = add_entry("Coffee with Sam, more coffee at noon, and far too much coffee tonight.")
+db.add(models.JournalEntry(user_id=other.id, text_content="Someone else's coffee diary."))
+db.commit()
+
+ids = hit_ids("coffee")
+check(ids[:2] == [focused, casual], f"entry mentioning coffee most ranks first (got {ids})")
+check(len(ids) == 2, "other users' entries are not returned")
+snippet = search("coffee")[0].snippet or ""
+check(f"{entry_search.HIGHLIGHT_START}coffee{entry_search.HIGHLIGHT_END}" in snippet.lower(),
+      f"snippet highlights the match ({snippet!r})")
+
+# --- Ties and offset cursors ---
+walks = [add_entry("Evening walk by the river.") for _ in range(5)]
+ids = hit_ids("river")
+check(ids == sorted(walks, reverse=True), f"equal ranks come newest first (got {ids})")
+
+paged, cursor = [], None
+while True:
+    offset = pagination.decode_offset_cursor(cursor) if cursor else 0
+    page = hit_ids("river", limit=2 + 1, offset=offset)
+    paged += page[:2]
+    if len(page) <= 2:
+        break
+    cursor = pagination.encode_offset_cursor(offset + 2)
+check(paged == ids, f"offset cursors return every hit once, in order (got {paged})")
+
+# --- Edits and deletes reach the index ---
+entry = db.get(models.JournalEntry, walks[0])
+entry.text_content = "Went kayaking on the lake instead."
+db.commit()
+check(hit_ids("kayaking") == [walks[0]], "edited text is searchable")
+check(walks[0] not in hit_ids("river"), "edited-out text no longer matches")
+
+db.delete(entry)
+db.commit()
+check(hit_ids("kayaking") == [], "deleted entry is no longer found")
+
+# --- LIKE wildcards ---
+literal = add_entry("Finished the a_c checklist, 100% done.")
+lookalike = add_entry("Finished the abc checklist, 1000 done.")
+ids = hit_ids("a_c")
+check(literal in ids and lookalike not in ids, f"_ is matched literally (got {ids})")
+ids = hit_ids("%")
+check(lookalike not in ids and casual not in ids, f"a bare % does not match every entry (got {ids})")
+
+# The unindexed fallback for other databases matches with LIKE; run it here too
+for query, expected in (("a_c", [literal]), ("100%", [literal])):
+    rows = db.execute(entry_search._scan_statement(user.id, query, None, None, 10, 0)).all()
+    check([row.id for row in rows] == expected, f"LIKE fallback matches {query!r} literally")
+
+# --- Keyset pages of the entry list (GET /journal-entries?limit&cursor) ---
+entries = models.JournalEntry
+newest_first = [row.id for row in db.query(entries.id).filter(entries.user_id == user.id).order_by(
+    entries.created_at.desc(), entries.id.desc())]
+walked, cursor, pages = [], None, 0
+while pages <= len(newest_first):
+    query = db.query(entries.id, entries.created_at).filter(entries.user_id == user.id)
+    rows, cursor = pagination.paginate(query, entries.created_at, entries.id, 2, cursor)
+    walked += [row.id for row in rows]
+    pages += 1
+    if cursor is None:
+        break
+check(cursor is None, f"keyset cursors reach the last page ({pages} pages)")
+check(walked == newest_first, f"keyset pages return every entry once, newest first (got {walked})")
+
+db.close()
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll checks passed.")